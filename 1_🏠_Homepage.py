@@ -1,18 +1,14 @@
 import streamlit as st
-import io
-import requests
 
 from streamlit_extras.badges import badge
-from PIL import Image
+from assets import load_image
+from timings import page_timings
 
 def main():
     col1, col2, col3 = st.columns([0.045, 0.27, 0.035])
     
     with col1:
-        url = 'https://github.com/tsu2000/genshin_wishes/raw/main/images/Genshin_Impact.png'
-        response = requests.get(url)
-        img = Image.open(io.BytesIO(response.content))
-        st.image(img, output_format = 'png')
+        st.image(load_image('Genshin_Impact.png'), output_format = 'png')
 
     with col2:
         st.title('Genshin Impact WishStats')
@@ -28,6 +24,7 @@ def main():
     st.markdown('#### Current Features:')
     st.markdown('- 🎲 **5★ Wish System Overview**: Data visualisations and statistical explanations behind wishing and the pity system probability rates in Genshin Impact (for 5★ items/characters).')
     st.markdown('- 🕹️ **Drop Rate Simulator**: Input your wish history to simulate expected outcomes based on pity count, banner type, and number of pulls.')
+    st.markdown('- 🎯 **Wish Planner**: Find out how many wishes you need for multiple copies of a featured 5★ character or weapon (e.g. C6 or R5), with exact probabilities.')
 
     st.markdown('---')
 
@@ -35,4 +32,5 @@ def main():
 
 if __name__ == "__main__":
     st.set_page_config(page_title = 'Genshin Impact WishStats', page_icon = '🏠')
-    main()
+    with page_timings('Homepage'):
+        main()
@@ -0,0 +1,39 @@
+from functools import lru_cache
+from pathlib import Path
+from timings import span
+
+
+# Images bundled with the app, and where they are published as a fallback
+ASSET_DIR = Path(__file__).resolve().parent / 'images'
+REMOTE_URL = 'https://github.com/tsu2000/genshin_wishes/raw/main/images/'
+
+
+@lru_cache(maxsize = None)
+def load_image(name: str, remote_fallback: bool = True, timeout: float = 3.0) -> bytes:
+    '''
+    Returns the bytes of an image bundled in the `images/` directory, read from disk once per process and cached.
+
+    Args:
+        name (str): File name of the image, e.g. 'gacha.png'.
+        remote_fallback (bool): Whether to fetch the image from the GitHub repository if it is missing from disk.
+        timeout (float): Timeout in seconds of the remote request.
+
+    Returns:
+        bytes: The encoded image, ready to be passed to `st.image`.
+    '''
+    path = ASSET_DIR / name
+
+    if path.is_file():
+        with span('image_read'):
+            return path.read_bytes()
+
+    if not remote_fallback:
+        raise FileNotFoundError(f'Image {name!r} is not bundled in {ASSET_DIR}')
+
+    # Only needed when the bundled copy is missing
+    import requests
+
+    with span('image_fetch'):
+        response = requests.get(REMOTE_URL + name, timeout = timeout)
+        response.raise_for_status()
+        return response.content
@@ -0,0 +1,56 @@
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from timings import current_rerun, timed_rerun
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+# Number of background jobs running at the same time across all sessions, later jobs wait for a free thread
+BACKGROUND_THREADS = 4
+
+# Seconds between two checks of a running job by the session waiting for it
+POLL_INTERVAL = 0.1
+
+# Shared by every session of the app
+_executor = ThreadPoolExecutor(max_workers = BACKGROUND_THREADS, thread_name_prefix = 'background-job')
+
+
+def run_in_background(compute: Callable[[threading.Event], T], on_wait: Optional[Callable[[float], None]] = None, poll_interval: float = POLL_INTERVAL) -> T:
+    '''
+    Runs `compute(cancel)` on a background thread and waits for its result, calling `on_wait(elapsed_seconds)` while it runs.
+
+    Streamlit can only interrupt a script for a rerun when the script calls into Streamlit, which a long computation never does. Waiting here instead keeps the script responsive: `on_wait` should update an element (e.g. a status caption), which is where Streamlit raises its rerun or stop exception once the inputs change. Any exception raised while waiting sets the `cancel` event, so that `compute` can stop cooperatively at its next check instead of finishing a stale run. The spans timed by `compute` are recorded in the rerun of the calling thread (see `timings.timed_rerun`).
+
+    Args:
+        compute (Callable[[threading.Event], T]): The computation to run. It should check the event regularly and stop once it is set.
+        on_wait (Callable[[float], None]): Called every `poll_interval` seconds until the result is ready.
+        poll_interval (float): Seconds between calls of `on_wait`.
+
+    Returns:
+        T: The result of `compute`. Exceptions raised by `compute` are raised again.
+    '''
+    cancel = threading.Event()
+    rerun = current_rerun()
+
+    def run() -> T:
+        # The spans of the computation belong to the rerun waiting for it
+        with timed_rerun(rerun):
+            return compute(cancel)
+
+    future = _executor.submit(run)
+    start = time.perf_counter()
+
+    try:
+        while True:
+            try:
+                return future.result(timeout = poll_interval)
+            except TimeoutError:
+                if on_wait is not None:
+                    on_wait(time.perf_counter() - start)
+    except BaseException:
+        cancel.set()
+        future.cancel()
+        raise
@@ -0,0 +1,244 @@
+'''
+Benchmarks the simulation, probability and rendering hot paths of the app and checks them against saved baselines.
+
+Each case is timed with `timeit` (best of `--repeat` runs) over a grid of wishes × iterations × banner. Save a baseline on a machine, then compare later runs on the same machine against it. Variance-reduced samplers are also checked against independent draws of the same run, which needs no baseline. Run it from the repository root:
+
+    python benchmark.py --save            # record benchmark_baseline.json
+    python benchmark.py                   # fail if a case is more than 25% slower than its baseline
+    python benchmark.py --quick -k simulation
+'''
+import argparse
+import importlib.util
+import itertools
+import json
+import logging
+import sys
+import timeit
+
+import numpy as np
+
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Tuple
+
+from pity_probs import BANNERS, pity_table
+from plot_cache import PlotCache
+from result_cache import result_cache
+from sim_engine import SAMPLERS, banner_rolls, banner_tables, sample_outcomes, simulate_rolls, simulation
+
+
+ROOT = Path(__file__).resolve().parent
+BASELINE_PATH = ROOT / 'benchmark_baseline.json'
+
+OVERVIEW_PAGE = ROOT / 'pages' / '2_🎲_5★ Wish System Overview.py'
+SIMULATOR_PAGE = ROOT / 'pages' / '3_🕹️_Drop Rate Simulator.py'
+
+# Parameter grids, the quick grid is meant for a fast check while iterating on a change. Samplers are timed on long sessions of wishes, where their draws are the hardest to vectorise
+GRID = {'wishes': (10, 100, 300), 'iterations': (1000, 10000), 'banner': tuple(BANNERS), 'sampler_wishes': (1000, 5000)}
+QUICK_GRID = {'wishes': (10, 100), 'iterations': (1000,), 'banner': ('character',), 'sampler_wishes': (1000,)}
+
+# Iterations of the sampler cases
+SAMPLER_ITERATIONS = 10000
+
+# Slowdown of a variance-reduced sampler over independent draws on the same case that fails the benchmark, whatever the baseline
+SAMPLER_MAX_SLOWDOWN = 3.0
+
+# Names of the overview plots, the second item of their `PlotCache` keys
+OVERVIEW_PLOTS = ('rate', 'cdf', 'pmf')
+
+# Relative slowdown over the baseline that fails the regression check
+DEFAULT_THRESHOLD = 0.25
+
+
+@lru_cache(maxsize = None)
+def load_page(path: Path):
+    '''
+    Imports a page of the app as a module without running its `main()`, once.
+    '''
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class RecordingPlotCache(PlotCache):
+    '''
+    A `PlotCache` which also records the plot builders passed to it, so that the overview plots can be timed outside of a Streamlit session.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.builders = {}
+
+    def render(self, key, build_base, draw_dynamic, x):
+        self.builders[key] = (build_base, draw_dynamic)
+        return super().render(key, build_base, draw_dynamic, x)
+
+
+def overview_plots(page, banner_type: str) -> Dict[str, Tuple[Callable, Callable]]:
+    '''
+    Returns the (build_base, draw_dynamic) functions of each overview plot of a banner, keyed by plot name.
+    '''
+    cache = RecordingPlotCache()
+    page.plot_cache = cache
+    page.banner_overview(BANNERS[banner_type])
+
+    return {key[1]: builders for key, builders in cache.builders.items()}
+
+
+def benchmark_cases(grid: Dict[str, tuple]) -> Iterator[Tuple[str, Callable[[], Callable[[], object]]]]:
+    '''
+    Yields the name and the setup of every benchmark case. The setup returns the function to time, and is only called for the cases that are run, so that filtered out cases cost nothing.
+    '''
+    for banner_type in grid['banner']:
+        for wishes, iterations in itertools.product(grid['wishes'], grid['iterations']):
+            params = f'{banner_type},w={wishes},i={iterations}'
+
+            yield f'simulate_rolls[{params}]', partial(_rolls_case, banner_type, wishes, iterations)
+            yield f'simulation[monte_carlo,{params}]', partial(_bound, simulation, iterations, banner_type, 1, 1, wishes, seed = 0)
+            yield f'simulation[event_skipping,{params}]', partial(_bound, simulation, iterations, banner_type, 1, 1, wishes, seed = 0, method = 'event_skipping')
+            yield f'combined_freq_graph[{params}]', partial(_combined_freq_graph_case, banner_type, wishes, iterations)
+            yield f'summary_table[{params}]', partial(_summary_table_case, banner_type, wishes, iterations)
+
+        for wishes, sampler in itertools.product(grid['sampler_wishes'], SAMPLERS):
+            yield f'sample_outcomes[{sampler},{banner_type},w={wishes},i={SAMPLER_ITERATIONS}]', partial(_sampler_case, banner_type, wishes, sampler)
+
+        for wishes in grid['wishes']:
+            yield f'simulation[exact,{banner_type},w={wishes}]', partial(_bound, simulation, 10000, banner_type, 1, 1, wishes, method = 'exact')
+
+        yield f'pity_table[{banner_type}]', partial(_bound, pity_table, BANNERS[banner_type].spec_5star.roll_dict())
+
+        for plot in OVERVIEW_PLOTS:
+            yield f'overview_base[{banner_type},{plot}]', partial(_overview_base_case, banner_type, plot)
+            yield f'overview_render[{banner_type},{plot}]', partial(_overview_render_case, banner_type, plot)
+
+
+def _bound(func: Callable, *args, **kwargs) -> Callable[[], object]:
+    # The setup of a case which needs none
+    return partial(func, *args, **kwargs)
+
+
+def _rolls_case(banner_type: str, wishes: int, iterations: int):
+    prob_4, prob_5 = banner_rolls(banner_type)
+    return partial(_repeat_rolls, prob_4, prob_5, wishes, iterations)
+
+
+def _sampler_case(banner_type: str, wishes: int, sampler: str):
+    table_4, table_5 = banner_tables(banner_type)
+    return partial(sample_outcomes, table_4.hazard, table_5.hazard, 1, 1, wishes, SAMPLER_ITERATIONS, sampler, np.random.default_rng(0))
+
+
+def sampler_slowdowns(timings: Dict[str, float]) -> Dict[str, float]:
+    '''
+    Returns the slowdown of every timed variance-reduced sampler case over the independent sampler case with the same parameters, when both were timed.
+    '''
+    slowdowns = {}
+    for name, elapsed in timings.items():
+        if name.startswith('sample_outcomes[') and not name.startswith('sample_outcomes[independent,'):
+            sampler, params = name[len('sample_outcomes['):].split(',', 1)
+            independent = timings.get(f'sample_outcomes[independent,{params}')
+            if independent:
+                slowdowns[name] = elapsed / independent
+
+    return slowdowns
+
+
+def _combined_freq_graph_case(banner_type: str, wishes: int, iterations: int):
+    return partial(_combined_freq_graph, load_page(SIMULATOR_PAGE), iterations, banner_type, wishes)
+
+
+def _summary_table_case(banner_type: str, wishes: int, iterations: int):
+    return partial(_summary_table, load_page(SIMULATOR_PAGE), simulation(iterations, banner_type, 1, 1, wishes, seed = 0))
+
+
+@lru_cache(maxsize = None)
+def _banner_overview_plots(banner_type: str) -> Dict[str, Tuple[Callable, Callable]]:
+    return overview_plots(load_page(OVERVIEW_PAGE), banner_type)
+
+
+def _overview_base_case(banner_type: str, plot: str):
+    build_base, _ = _banner_overview_plots(banner_type)[plot]
+    return build_base
+
+
+def _overview_render_case(banner_type: str, plot: str):
+    build_base, draw_dynamic = _banner_overview_plots(banner_type)[plot]
+    return partial(_render_marker, build_base(), draw_dynamic)
+
+
+def _repeat_rolls(prob_4: dict, prob_5: dict, wishes: int, iterations: int):
+    for _ in range(iterations):
+        simulate_rolls(prob_4, prob_5, 1, 1, wishes)
+
+
+def _combined_freq_graph(simulator, iterations: int, banner_type: str, wishes: int):
+    # Time the simulation rather than a cache hit
+    result_cache.clear()
+    return simulator.combined_freq_graph(iterations, 1, 1, banner_type, wishes, seed = 0)
+
+
+def _summary_table(simulator, result):
+    return simulator.summary_table(result.summary())
+
+
+def _render_marker(fig, draw_dynamic: Callable):
+    # A slider value which is not cached yet: the dynamic artists are drawn on the cached base figure and encoded
+    return PlotCache().render(None, lambda: fig, draw_dynamic, 1)
+
+
+def time_case(func: Callable[[], object], repeat: int) -> float:
+    '''
+    Returns the best time of one call of `func` in seconds, out of `repeat` runs of enough calls to take at least 0.2 seconds.
+    '''
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = __doc__.strip().splitlines()[0])
+    parser.add_argument('--save', action = 'store_true', help = 'save the timings as the new baseline')
+    parser.add_argument('--baseline', type = Path, default = BASELINE_PATH, help = 'baseline file (default: %(default)s)')
+    parser.add_argument('--threshold', type = float, default = DEFAULT_THRESHOLD, help = 'allowed relative slowdown (default: %(default)s)')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'number of timed runs per case (default: %(default)s)')
+    parser.add_argument('--quick', action = 'store_true', help = 'use a smaller parameter grid')
+    parser.add_argument('-k', dest = 'filter', default = '', help = 'only run cases whose name contains this text')
+    args = parser.parse_args()
+
+    # Streamlit warns about the missing script context on every call in bare mode
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').disabled = True
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() and not args.save else {}
+    timings = {}
+    failed = False
+
+    for name, setup in benchmark_cases(QUICK_GRID if args.quick else GRID):
+        if args.filter not in name:
+            continue
+
+        timings[name] = elapsed = time_case(setup(), args.repeat)
+        line = f'{name}: {elapsed * 1000:.2f} ms'
+
+        if name in baseline:
+            ratio = elapsed / baseline[name]
+            status = 'ok' if ratio <= 1 + args.threshold else 'REGRESSION'
+            failed |= ratio > 1 + args.threshold
+            line += f' (baseline {baseline[name] * 1000:.2f} ms, x{ratio:.2f}) - {status}'
+
+        print(line, flush = True)
+
+    for name, slowdown in sampler_slowdowns(timings).items():
+        status = 'ok' if slowdown <= SAMPLER_MAX_SLOWDOWN else 'TOO SLOW'
+        failed |= slowdown > SAMPLER_MAX_SLOWDOWN
+        print(f'{name}: x{slowdown:.2f} the time of independent draws (at most x{SAMPLER_MAX_SLOWDOWN:.1f}) - {status}')
+
+    if args.save:
+        saved = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        args.baseline.write_text(json.dumps({**saved, **timings}, indent = 2, sort_keys = True) + '\n')
+        print(f'Saved {len(timings)} timings to {args.baseline}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
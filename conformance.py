@@ -0,0 +1,232 @@
+'''
+Checks that every simulation engine reproduces the outcome distribution of `sim_engine.simulate_rolls`, and measures how much accuracy each buys per CPU-second.
+
+Each engine is run over a grid of banners × starting pities × wishes. Its joint (4★, 5★) outcomes are tested with a chi-square goodness-of-fit test against the exact distribution, and its 4★ and 5★ counts with two-sample KS tests against the pure Python reference loop. Two rule cases pin the semantics: a 5★ drop overrides a guaranteed 4★ drop, and the 4★ pity carries over a 5★ drop. Run it from the repository root:
+
+    python conformance.py                       # full grid, fails if any test rejects
+    python conformance.py --quick --json conformance.json
+    python conformance.py -k event_skipping --target-error 0.005
+'''
+import argparse
+import itertools
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from pity_probs import BANNERS
+from scipy import stats
+from sim_engine import EXACT_MAX_WISHES, banner_rolls, banner_tables, simulate_rolls, simulation
+from sim_result import SimulationResult
+from typing import Callable, Dict, Iterator, List, Tuple
+
+
+# Parameter grids, the quick grid is meant for a fast check while iterating on an engine
+GRID = {'banner': tuple(BANNERS), 'pity': ((1, 1), (5, 60), (8, 74)), 'wishes': (1, 10, 100, 300)}
+QUICK_GRID = {'banner': ('character',), 'pity': ((1, 1), (8, 74)), 'wishes': (10, 100)}
+
+# Significance level of the whole run, split across every test (Bonferroni correction)
+DEFAULT_ALPHA = 0.01
+
+# Cells of the chi-square test with fewer expected iterations are pooled together
+MIN_EXPECTED = 5
+
+
+def reference_simulation(num_iter: int, banner_type: str, pity_4: int, pity_5: int, wishes: int, seed: int) -> SimulationResult:
+    '''
+    The pure Python per-wish loop of `simulate_rolls`, which every other engine must agree with.
+    '''
+    prob_4, prob_5 = banner_rolls(banner_type)
+    random.seed(seed)
+    outcomes = [simulate_rolls(prob_4, prob_5, pity_4, pity_5, wishes) for _ in range(num_iter)]
+    values, counts = np.unique(np.array(outcomes, dtype = np.int64).reshape(-1, 3), axis = 0, return_counts = True)
+    return SimulationResult(values, counts)
+
+
+# Engines under test: (num_iter, banner_type, pity_4, pity_5, wishes, seed) -> SimulationResult
+ENGINES: Dict[str, Callable[..., SimulationResult]] = {
+    'reference': reference_simulation,
+    'monte_carlo': lambda *args, seed: simulation(*args, seed = seed),
+    'event_skipping': lambda *args, seed: simulation(*args, seed = seed, method = 'event_skipping'),
+    'antithetic': lambda *args, seed: simulation(*args, seed = seed, sampler = 'antithetic'),
+    'sobol': lambda *args, seed: simulation(*args, seed = seed, sampler = 'sobol'),
+    'exact': lambda *args, seed: simulation(*args, method = 'exact'),
+}
+
+
+def rule_cases(banner_type: str) -> Iterator[Tuple[str, int, int, int, Dict[Tuple[int, int, int], float]]]:
+    '''
+    Yields the name, starting pities, wishes and expected outcome probabilities of the cases pinning the rules of `simulate_rolls`, computed by hand from the pity tables.
+    '''
+    table_4, table_5 = banner_tables(banner_type)
+    max_4, max_5 = table_4.max_pity, table_5.max_pity
+
+    # Both drops are guaranteed on the first wish, and the 5★ drop wins
+    yield 'rule:5★ overrides guaranteed 4★', max_4, max_5, 1, {(0, 0, 1): 1.0}
+
+    # The 5★ drop resets the 5★ pity only, so the 4★ drop is still guaranteed on the second wish unless the base 5★ rate hits again
+    p5 = table_5.hazard[1]
+    yield 'rule:4★ pity carries over a 5★', max_4, max_5, 2, {(0, 1, 1): 1 - p5, (0, 0, 2): p5}
+
+
+def grid_cases(grid: Dict[str, tuple]) -> Iterator[Tuple[str, str, int, int, int, Dict[Tuple[int, int, int], float]]]:
+    '''
+    Yields the name, banner, starting pities, wishes and exact outcome probabilities of every case.
+    '''
+    for banner_type in grid['banner']:
+        for (pity_4, pity_5), wishes in itertools.product(grid['pity'], grid['wishes']):
+            if wishes > EXACT_MAX_WISHES:
+                continue
+            exact = simulation(1, banner_type, pity_4, pity_5, wishes, method = 'exact')
+            expected = dict(zip(map(tuple, exact.outcomes.tolist()), exact.probs.tolist()))
+            yield f'{banner_type},p4={pity_4},p5={pity_5},w={wishes}', banner_type, pity_4, pity_5, wishes, expected
+
+        for name, pity_4, pity_5, wishes, expected in rule_cases(banner_type):
+            yield f'{banner_type},{name}', banner_type, pity_4, pity_5, wishes, expected
+
+
+def chi_square(result: SimulationResult, expected: Dict[Tuple[int, int, int], float]) -> float:
+    '''
+    p-value of a chi-square goodness-of-fit test of the observed outcomes against their expected probabilities, pooling the cells expecting fewer than `MIN_EXPECTED` iterations (and any outcome which should be impossible) into one.
+    '''
+    observed = dict(zip(map(tuple, result.outcomes.tolist()), result.counts.tolist()))
+    keys = list(expected)
+    obs = np.array([observed.get(key, 0) for key in keys])
+    exp = np.array([expected[key] for key in keys]) * result.n
+
+    large = exp >= MIN_EXPECTED
+    pooled_obs = np.append(obs[large], result.n - obs[large].sum())
+    pooled_exp = np.append(exp[large], result.n - exp[large].sum())
+
+    if (pooled_exp > 0).sum() < 2:
+        # A certain outcome: any other outcome is a failure
+        return 1.0 if pooled_obs[pooled_exp == 0].sum() == 0 else 0.0
+
+    keep = pooled_exp > 0
+    if pooled_obs[~keep].sum() > 0:
+        return 0.0
+    return float(stats.chisquare(pooled_obs[keep], pooled_exp[keep]).pvalue)
+
+
+def ks_test(result: SimulationResult, reference: SimulationResult, star: str) -> float:
+    '''
+    p-value of a two-sample KS test of the drop counts of one rarity, with the asymptotic distribution (ties between discrete counts make it conservative).
+    '''
+    samples = []
+    for res in (result, reference):
+        values, weights = res.marginal(star)
+        samples.append(np.repeat(values, np.rint(weights).astype(int)))
+
+    return float(stats.ks_2samp(*samples, method = 'asymp').pvalue)
+
+
+def total_variation(result: SimulationResult, expected: Dict[Tuple[int, int, int], float]) -> float:
+    '''
+    Total variation distance between the observed and the expected outcome distribution.
+    '''
+    observed = dict(zip(map(tuple, result.outcomes.tolist()), result.probs.tolist()))
+    return 0.5 * sum(abs(observed.get(key, 0) - expected.get(key, 0)) for key in set(observed) | set(expected))
+
+
+def run_engine(engine: Callable[..., SimulationResult], num_iter: int, banner_type: str, pity_4: int, pity_5: int, wishes: int, seed: int) -> Tuple[SimulationResult, float]:
+    '''
+    Runs an engine in this process and returns its result and the CPU seconds it took.
+    '''
+    start = time.process_time()
+    result = engine(num_iter, banner_type, pity_4, pity_5, wishes, seed = seed)
+    return result, time.process_time() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = __doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type = int, default = 10000, help = 'iterations per engine and case (default: %(default)s)')
+    parser.add_argument('--alpha', type = float, default = DEFAULT_ALPHA, help = 'significance level of the whole run (default: %(default)s)')
+    parser.add_argument('--seed', type = int, default = 0, help = 'base seed, every run of a case gets its own seed from it (default: %(default)s)')
+    parser.add_argument('--target-error', type = float, default = 0.01, help = 'total variation distance to size the recommended iterations for (default: %(default)s)')
+    parser.add_argument('--quick', action = 'store_true', help = 'use a smaller parameter grid')
+    parser.add_argument('--json', type = argparse.FileType('w'), help = 'also write every measurement to this file')
+    parser.add_argument('-k', dest = 'filter', default = '', help = 'only test engines whose name contains this text (the reference always runs)')
+    args = parser.parse_args()
+
+    cases = list(grid_cases(QUICK_GRID if args.quick else GRID))
+    engines = {name: engine for name, engine in ENGINES.items() if name == 'reference' or args.filter in name}
+
+    # Monte Carlo engines run 2 KS tests and 1 chi-square test per case, the exact engine only the chi-square test
+    num_tests = len(cases) * (3 * (len(engines) - 1) + 1)
+    threshold = args.alpha / num_tests
+    print(f'{len(cases)} cases x {len(engines)} engines, {num_tests} tests, rejecting at p < {threshold:.2e}', flush = True)
+
+    rows: List[dict] = []
+    failed = False
+
+    for index, (case, banner_type, pity_4, pity_5, wishes, expected) in enumerate(cases):
+        # The reference and the engines under test draw from different seeds, so that their samples are independent
+        seed = args.seed + 2 * index
+        reference, reference_cpu = run_engine(reference_simulation, args.iterations, banner_type, pity_4, pity_5, wishes, seed)
+
+        for name, engine in engines.items():
+            if name == 'reference':
+                result, cpu = reference, reference_cpu
+            else:
+                result, cpu = run_engine(engine, args.iterations, banner_type, pity_4, pity_5, wishes, seed + 1)
+
+            row = {'case': case, 'engine': name, 'rule': 'rule:' in case, 'iterations': result.n, 'cpu_seconds': cpu, 'tv_distance': total_variation(result, expected)}
+
+            if name == 'exact':
+                # Deterministic: compared directly instead of tested
+                row['p_chi2'] = 1.0 if row['tv_distance'] < 1e-9 else 0.0
+            else:
+                row['p_chi2'] = chi_square(result, expected)
+                if name != 'reference':
+                    row['p_ks_4star'] = ks_test(result, reference, '4★')
+                    row['p_ks_5star'] = ks_test(result, reference, '5★')
+
+            p_values = [value for key, value in row.items() if key.startswith('p_')]
+            row['ok'] = min(p_values) >= threshold
+            failed |= not row['ok']
+            rows.append(row)
+
+            tests = ', '.join(f'{key[2:]} p={value:.3f}' for key, value in row.items() if key.startswith('p_'))
+            print(f"{case} {name}: TV {row['tv_distance']:.4f}, {cpu * 1000:.1f} ms CPU, {tests} - {'ok' if row['ok'] else 'FAILED'}", flush = True)
+
+    print()
+    print(summarise(rows, args.target_error))
+
+    if args.json:
+        json.dump(rows, args.json, indent = 2)
+
+    return 1 if failed else 0
+
+
+def summarise(rows: List[dict], target_error: float) -> str:
+    '''
+    Tabulates the accuracy per CPU-second of each engine over the grid cases (the rule cases are too small to time).
+
+    For a Monte Carlo engine the squared error shrinks in proportion to the iterations, so TV² × CPU seconds does not depend on the number of iterations run and compares engines on equal work: lower is better. The recommended iterations are those expected to reach a TV distance of `target_error` in the median case.
+    '''
+    lines = [f"{'engine':<16}{'median TV':>12}{'median CPU ms':>16}{'TV² × CPU s':>14}{'iterations for TV ' + format(target_error, 'g'):>26}"]
+
+    for name in dict.fromkeys(row['engine'] for row in rows):
+        engine_rows = [row for row in rows if row['engine'] == name and not row['rule']]
+        if not engine_rows:
+            continue
+
+        tv = np.median([row['tv_distance'] for row in engine_rows])
+        cpu = np.median([row['cpu_seconds'] for row in engine_rows])
+        work = np.median([row['tv_distance'] ** 2 * row['cpu_seconds'] for row in engine_rows])
+
+        if name == 'exact':
+            work, iterations = '-', 'exact'
+        else:
+            needed = np.median([row['iterations'] * (row['tv_distance'] / target_error) ** 2 for row in engine_rows])
+            work, iterations = f'{work:.2e}', f'{needed:,.0f}'
+
+        lines.append(f'{name:<16}{tv:>12.4f}{cpu * 1000:>16.1f}{work:>14}{iterations:>26}')
+
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+'''
+Measures the cold start of each page of the app and checks it against a budget.
+
+Each page is measured in a fresh Python process, twice: its import alone (without running `main()`), compared with `PAGE_BUDGETS_MS`, and its cold first render, a first `AppTest.run()` that also runs `main()` and so loads the libraries it defers (pandas, altair, plotly, ...), compared with `FIRST_RENDER_BUDGETS_MS`. Both exclude the import of `streamlit` itself. Run it from the repository root:
+
+    python import_budget.py
+'''
+import json
+import subprocess
+import sys
+
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent
+
+# Import time budget of each page in milliseconds, excluding `import streamlit`
+PAGE_BUDGETS_MS = {
+    '1_🏠_Homepage.py': 100,
+    'pages/2_🎲_5★ Wish System Overview.py': 200,
+    'pages/3_🕹️_Drop Rate Simulator.py': 200,
+    'pages/4_🎯_Wish Planner.py': 200,
+}
+
+# Cold first render budget of each page in milliseconds, excluding `import streamlit`
+FIRST_RENDER_BUDGETS_MS = {
+    '1_🏠_Homepage.py': 300,
+    'pages/2_🎲_5★ Wish System Overview.py': 2000,
+    'pages/3_🕹️_Drop Rate Simulator.py': 1500,
+    'pages/4_🎯_Wish Planner.py': 1000,
+}
+
+MEASURE_SCRIPT = '''
+import importlib.util, json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import streamlit
+baseline = time.perf_counter() - start
+spec = importlib.util.spec_from_file_location('page', {path!r})
+module = importlib.util.module_from_spec(spec)
+start = time.perf_counter()
+spec.loader.exec_module(module)
+print(json.dumps({{'baseline': baseline, 'page': time.perf_counter() - start}}))
+'''
+
+FIRST_RENDER_SCRIPT = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({path!r}, default_timeout = 120)
+start = time.perf_counter()
+app.run()
+if app.exception:
+    sys.exit(app.exception[0].value)
+print(json.dumps({{'page': time.perf_counter() - start}}))
+'''
+
+
+def measure_page(page: str, repeat: int = 3, script: str = MEASURE_SCRIPT) -> float:
+    '''
+    Returns the fastest of `repeat` cold runs of `script` (`MEASURE_SCRIPT` or `FIRST_RENDER_SCRIPT`) on a page in milliseconds, excluding the import of `streamlit`.
+
+    Raises:
+        RuntimeError: If the page fails to import or render, with the last line of its error output.
+    '''
+    timings = []
+    for _ in range(repeat):
+        source = script.format(root = str(ROOT), path = str(ROOT / page))
+        process = subprocess.run([sys.executable, '-c', source], capture_output = True, text = True, cwd = ROOT)
+        if process.returncode != 0:
+            errors = process.stderr.strip().splitlines()
+            raise RuntimeError(errors[-1] if errors else f'exit status {process.returncode}')
+        timings.append(json.loads(process.stdout.strip().splitlines()[-1])['page'] * 1000)
+
+    return min(timings)
+
+
+def main() -> int:
+    failed = False
+    for label, budgets, script in [('import', PAGE_BUDGETS_MS, MEASURE_SCRIPT), ('first render', FIRST_RENDER_BUDGETS_MS, FIRST_RENDER_SCRIPT)]:
+        for page, budget in budgets.items():
+            try:
+                elapsed = measure_page(page, script = script)
+            except RuntimeError as e:
+                failed = True
+                print(f'{page} {label}: FAILED - {e}')
+                continue
+
+            status = 'ok' if elapsed <= budget else 'OVER BUDGET'
+            failed |= elapsed > budget
+            print(f'{page} {label}: {elapsed:.0f} ms (budget {budget} ms) - {status}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
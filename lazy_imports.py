@@ -0,0 +1,43 @@
+import importlib
+import sys
+import time
+
+from types import ModuleType
+
+
+# Seconds spent importing each lazily loaded module, in load order
+import_times = {}
+
+
+class LazyModule(ModuleType):
+    '''
+    A placeholder module which imports the real module on first attribute access, so that heavy libraries are only loaded on the code paths that use them.
+    '''
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_module'] = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self.__name__)
+            import_times.setdefault(self.__name__, time.perf_counter() - start)
+            self.__dict__['_module'] = module
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> ModuleType:
+    '''
+    Returns the module `name` if it is already imported, or a `LazyModule` which imports it on first use otherwise.
+
+    Example:
+        pd = lazy_import('pandas')  # pandas is only imported when e.g. pd.DataFrame is first accessed
+    '''
+    return sys.modules[name] if name in sys.modules else LazyModule(name)
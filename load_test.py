@@ -0,0 +1,177 @@
+'''
+Drives many simulated user sessions through the app with Streamlit's AppTest, and reports the rerun latency of each page and the memory growth of the process.
+
+Every session keeps its own AppTest per page (and so its own session state), while the process-wide caches (pity tables, planner distributions, plots and simulation results) are shared between them, as in a single Streamlit server. AppTest creates a process-global runtime for each run, so the reruns of the sessions are interleaved round-robin rather than run in parallel; the latencies are those of single reruns while the shared caches fill up. Run it from the repository root:
+
+    python load_test.py                              # 20 sessions of 8 steps
+    python load_test.py --sessions 50 --steps 12 --json load_test.json
+    python load_test.py --max-p99 2000              # fail if a page's p99 exceeds 2 s
+'''
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import time
+
+import numpy as np
+
+from pathlib import Path
+from streamlit.testing.v1 import AppTest
+from typing import Dict, List, Optional, Tuple
+
+
+ROOT = Path(__file__).resolve().parent
+
+PAGES = {
+    'Homepage': ROOT / '1_🏠_Homepage.py',
+    'Overview': ROOT / 'pages' / '2_🎲_5★ Wish System Overview.py',
+    'Simulator': ROOT / 'pages' / '3_🕹️_Drop Rate Simulator.py',
+    'Planner': ROOT / 'pages' / '4_🎯_Wish Planner.py',
+}
+
+# How often a step visits each page, roughly following how the app is used
+PAGE_WEIGHTS = {'Homepage': 1, 'Overview': 2, 'Simulator': 4, 'Planner': 2}
+
+# Inputs the simulated users choose from; popular values repeat, so later sessions hit the shared caches
+WISHES = (10, 50, 80, 100, 160, 200, 300)
+PITIES_5 = (1, 1, 20, 45, 60, 74)
+PITIES_4 = (1, 1, 3, 5, 8)
+
+# Seconds a single rerun may take before AppTest gives up on it
+RERUN_TIMEOUT = 300
+
+
+def rss_bytes() -> int:
+    '''
+    The current resident set size of the process, or the peak one where the current one is not available.
+    '''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Session:
+    '''
+    One simulated user, with its own AppTest of each page it has visited.
+    '''
+
+    def __init__(self, index: int, seed: int):
+        self.index = index
+        self.rng = random.Random(seed)
+        self.apps: Dict[str, AppTest] = {}
+
+    def step(self) -> Tuple[str, float, Optional[str]]:
+        '''
+        Visits a page (loading it the first time) or changes an input on it, and returns the page, the seconds the rerun took and the first exception raised, if any.
+        '''
+        page = self.rng.choices(list(PAGE_WEIGHTS), weights = list(PAGE_WEIGHTS.values()))[0]
+
+        if page not in self.apps:
+            self.apps[page] = at = AppTest.from_file(str(PAGES[page]), default_timeout = RERUN_TIMEOUT)
+        else:
+            at = self.apps[page]
+            getattr(self, f'_change_{page.lower()}')(at)
+
+        start = time.perf_counter()
+        at.run()
+        elapsed = time.perf_counter() - start
+
+        return page, elapsed, at.exception[0].value if len(at.exception) else None
+
+    def _change_homepage(self, at: AppTest):
+        # A plain rerun, e.g. coming back to the page
+        pass
+
+    def _change_overview(self, at: AppTest):
+        if self.rng.random() < 0.3:
+            banners = [option for option in at.selectbox[0].options if option != 'About']
+            at.selectbox[0].select(self.rng.choice(banners))
+        elif len(at.slider):
+            slider = self.rng.choice(list(at.slider))
+            slider.set_value(self.rng.randint(slider.min, slider.max))
+
+    def _change_simulator(self, at: AppTest):
+        at.number_input[0].set_value(self.rng.choice(WISHES))
+        at.number_input[1].set_value(min(self.rng.choice(PITIES_5), at.number_input[1].max))
+        at.number_input[2].set_value(min(self.rng.choice(PITIES_4), at.number_input[2].max))
+        at.button[0].click()
+
+    def _change_planner(self, at: AppTest):
+        at.number_input[0].set_value(self.rng.randint(1, 7))
+        at.number_input[1].set_value(min(self.rng.choice(PITIES_5), at.number_input[1].max))
+
+
+def percentiles(latencies: List[float]) -> Tuple[float, float]:
+    return tuple(float(x) for x in np.percentile(latencies, [50, 99]) * 1000) if latencies else (float('nan'), float('nan'))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = __doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type = int, default = 20, help = 'number of simulated sessions (default: %(default)s)')
+    parser.add_argument('--steps', type = int, default = 8, help = 'page visits or input changes per session (default: %(default)s)')
+    parser.add_argument('--seed', type = int, default = 0, help = 'seed of the simulated users (default: %(default)s)')
+    parser.add_argument('--max-p99', type = float, help = 'fail if the p99 rerun latency of any page exceeds this many milliseconds')
+    parser.add_argument('--json', type = argparse.FileType('w'), help = 'also write the report to this file')
+    args = parser.parse_args()
+
+    # Streamlit warns about the missing script context whenever a page module is imported outside a run
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').disabled = True
+
+    sessions = [Session(i, args.seed * 100003 + i) for i in range(args.sessions)]
+    latencies: Dict[str, List[float]] = {page: [] for page in PAGES}
+    errors: List[Tuple[int, str, str]] = []
+    rss = [rss_bytes()]
+
+    for round_index in range(args.steps):
+        for session in sessions:
+            page, elapsed, error = session.step()
+            latencies[page].append(elapsed)
+            if error is not None:
+                errors.append((session.index, page, error))
+
+        rss.append(rss_bytes())
+        done = sum(map(len, latencies.values()))
+        print(f'Round {round_index + 1}/{args.steps}: {done} reruns, RSS {rss[-1] / 2 ** 20:.0f} MiB', flush = True)
+
+    report = {'sessions': args.sessions, 'steps': args.steps, 'pages': {}, 'errors': errors,
+              'rss_start_mib': rss[0] / 2 ** 20, 'rss_after_first_round_mib': rss[1] / 2 ** 20 if len(rss) > 1 else None,
+              'rss_end_mib': rss[-1] / 2 ** 20, 'rss_peak_mib': peak_rss_bytes() / 2 ** 20}
+
+    print()
+    print(f"{'page':<12}{'reruns':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for page, values in [*latencies.items(), ('All', sum(latencies.values(), []))]:
+        p50, p99 = percentiles(values)
+        peak = max(values) * 1000 if values else float('nan')
+        report['pages'][page] = {'reruns': len(values), 'p50_ms': p50, 'p99_ms': p99, 'max_ms': peak}
+        print(f'{page:<12}{len(values):>8}{p50:>10.1f}{p99:>10.1f}{peak:>10.1f}')
+
+    print()
+    growth = rss[-1] - rss[1] if len(rss) > 1 else 0
+    print(f"RSS: {report['rss_start_mib']:.0f} MiB at start, {report['rss_end_mib']:.0f} MiB at the end (peak {report['rss_peak_mib']:.0f} MiB); "
+          f'{growth / 2 ** 20:+.1f} MiB after the first round, {growth / max(args.sessions * (args.steps - 1), 1) / 2 ** 10:+.1f} KiB per later rerun')
+
+    for session_index, page, error in errors[:10]:
+        print(f'Session {session_index} on {page}: {error}')
+    if errors:
+        print(f'{len(errors)} reruns raised an exception')
+
+    if args.json:
+        json.dump(report, args.json, indent = 2)
+
+    too_slow = args.max_p99 is not None and any(stats['p99_ms'] > args.max_p99 for page, stats in report['pages'].items() if page != 'All' and stats['reruns'])
+    return 1 if errors or too_slow else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
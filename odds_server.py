@@ -0,0 +1,457 @@
+'''
+Answers "odds for pity X, Y wishes" queries without the Streamlit UI, e.g. for a chat bot or a dashboard, through a Python API (`odds`, `compute_odds`) or a small local HTTP endpoint returning JSON or Arrow.
+
+Exact queries arriving within a short window are coalesced into one batch: identical queries are computed once, and the exact queries from the same banner and starting pities share a single pass of `sim_engine.exact_distributions` up to the largest number of wishes asked for, instead of one full computation per request. Monte Carlo queries run on a thread pool next to the batches. Results are shared with the app through `result_cache`. Run it from the repository root:
+
+    python odds_server.py                          # serve on http://127.0.0.1:8765
+    python odds_server.py --port 9000 --window 0.05
+
+    curl 'http://127.0.0.1:8765/odds?banner=character&pity_5=70&wishes=40'
+    curl 'http://127.0.0.1:8765/odds?banner=weapon&wishes=80&format=arrow' > odds.arrows
+    curl http://127.0.0.1:8765/odds -d '{"queries": [{"banner": "character", "wishes": 80}, {"banner": "weapon", "wishes": 80}]}'
+'''
+import argparse
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from dataclasses import asdict, dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from lazy_imports import lazy_import
+from outcome_table import table_simulation
+from pity_probs import BANNERS
+from result_cache import cached_simulation, result_cache, simulation_key
+from sim_engine import EXACT_MAX_WISHES, MONTE_CARLO_METHODS, banner_tables, exact_distributions
+from sim_result import RARITIES, SimulationResult
+from timings import span
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# Only needed for Arrow responses
+pa = lazy_import('pyarrow')
+
+
+# Bounds of a query, as in the simulator page
+MAX_WISHES = 10000
+MAX_ITERATIONS = 20000
+
+# Seconds a batch of exact queries keeps collecting queries after the first one arrives
+COALESCE_WINDOW = 0.01
+
+# Monte Carlo queries running at the same time
+SIMULATION_THREADS = 4
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+ARROW_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+
+@dataclass(frozen = True)
+class OddsQuery:
+    '''
+    One query: the outcome distribution of a number of wishes on a banner from given pities.
+
+    Attributes:
+        banner_type (str): The banner type, a key of `pity_probs.BANNERS`.
+        pity_4 (int): The current number of pulls since the last 4★ drop.
+        pity_5 (int): The current number of pulls since the last 5★ drop.
+        wishes (int): The number of wishes to compute the odds of.
+        method (str): 'exact', a method of `sim_engine.MONTE_CARLO_METHODS`, or 'auto' for the exact distribution up to `EXACT_MAX_WISHES` wishes and event-skipping Monte Carlo beyond.
+        iterations (int): Number of Monte Carlo iterations, or for the exact method the total the expected counts are scaled to (as in the app).
+        seed (int): Seed of a Monte Carlo simulation, or None to reuse any earlier unseeded result of the same query.
+    '''
+    banner_type: str
+    pity_4: int = 1
+    pity_5: int = 1
+    wishes: int = 100
+    method: str = 'auto'
+    iterations: int = 10000
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        if self.banner_type not in BANNERS:
+            raise ValueError(f"Unknown banner type: {self.banner_type!r}")
+
+        table_4, table_5 = banner_tables(self.banner_type)
+        for name, value, low, high in [('pity_4', self.pity_4, 1, table_4.max_pity), ('pity_5', self.pity_5, 1, table_5.max_pity),
+                                       ('wishes', self.wishes, 1, MAX_WISHES), ('iterations', self.iterations, 1, MAX_ITERATIONS)]:
+            if not low <= value <= high:
+                raise ValueError(f'{name} must be between {low} and {high}, got {value}')
+
+        if self.method not in ('auto', 'exact', *MONTE_CARLO_METHODS):
+            raise ValueError(f"Unknown simulation method: {self.method!r}")
+        if self.method == 'exact' and self.wishes > EXACT_MAX_WISHES:
+            raise ValueError(f'The exact method is only available for up to {EXACT_MAX_WISHES} wishes')
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'OddsQuery':
+        '''
+        Parses a query from JSON or URL parameters, where the banner type may also be given as 'banner' and numbers may be strings.
+        '''
+        data = dict(data)
+        if 'banner' in data:
+            data['banner_type'] = data.pop('banner')
+
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown query parameters: {', '.join(sorted(unknown))}")
+        if 'banner_type' not in data:
+            raise ValueError('Missing query parameter: banner')
+
+        try:
+            for name in ('pity_4', 'pity_5', 'wishes', 'iterations', 'seed'):
+                if data.get(name) is not None:
+                    data[name] = int(data[name])
+        except (TypeError, ValueError):
+            raise ValueError(f'{name} must be an integer, got {data[name]!r}')
+
+        return cls(**data)
+
+    @property
+    def resolved_method(self) -> str:
+        if self.method == 'auto':
+            return 'exact' if self.wishes <= EXACT_MAX_WISHES else 'event_skipping'
+        return self.method
+
+    @property
+    def key(self) -> Tuple:
+        return simulation_key(self.resolved_method, self.banner_type, self.pity_4, self.pity_5, self.wishes, self.iterations, self.seed)
+
+
+def compute_odds(queries: Sequence[OddsQuery]) -> List[SimulationResult]:
+    '''
+    Computes the results of a batch of queries, in order. Identical queries are computed once, and exact queries covered by the precomputed `outcome_table` or queries answered before come from it or from `result_cache`; the remaining exact queries are computed one pass per banner and starting pities by `_exact_start`, and Monte Carlo queries by `result_cache.cached_simulation`.
+
+    Returns:
+        List[SimulationResult]: The result of each query. Exact results are expected counts out of the query's iterations, as in `sim_engine.simulation()`.
+    '''
+    results: Dict[Tuple, SimulationResult] = {}
+    starts: Dict[Tuple[str, int, int], List[OddsQuery]] = defaultdict(list)
+
+    seen = set()
+    for query in queries:
+        key = query.key
+        if key in seen:
+            continue
+        seen.add(key)
+
+        result = _lookup(query)
+        if result is not None:
+            results[key] = result
+        elif query.resolved_method == 'exact':
+            starts[query.banner_type, query.pity_4, query.pity_5].append(query)
+        else:
+            results[key] = _simulate(query)
+
+    for start, start_queries in starts.items():
+        results.update(_exact_start(*start, start_queries))
+
+    return [results[query.key] for query in queries]
+
+
+def _lookup(query: OddsQuery) -> Optional[SimulationResult]:
+    # The result of a query without computing it, if it is in the outcome table or the result cache
+    if query.resolved_method == 'exact':
+        result = table_simulation(query.iterations, query.banner_type, query.pity_4, query.pity_5, query.wishes)
+        if result is not None:
+            return result
+
+    return result_cache.get(query.key)
+
+
+def _simulate(query: OddsQuery) -> SimulationResult:
+    # A Monte Carlo query, served from the result cache if it was answered before
+    with span('odds_simulation'):
+        return cached_simulation(query.iterations, query.banner_type, query.pity_4, query.pity_5, query.wishes, seed = query.seed, method = query.resolved_method)
+
+
+def _exact_start(banner_type: str, pity_4: int, pity_5: int, queries: List[OddsQuery]) -> Dict[Tuple, SimulationResult]:
+    # One exact pass from a starting pity, reading off every number of wishes asked for from it
+    table_4, table_5 = banner_tables(banner_type)
+    with span('odds_exact_batch'):
+        distributions = exact_distributions(table_4.hazard, table_5.hazard, pity_4, pity_5, [query.wishes for query in queries])
+
+    results = {}
+    for query in queries:
+        outcomes, probs = distributions[query.wishes]
+        results[query.key] = result_cache.put(query.key, SimulationResult(outcomes, probs * query.iterations, np.zeros(3)))
+
+    return results
+
+
+class QueryCoalescer:
+    '''
+    Collects the exact queries submitted from any thread into batches, run one at a time on a background thread. A batch starts with the first query submitted and keeps collecting for `window` seconds; queries submitted while a batch runs wait for the next one, so batches grow with the load. Within a batch, the queries from the same banner and starting pities share one pass of `_exact_start`, and a failure only fails the queries of that pass.
+
+    Monte Carlo queries gain nothing from batching, so they run on a thread pool of their own instead, where a long simulation never holds up the exact batches. Identical queries pending or running share one future.
+
+    Args:
+        window (float): Seconds a batch keeps collecting queries after the first one arrives.
+        simulation_threads (int): Number of Monte Carlo queries running at the same time, later ones wait for a free thread.
+    '''
+
+    def __init__(self, window: float = COALESCE_WINDOW, simulation_threads: int = SIMULATION_THREADS):
+        self.window = window
+        self._futures: Dict[Tuple, Future] = {}
+        self._pending: List[Tuple[OddsQuery, Future]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers = simulation_threads, thread_name_prefix = 'odds-simulation')
+
+    def submit(self, query: OddsQuery) -> Future:
+        '''
+        Queues a query and returns the future of its `SimulationResult`.
+        '''
+        key = query.key
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future
+
+            if query.resolved_method == 'exact':
+                if self._thread is None:
+                    self._thread = threading.Thread(target = self._run, name = 'odds-coalescer', daemon = True)
+                    self._thread.start()
+
+                future = Future()
+                self._pending.append((query, future))
+                self._wake.set()
+            else:
+                future = self._executor.submit(_simulate, query)
+
+            self._futures[key] = future
+
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def _forget(self, key: Tuple, future: Future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.window)
+
+            with self._lock:
+                pending, self._pending = self._pending, []
+                self._wake.clear()
+
+            # Futures cancelled by their callers are dropped, the others can no longer be cancelled
+            pending = [(query, future) for query, future in pending if future.set_running_or_notify_cancel()]
+
+            try:
+                self._run_batch(pending)
+            except Exception as e:
+                # Nothing may stop this thread, or every later exact query would wait for its timeout
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _run_batch(self, pending: List[Tuple[OddsQuery, Future]]):
+        starts: Dict[Tuple[str, int, int], List[Tuple[OddsQuery, Future]]] = defaultdict(list)
+        for query, future in pending:
+            try:
+                result = _lookup(query)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+
+            if result is not None:
+                future.set_result(result)
+            else:
+                starts[query.banner_type, query.pity_4, query.pity_5].append((query, future))
+
+        for start, items in starts.items():
+            try:
+                results = _exact_start(*start, [query for query, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+
+            for query, future in items:
+                future.set_result(results[query.key])
+
+
+# Shared by every request of the server
+coalescer = QueryCoalescer()
+
+
+def odds(query: OddsQuery, timeout: Optional[float] = None) -> dict:
+    '''
+    The JSON-ready odds of a query (see `odds_dict`), computed through `coalescer`.
+    '''
+    return odds_dict(query, coalescer.submit(query).result(timeout = timeout))
+
+
+def odds_dict(query: OddsQuery, result: SimulationResult) -> dict:
+    '''
+    The JSON-ready odds of a query: the query itself, the method used, the probability of at least one 4★ and one 5★ drop, the mean drop counts and their standard errors, summary statistics of each rarity (see `SimulationResult.describe`) and every outcome with its probability.
+    '''
+    at_least_one = {f'at_least_one_{star}': float(result.probs[result.outcomes[:, RARITIES.index(star)] > 0].sum()) for star in RARITIES[1:]}
+
+    return {'query': asdict(query),
+            'method': query.resolved_method,
+            'iterations': result.n,
+            **at_least_one,
+            'mean': dict(zip(RARITIES, result.means().tolist())),
+            'std_error': dict(zip(RARITIES, result.mean_std_error().tolist())),
+            'summary': {star: result.describe(star) for star in RARITIES},
+            'outcomes': result.outcomes.tolist(),
+            'probabilities': result.probs.tolist()}
+
+
+def odds_table(queries: Sequence[OddsQuery], results: Sequence[SimulationResult]) -> 'pa.Table':
+    '''
+    The outcomes of several queries as one long-format Arrow table, with one row per query and outcome: the index of the query, its parameters, the 3★, 4★ and 5★ drop counts and their probability.
+    '''
+    sizes = [len(result.counts) for result in results]
+    columns = {'query': np.repeat(np.arange(len(queries)), sizes)}
+    for name in ('banner_type', 'pity_4', 'pity_5', 'wishes'):
+        columns[name] = np.repeat([getattr(query, name) for query in queries], sizes)
+    columns['method'] = np.repeat([query.resolved_method for query in queries], sizes)
+
+    outcomes = np.concatenate([result.outcomes for result in results]) if results else np.zeros((0, 3), dtype = np.int64)
+    for i, star in enumerate(RARITIES):
+        columns[star] = outcomes[:, i]
+    columns['probability'] = np.concatenate([result.probs for result in results]) if results else np.zeros(0)
+
+    return pa.table(columns)
+
+
+def arrow_bytes(table: 'pa.Table') -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class OddsHandler(BaseHTTPRequestHandler):
+    '''
+    The HTTP endpoint:
+
+        GET /odds?banner=...&pity_4=...&pity_5=...&wishes=...   one query from URL parameters (any field of `OddsQuery`)
+        POST /odds   a JSON query object, or {"queries": [...]} for several
+        GET /health
+
+    Responses are JSON (see `odds_dict`, with {"results": [...]} for several queries), or an Arrow IPC stream of `odds_table` with `format=arrow` or an Accept header of `ARROW_MEDIA_TYPE`. Invalid queries get a 400 response with an "error" message, failed queries a 500 response and queries still running after `timeout_seconds` a 504 response.
+    '''
+    server_version = 'WishStatsOdds/1.0'
+
+    # Seconds a request waits for its results before failing
+    timeout_seconds = 300
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/health':
+            return self._send_json(200, {'status': 'ok'})
+        if url.path != '/odds':
+            return self._send_json(404, {'error': f'Unknown path: {url.path}'})
+
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        arrow = params.pop('format', 'json') == 'arrow'
+        self._answer(lambda: ([OddsQuery.from_dict(params)], False), arrow)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/odds':
+            return self._send_json(404, {'error': f'Unknown path: {url.path}'})
+
+        arrow = parse_qs(url.query).get('format', ['json'])[-1] == 'arrow'
+        self._answer(lambda: _parse_body(self._read_body()), arrow)
+
+    def _answer(self, parse: Callable[[], Tuple[List[OddsQuery], bool]], arrow: bool):
+        try:
+            queries, many = parse()
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError too
+            return self._send_json(400, {'error': str(e)})
+
+        futures = [coalescer.submit(query) for query in queries]
+        deadline = time.monotonic() + self.timeout_seconds
+        try:
+            results = [future.result(timeout = max(deadline - time.monotonic(), 0)) for future in futures]
+        except TimeoutError:
+            return self._send_json(504, {'error': f'The queries took longer than {self.timeout_seconds} s'})
+        except Exception as e:
+            self.log_error('Query failed: %r', e)
+            return self._send_json(500, {'error': f'The query failed: {e}'})
+
+        if arrow or ARROW_MEDIA_TYPE in self.headers.get('Accept', ''):
+            return self._send(200, ARROW_MEDIA_TYPE, arrow_bytes(odds_table(queries, results)))
+
+        answers = [odds_dict(query, result) for query, result in zip(queries, results)]
+        self._send_json(200, {'results': answers} if many else answers[0])
+
+    def _read_body(self) -> bytes:
+        # A missing or invalid Content-Length is a ValueError, answered like an invalid query
+        length = int(self.headers.get('Content-Length', 0))
+        if length < 0:
+            raise ValueError(f'Invalid Content-Length: {length}')
+        return self.rfile.read(length)
+
+    def _send_json(self, status: int, data: dict):
+        self._send(status, 'application/json', json.dumps(data).encode())
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _parse_body(body: bytes) -> Tuple[List[OddsQuery], bool]:
+    # The queries of a POST body, and whether several were asked for (as a list or under "queries")
+    data = json.loads(body or b'null')
+    many = isinstance(data, list) or (isinstance(data, dict) and 'queries' in data)
+    if isinstance(data, dict) and 'queries' in data:
+        data = data['queries']
+
+    items = data if isinstance(data, list) else [data]
+    if not items or not all(isinstance(item, dict) for item in items):
+        raise ValueError('Expected a query object, a list of them or {"queries": [...]}')
+
+    return [OddsQuery.from_dict(item) for item in items], many
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    '''
+    Creates the HTTP server of `OddsHandler`; call `serve_forever()` on it to start answering, from a thread of its own if needed.
+    '''
+    return ThreadingHTTPServer((host, port), OddsHandler)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = __doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default = DEFAULT_HOST, help = 'address to listen on (default: %(default)s, local only)')
+    parser.add_argument('--port', type = int, default = DEFAULT_PORT, help = 'port to listen on (default: %(default)s)')
+    parser.add_argument('--window', type = float, default = COALESCE_WINDOW, help = 'seconds a batch keeps collecting queries (default: %(default)s)')
+    args = parser.parse_args()
+
+    coalescer.window = args.window
+    server = serve(args.host, args.port)
+    print(f'Serving odds on http://{args.host}:{server.server_port}/odds', flush = True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
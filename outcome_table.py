@@ -0,0 +1,257 @@
+'''
+Builds and reads a precomputed, memory-mapped table of the exact outcome distributions of a range of (banner, 4★ pity, 5★ pity, wishes) inputs.
+
+The build step runs one pass of `sim_engine.exact_distributions` per banner and starting pities, and writes every distribution asked for into one compact binary file. At runtime the file is memory-mapped, so a lookup is a slice of the mapped arrays whatever the size of the table, and every process serving the app shares one copy through the page cache. `result_cache.cached_simulation` answers exact queries from the table when it covers them, and computes the others live. Run it from the repository root:
+
+    python outcome_table.py                                       # default range, written to outcome_table.bin
+    python outcome_table.py --banners character --pity-5 1-90 --wishes 1-100 --workers 4
+    python outcome_table.py --wishes 10,50,80,100,160,200,300 --out /srv/wishstats/outcome_table.bin
+
+The app reads the table from `OUTCOME_TABLE_ENV` if set, or from outcome_table.bin next to this file.
+
+File layout (little-endian): the magic bytes, the offset of the JSON header as an unsigned 64-bit integer, the records of every distribution one after the other (`RECORD_DTYPE`, in the order of `sim_engine.exact_distribution`), the int64 offsets of the first record of every entry plus the total, and the JSON header describing the covered range.
+'''
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+from pathlib import Path
+from pity_probs import BANNERS
+from sim_engine import EXACT_MAX_WISHES, banner_fingerprint, banner_tables, exact_distributions
+from sim_result import SimulationResult
+from typing import List, Optional, Sequence, Tuple
+
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_PATH = ROOT / 'outcome_table.bin'
+
+# Path of the table to serve exact queries from, instead of `DEFAULT_PATH`
+OUTCOME_TABLE_ENV = 'WISHSTATS_OUTCOME_TABLE'
+
+MAGIC = b'WSOTBL02'
+HEADER_OFFSET_DTYPE = np.dtype('<u8')
+
+# One outcome of a distribution: its 3★, 4★ and 5★ drop counts and its probability, so that a `SimulationResult` can use the mapped records as they are
+RECORD_DTYPE = np.dtype([('outcome', '<u2', (3,)), ('prob', '<f8')])
+
+# Number of scaled counts kept by each table, see `OutcomeTable.result`
+COUNTS_CACHE_SIZE = 1024
+
+# Range built when none is given: every starting pity, and the numbers of wishes most often asked for
+DEFAULT_BANNERS = ('character', 'weapon')
+DEFAULT_WISHES = '10-200:10'
+
+
+def parse_range(spec: str) -> List[int]:
+    '''
+    Parses a list of integers written as comma-separated values and inclusive ranges with an optional step, e.g. '1-10,20,50-100:10'.
+    '''
+    values = []
+    for part in spec.split(','):
+        bounds, _, step = part.partition(':')
+        low, _, high = bounds.partition('-')
+        values.extend(range(int(low), int(high or low) + 1, int(step or 1)))
+
+    return sorted(set(values))
+
+
+def _start_records(args: Tuple[str, int, int, Tuple[int, ...]]) -> List[np.ndarray]:
+    # The records of every number of wishes from one starting state, in one exact pass
+    banner_type, pity_4, pity_5, wishes = args
+    table_4, table_5 = banner_tables(banner_type)
+    distributions = exact_distributions(table_4.hazard, table_5.hazard, pity_4, pity_5, wishes)
+
+    records = []
+    for count in wishes:
+        outcomes, probs = distributions[count]
+        block = np.empty(len(probs), dtype = RECORD_DTYPE)
+        block['outcome'] = outcomes
+        block['prob'] = probs
+        records.append(block)
+
+    return records
+
+
+def build(path: Path, banners: Sequence[str], pity_4: Sequence[int], pity_5: Sequence[int], wishes: Sequence[int], workers: int = 1) -> dict:
+    '''
+    Computes the exact distribution of every covered input and writes the table to `path`, replacing it atomically once complete. Pities above the maximum pity of a banner are left out for that banner.
+
+    Returns:
+        dict: The header of the table.
+    '''
+    wishes = tuple(sorted(set(wishes)))
+    if not wishes or wishes[0] < 1 or wishes[-1] > EXACT_MAX_WISHES:
+        raise ValueError(f'Wishes must be between 1 and {EXACT_MAX_WISHES}')
+
+    header = {'wishes': list(wishes), 'banners': {}}
+    tasks = []
+    for banner_type in banners:
+        table_4, table_5 = banner_tables(banner_type)
+        pities_4 = [p for p in sorted(set(pity_4)) if 1 <= p <= table_4.max_pity]
+        pities_5 = [p for p in sorted(set(pity_5)) if 1 <= p <= table_5.max_pity]
+        header['banners'][banner_type] = {'pity_4': pities_4, 'pity_5': pities_5, 'first_entry': len(tasks) * len(wishes), 'fingerprint': banner_fingerprint(banner_type)}
+        tasks.extend((banner_type, p4, p5, wishes) for p4 in pities_4 for p5 in pities_5)
+
+    if not tasks:
+        raise ValueError('The range covers no starting pities')
+
+    temp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+    offsets = [0]
+
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(MAGIC + bytes(HEADER_OFFSET_DTYPE.itemsize))
+
+            with ProcessPoolExecutor(max_workers = workers) if workers > 1 else nullcontext() as pool:
+                for i, records in enumerate((pool.map if pool is not None else map)(_start_records, tasks)):
+                    for block in records:
+                        f.write(block.tobytes())
+                        offsets.append(offsets[-1] + len(block))
+                    if (i + 1) % 100 == 0 or i + 1 == len(tasks):
+                        print(f'{i + 1}/{len(tasks)} starting states, {offsets[-1]:,} records', flush = True)
+
+            # Aligned so that the offsets can be mapped as int64
+            f.write(bytes(-f.tell() % 8))
+            header['offsets_offset'] = f.tell()
+            header['entries'] = len(offsets) - 1
+            header['records'] = offsets[-1]
+            f.write(np.asarray(offsets, dtype = '<i8').tobytes())
+
+            header_offset = f.tell()
+            f.write(json.dumps(header).encode())
+            f.seek(len(MAGIC))
+            f.write(np.array(header_offset, dtype = HEADER_OFFSET_DTYPE).tobytes())
+    except BaseException:
+        temp_path.unlink(missing_ok = True)
+        raise
+
+    os.replace(temp_path, path)
+    return header
+
+
+class OutcomeTable:
+    '''
+    A memory-mapped outcome table written by `build`. Banners whose pity tables changed since the build are treated as not covered.
+
+    Args:
+        path (str or Path): The table file.
+
+    Raises:
+        ValueError: If the file is not an outcome table.
+    '''
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+        with open(self.path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'Not an outcome table: {self.path}')
+            header_offset = int(np.frombuffer(f.read(HEADER_OFFSET_DTYPE.itemsize), dtype = HEADER_OFFSET_DTYPE)[0])
+            f.seek(header_offset)
+            self.header = json.loads(f.read())
+
+        self.offsets = np.memmap(self.path, dtype = '<i8', mode = 'r', offset = self.header['offsets_offset'], shape = (self.header['entries'] + 1,))
+        self.records = np.memmap(self.path, dtype = RECORD_DTYPE, mode = 'r', offset = len(MAGIC) + HEADER_OFFSET_DTYPE.itemsize, shape = (self.header['records'],))
+
+        self._wishes = {count: i for i, count in enumerate(self.header['wishes'])}
+        self._banners = {}
+        for banner_type, info in self.header['banners'].items():
+            if banner_type in BANNERS and info['fingerprint'] == banner_fingerprint(banner_type):
+                self._banners[banner_type] = (info['first_entry'], {p: i for i, p in enumerate(info['pity_4'])}, {p: i for i, p in enumerate(info['pity_5'])})
+
+        self._counts = lru_cache(maxsize = COUNTS_CACHE_SIZE)(self._scaled_counts)
+
+    def _entry(self, banner_type: str, pity_4: int, pity_5: int, wishes: int) -> Optional[int]:
+        if banner_type not in self._banners or wishes not in self._wishes:
+            return None
+
+        first_entry, pities_4, pities_5 = self._banners[banner_type]
+        if pity_4 not in pities_4 or pity_5 not in pities_5:
+            return None
+
+        return first_entry + (pities_4[pity_4] * len(pities_5) + pities_5[pity_5]) * len(self._wishes) + self._wishes[wishes]
+
+    def _scaled_counts(self, entry: int, num_iter: int) -> np.ndarray:
+        counts = self.records['prob'][self.offsets[entry]:self.offsets[entry + 1]] * num_iter
+        counts.setflags(write = False)
+        return counts
+
+    def lookup(self, banner_type: str, pity_4: int, pity_5: int, wishes: int) -> Optional[np.ndarray]:
+        '''
+        The records of an input (a read-only view into the mapped file, nothing is copied), or None if the table does not cover it.
+        '''
+        entry = self._entry(banner_type, pity_4, pity_5, wishes)
+        return self.records[self.offsets[entry]:self.offsets[entry + 1]] if entry is not None else None
+
+    def result(self, num_iter: int, banner_type: str, pity_4: int, pity_5: int, wishes: int) -> Optional[SimulationResult]:
+        '''
+        The result `sim_engine.simulation(num_iter, ..., method = 'exact')` would return for an input, or None if the table does not cover it. Its outcomes are a read-only view into the mapped file; its counts, the probabilities scaled to `num_iter`, are computed once per input and number of iterations and shared as a read-only array.
+        '''
+        entry = self._entry(banner_type, pity_4, pity_5, wishes)
+        if entry is None:
+            return None
+
+        std_error = np.zeros(3)
+        std_error.setflags(write = False)
+        return SimulationResult(self.records['outcome'][self.offsets[entry]:self.offsets[entry + 1]], self._counts(entry, num_iter), std_error)
+
+
+def outcome_table() -> Optional[OutcomeTable]:
+    '''
+    The table shared by every session of the app, or None if there is none (or it cannot be read). The file is opened again once it is replaced, e.g. by a new build, so a table built while the app runs is picked up without a restart.
+    '''
+    path = os.environ.get(OUTCOME_TABLE_ENV) or DEFAULT_PATH
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return _open_table(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize = 1)
+def _open_table(path: str, mtime_ns: int, size: int) -> Optional[OutcomeTable]:
+    # Keyed on the modification time and size of the file, so that only the current version stays open
+    try:
+        return OutcomeTable(path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def table_simulation(num_iter: int, banner_type: str, pity_4: int, pity_5: int, wishes: int) -> Optional[SimulationResult]:
+    '''
+    `OutcomeTable.result` of the shared table, or None if there is no table or it does not cover the input.
+    '''
+    table = outcome_table()
+    return table.result(num_iter, banner_type, pity_4, pity_5, wishes) if table is not None else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = __doc__.strip().splitlines()[0])
+    parser.add_argument('--banners', nargs = '+', default = list(DEFAULT_BANNERS), choices = list(BANNERS), help = 'banners to cover (default: %(default)s)')
+    parser.add_argument('--pity-4', type = parse_range, default = '1-10', help = '4★ pities to cover, e.g. 1-10 (default: every pity)')
+    parser.add_argument('--pity-5', type = parse_range, default = '1-90', help = '5★ pities to cover, e.g. 1,20-90:5 (default: every pity)')
+    parser.add_argument('--wishes', type = parse_range, default = DEFAULT_WISHES, help = f'numbers of wishes to cover, at most {EXACT_MAX_WISHES} (default: %(default)s)')
+    parser.add_argument('--workers', type = int, default = 1, help = 'worker processes to build on (default: %(default)s)')
+    parser.add_argument('--out', type = Path, default = DEFAULT_PATH, help = 'file to write the table to (default: outcome_table.bin)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        header = build(args.out, args.banners, args.pity_4, args.pity_5, args.wishes, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"Wrote {header['entries']:,} distributions ({header['records']:,} outcomes, {args.out.stat().st_size / 2 ** 20:.1f} MiB) to {args.out} in {time.perf_counter() - start:.0f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
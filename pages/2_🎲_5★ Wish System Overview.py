@@ -1,15 +1,15 @@
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import requests
-import io
 
-from pity_probs import char_roll_5star, weap_roll_5star
-from streamlit_extras.badges import badge
-from collections import deque
-from scipy.stats import binom, geom
-from PIL import Image
+from pity_probs import BANNERS, Banner
+from lazy_imports import lazy_import
+from assets import load_image
+from timings import page_timings
+from plot_cache import plot_cache
+
+# Only loaded once a banner's plots are rendered
+plt = lazy_import('matplotlib.pyplot')
+mpl_figure = lazy_import('matplotlib.figure')
 
 
 # Main title
@@ -17,10 +17,7 @@ def main():
     col1, col2 = st.columns([0.045, 0.28])
     
     with col1:
-        url = 'https://github.com/tsu2000/genshin_wishes/raw/main/images/gacha.png'
-        response = requests.get(url)
-        img = Image.open(io.BytesIO(response.content))
-        st.image(img, output_format = 'png')
+        st.image(load_image('gacha.png'), output_format = 'png')
 
     with col2:
         st.title('5★ Wish System Overview')
@@ -29,348 +26,160 @@ def main():
     
     st.markdown('This feature visualises the probability mass function (PMF), cumulative distribution function (CDF), and pull outcome distributions for 5★ characters or weapons in Genshin Impact using `matplotlib`. To observe and interact with the data visualisations, please select a banner from the box below.')
 
-    topics = ['5★ Drop Rate for Permanent/Chararacter Event Banners', 
-              '5★ Drop Rate for Weapon Event Banners',
-              'About']
+    topics = {f'5★ Drop Rate for {banner.name}': banner for banner in BANNERS.values()}
 
-    topic = st.selectbox('Select a banner: ', topics)
+    topic = st.selectbox('Select a banner: ', [*topics, 'About'])
 
     st.markdown('---')
 
-    if topic == topics[0]:
-        pceb()
-    elif topic == topics[1]:
-        web()
-    elif topic == topics[2]:
+    if topic in topics:
+        banner_overview(topics[topic])
+    else:
         about()
 
 
-# Permanent/Character Event Banner 
-def pceb(): 
-    st.markdown('### Permanent/Character Event Banner Statistics:')
-    st.markdown('The probabilities for obtaining a 5★ Character (in number of pulls after pity reset) are as follows: ')
-    st.markdown('- **Base Rate:** Before **74** pulls - *Low chance (<1%)*')
-    st.markdown('- **Soft Pity:** From **74** pulls to **89** pulls - *Chance increases exponentially*')
-    st.markdown('- **Hard Pity:** Your **90**th Pull - *Guaranteed 5★*')
+# Banner statistics, driven by the banner's pity specification
+def banner_overview(banner: Banner):
+    spec = banner.spec_5star
+    table = banner.table_5star
+    item = banner.item
+    default_pull = spec.hard_pity // 3
+
+    st.markdown(f'### {banner.name} Statistics:')
+    st.markdown(f'The probabilities for obtaining a 5★ {item} (in number of pulls after pity reset) are as follows:')
+    st.markdown(f'- **Base Rate:** Before **{spec.soft_pity_start}** pulls - *Low chance (<1%)*')
+    st.markdown(f'- **Soft Pity:** From **{spec.soft_pity_start}** pulls to **{spec.hard_pity - 1}** pulls - *Chance increases exponentially*')
+    st.markdown(f'- **Hard Pity:** Your **{spec.hard_pity}**th Pull - *Guaranteed 5★*')
 
     st.markdown('&nbsp;')
     
     st.markdown('What each graph means:')
-    st.markdown('- **Base Pull Rate:** The base per-pull probability of obtaining a 5★ Character on each individual pull after pity reset')
-    st.markdown('- **Cumulative Probability (CDF):** The **cumulative** probability of obtaining a 5★ Character on your current pull or before that')
-    st.markdown('- **Distribution of Successful Pulls (PMF):** Where 5★ Character drops are most likely to occur between the pity reset and hard pity')
+    st.markdown(f'- **Base Pull Rate:** The base per-pull probability of obtaining a 5★ {item} on each individual pull after pity reset')
+    st.markdown(f'- **Cumulative Probability (CDF):** The **cumulative** probability of obtaining a 5★ {item} on your current pull or before that')
+    st.markdown(f'- **Distribution of Successful Pulls (PMF):** Where 5★ {item} drops are most likely to occur between the pity reset and hard pity')
 
     st.markdown('---')
     
-    roll_dict = char_roll_5star
-    
-    # Calculating cumulative probabilities
-    @st.cache_data
-    def prob_mul(n):
-        if n == 75:
-            return (1 - roll_dict[74])
-        else:
-            return (1 - roll_dict[n - 1]) * prob_mul(n - 1) 
-    
-    prob_75to89 = [binom.cdf(0, 73, 0.006) * prob_mul(x) * roll_dict[x] for x in range(75, 90)]
-    prob_75to89 = np.cumsum(prob_75to89) + geom.cdf(73, 0.006) + binom.cdf(0, 73, 0.006) * roll_dict[74]
-    prob_75to89_dict = {num: prob_75to89[num - 75] for num in range(75, 90)}
-
-    @st.cache_data
-    def roll_cum_probs(x):
-        if x < 74:
-            return geom.cdf(x, 0.006)
-
-        elif x == 74:
-            return geom.cdf(73, 0.006) + binom.cdf(0, 73, 0.006) * roll_dict[74]
+    ### Defining plots (static parts are cached in `plot_cache`, only the slider-dependent parts are redrawn)
+    def base_figure():
+        plt.style.use('seaborn-v0_8-whitegrid')
+        fig = mpl_figure.Figure(figsize = (12, 6), dpi = 300)
+        ax = fig.subplots()
+        ax.set_xticks(np.arange(0, spec.hard_pity + 10, 10))
+        return fig
 
-        elif x >= 74 and x < 90:
-            return prob_75to89_dict[x]
+    def rate_base():
+        #### BASE PULL RATE ####
+        fig = base_figure()
+        ax = fig.axes[0]
 
-        else:
-            return 1
+        ax.plot(table.pulls, table.hazard[1:], color = 'blue')
 
-    roll_cum_dict = {num: roll_cum_probs(num) for num in range(1, 91)}
-    
-    ### Calculating Distribution of Successful Pulls
-    d = deque(roll_cum_dict.values())
-    d.pop()
-    d.appendleft(0)
-    subd = np.array(d)
-    cumd = np.array(list(roll_cum_dict.values()))
-    succ_pull_probs = list(cumd - subd)
-    succ_pull_dict = {num: succ_pull_probs[num - 1] for num in range(1, 91)}
-    
-    ### Defining plots
-    def plot1():   
-        #### PLOT 1 ####
-        fig, ax = plt.subplots(figsize = (12, 6), dpi = 300)
-        sns.set_style('whitegrid')
+        # Title, Axes Labels
+        ax.set_title(f'Base Pull Rate of obtaining a 5-star {item} at each pull after pity reset')
+        ax.set_ylabel('Probability')
+        ax.set_xlabel('Number of Pulls')
+        return fig
 
-        ax = plt.plot(roll_dict.keys(), roll_dict.values(), color = 'blue')
+    def rate_marker(fig, xi):
+        ax = fig.axes[0]
 
         # Vertical line, point and text
-        plt.axvline(xi, linestyle = '--', color = 'blue')
-        plt.plot(xi, roll_dict[xi], marker = 'o', color = 'black')
-        plt.text(xi - 7, roll_dict[xi] + 0.025, '{} pull(s)'.format(int(xi)), fontsize = 10, color = 'blue')
+        artists = [ax.axvline(xi, linestyle = '--', color = 'blue'),
+                   *ax.plot(xi, table.hazard[xi], marker = 'o', color = 'black'),
+                   ax.text(xi - 7, table.hazard[xi] + 0.025, '{} pull(s)'.format(int(xi)), fontsize = 10, color = 'blue')]
 
         # Text box
-        rxi = round(roll_dict[xi], 8)
-        textstr = "\n".join([r'Base Rate of obtaining a 5-star Character on Pull No. $\bf{%s}$:' % str(xi),
+        rxi = round(table.hazard[xi], 8)
+        textstr = "\n".join([r'Base Rate of obtaining a 5-star %s on Pull No. $\bf{%s}$:' % (item, str(xi)),
                              f'{rxi}' + ' (around ' + r"$\bf{" + str(round(rxi * 100, 2)) + "\%}$" + ')'])
         props = dict(boxstyle = 'round', facecolor = 'lightcyan')
-        plt.text(-1.25, 1, textstr, fontsize = 12, va = 'top', bbox = props)
-
-        # Title, Axes Labels
-        plt.title('Base Pull Rate of obtaining a 5-star Character at each pull after pity reset')
-        plt.ylabel('Probability')
-        plt.xlabel('Number of Pulls')
-
-        plt.xticks(np.arange(0, 91, 10))
-        return fig
+        artists.append(ax.text(-1.25, 1, textstr, fontsize = 12, va = 'top', bbox = props))
+        return artists
         #################
 
-    def plot2():    
-        #### PLOT 2 ####
-        fig, ax = plt.subplots(figsize = (12, 6), dpi = 300)
-        sns.set_style('whitegrid')
+    def cdf_base():
+        #### CUMULATIVE PROBABILITY ####
+        fig = base_figure()
+        ax = fig.axes[0]
 
-        plt.plot(roll_cum_dict.keys(), roll_cum_dict.values(), color = 'red')
-
-        # Vertical line, point and text
-        plt.axvline(xc, linestyle = '--', color = 'red')
-        plt.plot(xc, roll_cum_dict[xc], marker = 'o', color = 'black')
-        plt.text(xc - 7, roll_cum_dict[xc] + 0.025, '{} pull(s)'.format(int(xc)), fontsize = 10, color = 'r')
+        ax.plot(table.pulls, table.cdf[1:], color = 'red')
 
         # Horizontal line (Median Probability)
-        plt.text(-3, 0.52, 'Median (50% chance of obtaining a 5-star Character before/after horizontal line) ', fontsize = 10)
-        plt.axhline(0.500, linestyle = ':', color = 'black')
-
-        # Text box
-        rxc = round(roll_cum_dict[xc], 8)
-        textstr = "\n".join([r'Chance of obtaining a 5-star Character by $\bf{%s}$ pull(s) or less:' % str(xc),
-                             f'{rxc}' + ' (around ' + r"$\bf{" + str(round(rxc * 100, 2)) + "\%}$" + ')'])
-        props = dict(boxstyle = 'round', facecolor = 'wheat')
-        plt.text(-1.25, 1, textstr, fontsize = 12, va = 'top', bbox = props)
+        ax.text(-3, 0.52, f'Median (50% chance of obtaining a 5-star {item} before/after horizontal line) ', fontsize = 10)
+        ax.axhline(0.500, linestyle = ':', color = 'black')
 
-        plt.title(f'Cumulative Distribution Function (CDF) of obtaining an 5-star Character within {xc} number of pulls')
-        plt.ylabel('Cumulative Probability of getting a 5-star Character', labelpad = 15)
-        plt.xlabel('Cumulative Number of Pulls', labelpad = 10)
-
-        plt.xticks(np.arange(0, 91, 10))
+        ax.set_ylabel(f'Cumulative Probability of getting a 5-star {item}', labelpad = 15)
+        ax.set_xlabel('Cumulative Number of Pulls', labelpad = 10)
         return fig
-        #################
-
-    def plot3():   
-        #### PLOT 3 ####
-        fig, ax = plt.subplots(figsize = (12, 6), dpi = 300)
-        sns.set_style('whitegrid')
 
-        plt.plot(succ_pull_dict.keys(), succ_pull_dict.values(), color = 'green')
+    def cdf_marker(fig, xc):
+        ax = fig.axes[0]
 
         # Vertical line, point and text
-        plt.axvline(xs, linestyle = '--', color = 'green')
-        plt.plot(xs, succ_pull_dict[xs], marker = 'o', color = 'black')
-        plt.text(xs - 7, succ_pull_dict[xs] + 0.0025, '{} pull(s)'.format(int(xs)), fontsize = 10, color = 'green')
+        artists = [ax.axvline(xc, linestyle = '--', color = 'red'),
+                   *ax.plot(xc, table.cdf[xc], marker = 'o', color = 'black'),
+                   ax.text(xc - 7, table.cdf[xc] + 0.025, '{} pull(s)'.format(int(xc)), fontsize = 10, color = 'r')]
 
         # Text box
-        rxs = round(succ_pull_dict[xs], 8)
-        textstr = "\n".join([r'Actual Probability of successfully obtaining a 5-star Character on Pull No. $\bf{%s}$:' % str(xs),
-                             f'{rxs}' + ' (around ' + r"$\bf{" + str(round(rxs * 100, 2)) + "\%}$" + ')'])
-        props = dict(boxstyle = 'round', facecolor = 'greenyellow')
-        plt.text(-1.25, 0.105, textstr, fontsize = 12, va = 'top', bbox = props)
-
-        # Title, Axes Labels
-        plt.title('Distribution of Successful Pulls (Where 5-star Characters are pulled the most)')
-        plt.ylabel('Probability of getting a 5-star Character', labelpad = 15)
-        plt.xlabel('Number of Pulls', labelpad = 10)
+        rxc = round(table.cdf[xc], 8)
+        textstr = "\n".join([r'Chance of obtaining a 5-star %s by $\bf{%s}$ pull(s) or less:' % (item, str(xc)),
+                             f'{rxc}' + ' (around ' + r"$\bf{" + str(round(rxc * 100, 2)) + "\%}$" + ')'])
+        props = dict(boxstyle = 'round', facecolor = 'wheat')
+        artists.append(ax.text(-1.25, 1, textstr, fontsize = 12, va = 'top', bbox = props))
 
-        plt.xticks(np.arange(0, 91, 10))
-        return fig
+        # The title depends on the slider, and is simply overwritten on each render
+        ax.set_title(f'Cumulative Distribution Function (CDF) of obtaining an 5-star {item} within {xc} number of pulls')
+        return artists
         #################
-    
-    ### Returning plots
-    st.markdown('### Base Pull Rate')
-    xi = st.slider('Choose number of pulls after your last 5★ Character to see the base probability rate of getting a 5★ character at each number of pulls at your current level:', 1, 90, 30)  
-    st.pyplot(plot1())
-
-    st.markdown('---')
-    
-    st.markdown('### Cumulative Probability')
-    xc = st.slider('Choose number of pulls after your last 5★ Character to see the cumulative probability of getting a 5★ character within your set number of pulls:', 1, 90, 30)
-    st.pyplot(plot2())
-
-    st.markdown('---')
-    
-    st.markdown('### Distribution of Successful Pulls')
-    xs = st.slider('Choose number of pulls after your last 5★ Character to see how likely you are to pull a 5★ character at your exact current pity:', 1, 90, 30)
-    st.pyplot(plot3())
-    
-    st.markdown("---")
-
-
-# Weapon Event Banner
-def web(): 
-    st.markdown('### Weapon Event Banner Statistics:')
-    st.markdown('The probabilities for obtaining a 5★ Weapon (in number of pulls after pity reset) are as follows:')
-  
-    st.markdown('- **Base Rate:** Before **63** pulls - *Low chance (<1%)*')
-    st.markdown('- **Soft Pity:** From **63** pulls to **76** pulls - *Chance increases exponentially*')
-    st.markdown('- **Hard Pity:** Your **77**th Pull - *Guaranteed 5★*')
-
-    st.markdown('&nbsp;')
-    
-    st.markdown('What each graph means:')
-    st.markdown('- **Base Pull Rate:** The base per-pull probability of obtaining a 5★ Weapon on each individual pull after pity reset')
-    st.markdown('- **Cumulative Probability (CDF):** The **cumulative probability** of obtaining a 5★ Weapon on your current pull or before that')
-    st.markdown('- **Distribution of Successful Pulls (PMF):** Where 5★ Weapon drops are most likely to occur between the pity reset and hard pity')
-    
-    st.markdown('---')
-    
-    roll_dict = weap_roll_5star
-    
-    # Calculating cumulative probabilities
-    @st.cache_data
-    def prob_mul(n):
-        if n == 64:
-            return (1 - roll_dict[63])
-        else:
-            return (1 - roll_dict[n - 1]) * prob_mul(n - 1) 
-    
-    prob_64to76 = [binom.cdf(0, 62, 0.007) * prob_mul(x) * roll_dict[x] for x in range(64, 77)]
-    prob_64to76 = np.cumsum(prob_64to76) + geom.cdf(62, 0.007) + binom.cdf(0, 62, 0.007) * roll_dict[63]
-    prob_64to76_dict = {num: prob_64to76[num - 64] for num in range(64, 77)}
-    
-    @st.cache_data
-    def roll_cum_probs(x):
-        if x < 63:
-            return geom.cdf(x, 0.007)
-
-        elif x == 63:
-            return geom.cdf(62, 0.007) + binom.cdf(0, 62, 0.007) * roll_dict[63]
-
-        elif x >= 64 and x < 77:
-            return prob_64to76_dict[x]
-
-        else:
-            return 1
 
-    roll_cum_dict = {num: roll_cum_probs(num) for num in range(1, 78)}
-    
-    ### Calculating Distribution of Successful Pulls  
-    d = deque(roll_cum_dict.values())
-    d.pop()
-    d.appendleft(0)
-    subd = np.array(d)
-    cumd = np.array(list(roll_cum_dict.values()))
-    succ_pull_probs = list(cumd - subd)
-    succ_pull_dict = {num: succ_pull_probs[num - 1] for num in range(1, 78)}
-    
-    ### Defining plots
-    def plot4():    
-        #### PLOT 4 ####
-        fig, ax = plt.subplots(figsize = (12, 6), dpi = 300)
-        sns.set_style('whitegrid')
-
-        ax = plt.plot(roll_dict.keys(), roll_dict.values(), color = 'blue')
+    def pmf_base():
+        #### DISTRIBUTION OF SUCCESSFUL PULLS ####
+        fig = base_figure()
+        ax = fig.axes[0]
 
-        # Vertical line, point and text
-        plt.axvline(xi, linestyle = '--', color = 'blue')
-        plt.plot(xi, roll_dict[xi], marker = 'o', color = 'black')
-        plt.text(xi - 7, roll_dict[xi] + 0.025, '({} pulls)'.format(int(xi)), fontsize = 10, color = 'blue')
-
-        # Text box
-        rxi = round(roll_dict[xi], 8)
-        textstr = "\n".join([r'Base Rate of obtaining a 5-star Weapon on Pull No. $\bf{%s}$:' % str(xi),
-                             f'{rxi}' + ' (around ' + r"$\bf{" + str(round(rxi * 100, 2)) + "\%}$" + ')'])
-        props = dict(boxstyle = 'round', facecolor = 'lightcyan')
-        plt.text(-1.25, 1, textstr, fontsize = 12, va = 'top', bbox = props)
+        ax.plot(table.pulls, table.pmf[1:], color = 'green')
 
         # Title, Axes Labels
-        plt.title('Base Pull Rate of obtaining a 5-star Weapon at each pull after pity reset')
-        plt.ylabel('Probability')
-        plt.xlabel('Number of Pulls')
-
-        plt.xticks(np.arange(0, 81, 10))
+        ax.set_title(f'Distribution of Successful Pulls (Where 5-star {item}s are pulled the most)')
+        ax.set_ylabel(f'Probability of getting a 5-star {item}', labelpad = 15)
+        ax.set_xlabel('Number of Pulls', labelpad = 10)
         return fig
-        #################
-
-    def plot5():    
-        #### PLOT 2 ####
-        fig, ax = plt.subplots(figsize = (12, 6), dpi = 300)
-        sns.set_style('whitegrid')
 
-        plt.plot(roll_cum_dict.keys(), roll_cum_dict.values(), color = 'red')
+    def pmf_marker(fig, xs):
+        ax = fig.axes[0]
 
         # Vertical line, point and text
-        plt.axvline(xc, linestyle = '--', color = 'red')
-        plt.plot(xc, roll_cum_dict[xc], marker = 'o', color = 'black')
-        plt.text(xc - 7, roll_cum_dict[xc] + 0.025, '({} pulls)'.format(int(xc)), fontsize = 10, color = 'r')
+        artists = [ax.axvline(xs, linestyle = '--', color = 'green'),
+                   *ax.plot(xs, table.pmf[xs], marker = 'o', color = 'black'),
+                   ax.text(xs - 7, table.pmf[xs] + 0.0025, '{} pull(s)'.format(int(xs)), fontsize = 10, color = 'green')]
 
-        # Horizontal line (Median Probability)
-        plt.text(-3, 0.52, 'Median (50% chance of obtaining a 5-star Weapon before/after horizontal line) ', fontsize = 10)
-        plt.axhline(0.500, linestyle = ':', color = 'black')
-
-        # Text box
-        rxc = round(roll_cum_dict[xc], 8)
-        textstr = "\n".join([r'Chance of obtaining a 5-star Weapon by $\bf{%s}$ pull(s) or less:' % str(xc),
-                             f'{rxc}' + ' (around ' + r"$\bf{" + str(round(rxc * 100, 2)) + "\%}$" + ')'])
-        props = dict(boxstyle = 'round', facecolor = 'wheat')
-        plt.text(-1.25, 1, textstr, fontsize = 12, va = 'top', bbox = props)
-
-        plt.title(f'Cumulative Distribution Function (CDF) of obtaining an 5-star Weapon within {xc} number of pulls')
-        plt.ylabel('Cumulative Probability of getting a 5-star Weapon', labelpad = 15)
-        plt.xlabel('Cumulative Number of Pulls', labelpad = 10)
-
-        plt.xticks(np.arange(0, 81, 10))
-        return fig
-        #################
-
-    def plot6():    
-        #### PLOT 6 ####
-        fig, ax = plt.subplots(figsize = (12, 6), dpi = 300)
-        sns.set_style('whitegrid')
-
-        plt.plot(succ_pull_dict.keys(), succ_pull_dict.values(), color = 'green')
-
-        # Vertical line, point and text
-        plt.axvline(xs, linestyle = '--', color = 'green')
-        plt.plot(xs, succ_pull_dict[xs], marker = 'o', color = 'black')
-        plt.text(xs - 7, succ_pull_dict[xs] + 0.0025, '({} pulls)'.format(int(xs)), fontsize = 10, color = 'green')
-
-        # Text box
-        rxs = round(succ_pull_dict[xs], 8)
-        textstr = "\n".join([r'Actual Probability of successfully obtaining a 5★ Weapon on Pull No. $\bf{%s}$:' % str(xs),
+        # Text box, level with the peak of the distribution
+        rxs = round(table.pmf[xs], 8)
+        textstr = "\n".join([r'Actual Probability of successfully obtaining a 5-star %s on Pull No. $\bf{%s}$:' % (item, str(xs)),
                              f'{rxs}' + ' (around ' + r"$\bf{" + str(round(rxs * 100, 2)) + "\%}$" + ')'])
         props = dict(boxstyle = 'round', facecolor = 'greenyellow')
-        plt.text(-1.25, 0.115, textstr, fontsize = 12, va = 'top', bbox = props)
-
-        # Title, Axes Labels
-        plt.title('Distribution of Successful Pulls (Where 5-star Weapons are pulled the most)')
-        plt.ylabel('Probability of getting a 5-star Weapon', labelpad = 15)
-        plt.xlabel('Number of Pulls', labelpad = 10)
-
-        plt.xticks(np.arange(0, 81, 10))
-        return fig
+        artists.append(ax.text(-1.25, round(table.pmf.max(), 3), textstr, fontsize = 12, va = 'top', bbox = props))
+        return artists
         #################
-        
+    
     ### Returning plots
     st.markdown('### Base Pull Rate')
-    xi = st.slider('Choose number of pulls after your last 5★ Weapon to see the base probability rate of getting a 5★ Weapon at each number of pulls at your current level:', 1, 77, 25)
-    st.pyplot(plot4())
+    xi = st.slider(f'Choose number of pulls after your last 5★ {item} to see the base probability rate of getting a 5★ {item} at each number of pulls at your current level:', 1, spec.hard_pity, default_pull)
+    st.image(plot_cache.render((banner.key, 'rate'), rate_base, rate_marker, xi), use_container_width = True)
 
     st.markdown('---')
     
     st.markdown('### Cumulative Probability')
-    xc = st.slider('Choose number of pulls after your last 5★ Weapon to see the cumulative probability of getting a 5★ Weapon within your set number of pulls:', 1, 77, 25)
-    st.pyplot(plot5())
+    xc = st.slider(f'Choose number of pulls after your last 5★ {item} to see the cumulative probability of getting a 5★ {item} within your set number of pulls:', 1, spec.hard_pity, default_pull)
+    st.image(plot_cache.render((banner.key, 'cdf'), cdf_base, cdf_marker, xc), use_container_width = True)
 
     st.markdown('---')
-
+    
     st.markdown('### Distribution of Successful Pulls')
-    xs = st.slider('Choose number of pulls after your last 5★ Weapon to see how likely you are to pull a 5★ Weapon at your exact current pity:', 1, 77, 25)
-    st.pyplot(plot6())
-
+    xs = st.slider(f'Choose number of pulls after your last 5★ {item} to see how likely you are to pull a 5★ {item} at your exact current pity:', 1, spec.hard_pity, default_pull)
+    st.image(plot_cache.render((banner.key, 'pmf'), pmf_base, pmf_marker, xs), use_container_width = True)
+    
     st.markdown("---")
 
 
@@ -385,4 +194,5 @@ def about():
 
 if __name__ == "__main__":
     st.set_page_config(page_title = 'Genshin Impact WishStats', page_icon = '🎲')
-    main()
+    with page_timings('5★ Wish System Overview'):
+        main()
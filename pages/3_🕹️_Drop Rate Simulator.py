@@ -1,165 +1,305 @@
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import altair as alt
 
-import requests
-import random
-import io
+import os
+import threading
 
-from pity_probs import char_roll_5star, char_roll_4star, weap_roll_5star, weap_roll_4star
-from collections import Counter
-from streamlit_extras.badges import badge
-from typing import Dict, Tuple
-from PIL import Image
+from sim_engine import stream_simulation, relative_ci_width, banner_tables, compare_scenarios, EXACT_MAX_WISHES, SAMPLERS
+from sim_result import RARITIES
+from result_cache import result_cache, cached_simulation, simulation_key
+from background import run_in_background
+from sim_result import SimulationResult
+from pity_probs import BANNERS
+from lazy_imports import lazy_import
+from assets import load_image
+from wish_history import BannerHistory, parse_history_bytes
+from timings import page_timings, span
+from typing import Callable, List, Optional
+
+# Only loaded on the code paths that draw the chart and the summary table
+pd = lazy_import('pandas')
+alt = lazy_import('altair')
+go = lazy_import('plotly.graph_objects')
+
+# Number of most frequent outcomes drawn as separate bars, all other outcomes are aggregated into one bar
+TOP_K = 25
+
+# Calculation methods offered, keyed by display name
+METHODS = {'Exact (Markov chain)': 'exact',
+           'Monte Carlo simulation': 'monte_carlo',
+           'Monte Carlo simulation, skipping from drop to drop (faster for many wishes)': 'event_skipping'}
 
 
 def main():
     col1, col2 = st.columns([0.045, 0.28])
     
     with col1:
-        url = 'https://github.com/tsu2000/genshin_wishes/raw/main/images/simulation_2.png'
-        response = requests.get(url)
-        img = Image.open(io.BytesIO(response.content))
-        st.image(img, output_format = 'png')
+        st.image(load_image('simulation_2.png'), output_format = 'png')
 
     with col2:
         st.title('Drop Rate Simulator')
 
     st.markdown('### 🕹️ &nbsp; Combined 3★/4★/5★ drop rate simulation')
 
-    st.markdown('This feature simulates the combined drop rates of 4★ and 5★ characters or weapons (and resulting 3★ weapons) in Genshin Impact based on theoretical probabilities and user-defined inputs. As in the game, the simulation will prioritise a 5★ drop over a 4★ drop, even if the 4★ pity is guaranteed. To calculate your current 5★ (or 4★) pity, open your wish history for the relevant banner and count the number of non-5★ (or non-4★) items you have received since the last one before adding 1. *(Pity cannot be 0; it reflects the number of pulls since your last 5★/4★ item)*')
+    st.markdown('This feature simulates the combined drop rates of 4★ and 5★ characters or weapons (and resulting 3★ weapons) in Genshin Impact based on theoretical probabilities and user-defined inputs. As in the game, the simulation will prioritise a 5★ drop over a 4★ drop, even if the 4★ pity is guaranteed. To calculate your current 5★ (or 4★) pity, open your wish history for the relevant banner and count the number of non-5★ (or non-4★) items you have received since the last one before adding 1, or import your wish history below to fill it in automatically. *(Pity cannot be 0; it reflects the number of pulls since your last 5★/4★ item)*')
 
     st.markdown('---')
 
     st.markdown('### User inputs:')    
 
-    banner_select = st.selectbox('Choose a banner:', ['Character Event/Standard Banner', 'Weapon Event Banner'])
-    bt = 'character' if banner_select == 'Character Event/Standard Banner' else 'weapon'
+    imported = import_wish_history()
+    banner_index = list(BANNERS).index(imported.banner_type) if imported else 0
+
+    bt = st.selectbox('Choose a banner:', list(BANNERS), index = banner_index, format_func = lambda key: BANNERS[key].name)
+    banner_select = BANNERS[bt].name
+
+    table_4star, table_5star = banner_tables(bt)
+    max_pity_5star = table_5star.max_pity
+    max_pity_4star = table_4star.max_pity
+
+    # Edits only take effect on submit, so typing a number does not start a simulation per keystroke
+    with st.form('simulation_inputs', border = False):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            wishes_count = st.number_input('Enter number of wishes you have:', value = 100, min_value = 1, max_value = 10000)
+        with col2:
+            pity_count_5star =  st.number_input('Enter current 5★ pity you are at:', value = min(imported.pity_5, max_pity_5star) if imported else 1, min_value = 1, max_value = max_pity_5star)
+        with col3:
+            pity_count_4star =  st.number_input('Enter current 4★ pity you are at:', value = min(imported.pity_4, max_pity_4star) if imported else 1, min_value = 1, max_value = max_pity_4star)
+
+        st.form_submit_button('Run simulation')
+
+    method = METHODS[st.selectbox('Choose a calculation method:', list(METHODS))]
+
+    if method == 'exact' and wishes_count > EXACT_MAX_WISHES:
+        st.info(f'The exact calculation is only available for up to {EXACT_MAX_WISHES} wishes. Falling back to a Monte Carlo simulation.')
+        method = 'event_skipping'
+
+    if method == 'exact':
+        # Exact probabilities are scaled to the default number of iterations to show expected counts
+        num_simulations = 10000
+    else:
+        num_simulations = st.slider('Select number of iterations for the simulation:', value = 10000, min_value = 100, max_value = 20000)
+
+    top_k = None if st.checkbox('Draw every distinct outcome in the chart instead of the most frequent ones (slow for many wishes)') else TOP_K
+
+    seed, workers, stream, sampler = None, 1, False, 'independent'
+    if method != 'exact':
+        with st.expander('Advanced simulation settings'):
+            seed = st.number_input('Random seed (leave empty to reuse any earlier result for the same inputs):', value = None, min_value = 0, step = 1)
+            if method == 'monte_carlo':
+                sampler = st.selectbox('Sampling method (variance-reduced samplers give more precise averages for the same number of iterations):', list(SAMPLERS), format_func = SAMPLERS.get)
+            if sampler == 'independent':
+                stream = st.checkbox('Show results while simulating and stop early once they are precise enough (the number of iterations becomes a maximum)', value = True)
+            else:
+                st.caption('Results of a variance-reduced sampler are shown once every iteration is simulated, as its standard errors are estimated from the whole run.')
+            if stream:
+                target_rel_width = st.number_input('Stop when the 95% confidence interval of every charted probability is at most this wide, relative to the probability (%):', value = 20.0, min_value = 5.0, max_value = 100.0, step = 5.0, help = 'E.g. 20% stops once each probability is known to within ±10% of its value. Outcomes spread over many wishes are each unlikely and need more iterations, so the simulation may run to the maximum. Bars shorter than a tenth of the tallest one in their chart are not checked.') / 100
+            elif sampler == 'independent':
+                workers = st.number_input('Number of worker processes:', value = 1, min_value = 1, max_value = os.cpu_count() or 1)
+
+    if stream:
+        st.markdown(f'### Wish distribution - {banner_select}')
+        chart_slot = st.empty()
+        status_slot = st.empty()
+        marginal_slot = st.empty()
+
+        st.markdown('### DataFrame Results:')
+        df_slot = st.empty()
+
+        def show(result: SimulationResult, status: str):
+            with span('chart'):
+                chart = freq_chart(result, f'Simulation of n = {result.n:.0f}', top_k)
+                marginals = marginal_chart(result)
+
+            chart_slot.altair_chart(chart, use_container_width = True)
+            marginal_slot.altair_chart(marginals, use_container_width = True)
+            df_slot.dataframe(result.to_frame(), use_container_width = True)
+            status_slot.caption(status)
+            return chart, result
+
+        key = simulation_key(method, bt, pity_count_4star, pity_count_5star, wishes_count, num_simulations, seed, target_rel_width)
+        cached = result_cache.get(key)
+
+        if cached is not None:
+            final_sim = show(cached, f'{cached.n:.0f} of up to {num_simulations} iterations - cached result')
+        else:
+            for histogram in stream_simulation(num_simulations, bt, pity_count_4star, pity_count_5star, wishes_count, seed = seed, target_rel_width = target_rel_width, method = method):
+                result = SimulationResult.from_histogram(histogram)
+                final_sim = show(result, f"{result.n:.0f} of up to {num_simulations} iterations - widest relative 95% confidence interval: {relative_ci_width(histogram):.0%}")
 
-    col1, col2, col3 = st.columns(3)
-    max_pity_5star = 90 if bt == 'character' else 77
-    max_pity_4star = 10 if bt == 'character' else 9
-    with col1:
-        wishes_count = st.number_input('Enter number of wishes you have:', value = 100, min_value = 1, max_value = 10000)
-    with col2:
-        pity_count_5star =  st.number_input('Enter current 5★ pity you are at:', value = 1, min_value = 1, max_value = max_pity_5star)
-    with col3:
-        pity_count_4star =  st.number_input('Enter current 4★ pity you are at:', value = 1, min_value = 1, max_value = max_pity_4star)
-    num_simulations = st.slider('Select number of iterations for the simulation:', value = 10000, min_value = 100, max_value = 20000)
+            result_cache.put(key, final_sim[1])
 
-    final_sim = combined_freq_graph(n_iter = num_simulations, pity_4 = pity_count_4star, pity_5 = pity_count_5star, banner_type = bt, num_wishes = wishes_count)
+    else:
+        st.markdown(f'### Wish distribution - {banner_select}')
+        status_slot = st.empty()
+        final_sim = combined_freq_graph(n_iter = num_simulations, pity_4 = pity_count_4star, pity_5 = pity_count_5star, banner_type = bt, num_wishes = wishes_count, method = method, seed = seed, workers = workers, top_k = top_k, sampler = sampler,
+                                        on_wait = lambda elapsed: status_slot.caption(f'Calculating... ({elapsed:.1f} s) - changing the inputs cancels this run'))
+        status_slot.empty()
 
-    st.markdown(f'### Wish distribution - {banner_select}')
-    st.altair_chart(final_sim[0], use_container_width = True)
+        st.altair_chart(final_sim[0], use_container_width = True)
 
-    st.markdown('### DataFrame Results:')
-    st.dataframe(final_sim[1], use_container_width = True)
+        with span('chart'):
+            marginals = marginal_chart(final_sim[1])
+        st.altair_chart(marginals, use_container_width = True)
+
+        st.markdown('### DataFrame Results:')
+        st.dataframe(final_sim[1].to_frame(), use_container_width = True)
 
     st.markdown('### Comprehensive summary statistics for all rarity drops:')
 
-    def describe_rarity(star):
-        df = final_sim[1][[star, 'Count']]
-        result = pd.Series([x for index, row in df.iterrows() for x in [row[star]] * row['Count']])
+    with span('summary'):
+        df = final_sim[1].summary()
+        table = summary_table(df)
 
-        summary = result.describe().to_dict()
+    st.plotly_chart(table, use_container_width = True)
 
-        # Find median and mode
-        mode = result.mode().values[0]
+    if method != 'exact':
+        means, std_errors = final_sim[1].means(), final_sim[1].mean_std_error()
+        st.caption('Mean drops ± standard error: ' + ', '.join(f'{star} {mean:.3f} ± {se:.4f}' for star, mean, se in zip(RARITIES, means, std_errors))
+                   + (f' - sampler: {SAMPLERS[sampler]}' if method == 'monte_carlo' else ''))
 
-        # Add median and mode to summary statistics
-        summary.update({'mode': mode})
-        summary_stats = pd.Series(summary).to_frame().rename(columns = {0: star})
+        compare_scenario(bt, pity_count_4star, pity_count_5star, wishes_count, num_simulations, sampler, seed, max_pity_4star, max_pity_5star)
 
-        return summary_stats
+    st.markdown('---')
 
-    df = pd.concat([describe_rarity('3★'), describe_rarity('4★'), describe_rarity('5★')], axis = 1).T
 
-    st.plotly_chart(summary_table(df), use_container_width = True)
+@st.cache_data(show_spinner = 'Reading wish history...', max_entries = 8)
+def read_wish_history(data: bytes, name: str) -> List[BannerHistory]:
+    return parse_history_bytes(data, name)
 
-    st.markdown('---')
 
-
-def simulate_rolls(prob_4: Dict[int, float], prob_5: Dict[int, float], pity_4: int, pity_5: int, num_rolls: int) -> Tuple[int, int, int]:
+def import_wish_history() -> Optional[BannerHistory]:
     '''
-    
-    A function that simulates the number of 3★, 4★ and 5★ drops obtained from a specified number of gacha rolls.
-
-    Args:
-        prob_4 (Dict[int, float]): A dictionary of probabilities of 4★ items with the key being the nth pull after the previous 4★ drop and value being the probability of a 4★ drop at the nth pull.
-        prob_5 (Dict[int, float]): A dictionary of probabilities of 5★ items with the key being the nth pull after the previous 5★ drop and value being the probability of a 5★ drop at the nth pull.
-        pity_4 (int): The user's current number of pulls since the last 4★ drop. 
-        pity_5 (int): The user's current number of pulls since the last 5★ drop. 
-        num_rolls: The specified number of gacha rolls as provided by the user.
+    Lets the user upload a wish history export and choose the banner to prefill the simulator inputs with.
 
     Returns:
-        Tuple[int, int, int]: A tuple consisting of the number of 3★, 4★ and 5★ drops obtained from the simulation, respectively in order.
+        BannerHistory: The pity and drop statistics of the chosen banner, or None if nothing was imported.
     '''
 
-    item3_count, item4_count, item5_count = 0, 0, 0
+    with st.expander('Import your wish history (optional)'):
+        st.markdown("Upload a wish history export (e.g. from paimon.moe or a wish history exporter, as CSV, JSON or JSON Lines) to fill in your banner and current pity automatically. Each record needs a banner field (such as `gacha_type`) and a rarity field (such as `rank_type`).")
+        uploaded = st.file_uploader('Wish history export:', type = ['csv', 'json', 'jsonl'])
+        if uploaded is None:
+            return None
 
-    for i in range(num_rolls):
+        try:
+            with span('history_import'):
+                histories = read_wish_history(uploaded.getvalue(), uploaded.name)
+        except (ValueError, KeyError, UnicodeDecodeError) as e:
+            st.error(f'Could not read the wish history: {e}')
+            return None
 
-        randomVal = random.random()
+        st.dataframe(pd.DataFrame([(h.pool, h.pulls, h.count_4star, h.count_5star, h.pity_4, h.pity_5) for h in histories],
+                                  columns = ['Banner', 'Wishes', '4★ drops', '5★ drops', 'Current 4★ pity', 'Current 5★ pity']), hide_index = True, use_container_width = True)
 
-        if randomVal < prob_5[pity_5]:
-            item5_count += 1
-            pity_5 = 1
+        supported = [h for h in histories if h.banner_type is not None]
+        if not supported:
+            st.warning('The export does not contain any banner supported by the simulator.')
+            return None
 
-        elif randomVal < prob_4[pity_4]:
-            item4_count += 1
-            pity_4 = 1
+        history = st.selectbox('Prefill the simulator with:', supported, format_func = lambda h: f'{h.pool} ({h.pulls} wishes)')
+
+        if history.intervals_5star:
+            st.markdown(f'Observed number of wishes between consecutive 5★ drops on the {history.pool} banner:')
+            intervals = pd.Series(history.intervals_5star).sort_index()
+            st.bar_chart(intervals.reindex(range(1, intervals.index.max() + 1), fill_value = 0))
+
+    return history
 
-        else:
-            pity_4 += 1
-            pity_5 += 1
-            item3_count += 1
-            
-    return item3_count, item4_count, item5_count
 
+@st.cache_data(show_spinner = False, max_entries = 16)
+def scenario_comparison(banner_type: str, scenarios: tuple, num_iter: int, sampler: str, seed: Optional[int], _cancel: Optional[threading.Event] = None) -> 'pd.DataFrame':
+    '''
+    The mean drops of each scenario and their differences from the first one, with standard errors, as computed by `sim_engine.compare_scenarios`. Cancelled comparisons raise `SimulationCancelled` and are not cached.
+    '''
+    means, std_errors, diff_std_errors = compare_scenarios(banner_type, scenarios, num_iter, sampler, seed, _cancel)
+
+    rows = []
+    for (pity_4, pity_5, wishes), mean, se, diff_se in zip(scenarios, means, std_errors, diff_std_errors):
+        row = {'Wishes': wishes, '5★ pity': pity_5, '4★ pity': pity_4}
+        row.update({f'Mean {star}': f'{m:.3f} ± {e:.3f}' for star, m, e in zip(RARITIES, mean, se)})
+        row.update({f'Δ {star}': f'{d:+.3f} ± {e:.3f}' for star, d, e in zip(RARITIES, mean - means[0], diff_se)})
+        rows.append(row)
 
-def simulation(num_iter: int, banner_type: str, start_pity_4: int, start_pity_5: int, wish_count: int) -> pd.DataFrame:
-    if banner_type == 'character':
-        prob_4, prob_5 = char_roll_4star, char_roll_5star
-        
-    elif banner_type == 'weapon':
-        prob_4, prob_5 = weap_roll_4star, weap_roll_5star
+    return pd.DataFrame(rows)
 
-    char_sim = [simulate_rolls(prob_4, prob_5, start_pity_4, start_pity_5, wish_count) for j in range(num_iter)]
 
-    data_list = [(f'{str(k[0])}/{str(k[1])}/{str(k[2])}', k[0], k[1], k[2], v) for k, v in Counter(char_sim).items()]
+def compare_scenario(banner_type: str, pity_4: int, pity_5: int, wishes: int, num_iter: int, sampler: str, seed: Optional[int], max_pity_4: int, max_pity_5: int):
+    '''
+    Lets the user compare the mean drops of their inputs with another number of wishes or starting pities. Both are simulated with common random numbers, so the difference between them is far more precise than the difference of two separate simulations.
+    '''
 
-    df = pd.DataFrame(data_list, columns = ['3★/4★/5★', '3★', '4★', '5★', 'Count'])
-    df['Prob'] = df['Count'] / df['Count'].sum()
+    with st.expander('Compare with another number of wishes or starting pities'):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            other_wishes = st.number_input('Number of wishes:', value = wishes + 10, min_value = 1, max_value = 10000, key = 'compare_wishes')
+        with col2:
+            other_pity_5 = st.number_input('5★ pity:', value = pity_5, min_value = 1, max_value = max_pity_5, key = 'compare_pity_5')
+        with col3:
+            other_pity_4 = st.number_input('4★ pity:', value = pity_4, min_value = 1, max_value = max_pity_4, key = 'compare_pity_4')
 
-    return df
+        if not st.checkbox('Compare', key = 'compare'):
+            return
 
+        scenarios = ((pity_4, pity_5, wishes), (other_pity_4, other_pity_5, other_wishes))
+        status_slot = st.empty()
+        with span('comparison'):
+            comparison = run_in_background(lambda cancel: scenario_comparison(banner_type, scenarios, num_iter, sampler, seed, cancel),
+                                           on_wait = lambda elapsed: status_slot.caption(f'Comparing scenarios... ({elapsed:.1f} s) - changing the inputs cancels this run'))
+        status_slot.empty()
 
-def combined_freq_graph(n_iter: int, pity_4: int, pity_5: int, banner_type: str, num_wishes: int):
+        st.dataframe(comparison, hide_index = True, use_container_width = True)
+        st.caption(f'Mean drops ± standard error over {num_iter} iterations of each scenario, driven by the same random draws, and their differences (Δ) from your inputs.')
+
+
+def combined_freq_graph(n_iter: int, pity_4: int, pity_5: int, banner_type: str, num_wishes: int, method: str = 'monte_carlo', seed: Optional[int] = None, workers: int = 1, top_k: Optional[int] = TOP_K, on_wait: Optional[Callable[[float], None]] = None, sampler: str = 'independent'):
     '''
-    A function that simulates the number of 3★, 4★ and 5★ drops obtained from a specified number of gacha rolls.
+    A function that simulates the number of 3★, 4★ and 5★ drops obtained from a specified number of gacha rolls. Results are shared through `result_cache`, so inputs simulated before (by any session) are served without simulating again.
 
     Args:
         n_iter (int): The specified number of iterations for the simulation to run.
         pity_4 (int): The user's current number of pulls since the last 4★ drop. Cannot be higher than the number of rolls for a guaranteed drop.
         pity_5 (int): The user's current number of pulls since the last 5★ drop. Cannot be higher than the number of rolls for a guaranteed drop.
-        banner_type (str): The type of banner which determines its respective probability distribution. 'character' for Character Event/Standard Banner and 'weapon' for Weapon Event Banner.
+        banner_type (str): The type of banner which determines its respective probability distribution. A key of `pity_probs.BANNERS`, e.g. 'character' for Character Event/Standard Banner and 'weapon' for Weapon Event Banner.
         num_wishes (int): The number of wishes a player currently plans to simulate the odds for.
+        method (str): 'monte_carlo' to simulate `n_iter` iterations, 'event_skipping' to simulate them drawing once per drop instead of once per wish (same distribution, faster for many wishes), or 'exact' to compute the exact distribution by dynamic programming (counts are then expected frequencies out of `n_iter`).
+        seed (int): Seed of the Monte Carlo simulation. The same seed gives the same result for any number of workers.
+        workers (int): Number of worker processes to split the Monte Carlo iterations across.
+        top_k (int): Number of most frequent outcomes drawn as separate bars, or None to draw every outcome.
+        on_wait (Callable[[float], None]): Called with the elapsed seconds while the simulation runs in the background (see `background.run_in_background`). Updating an element there lets a changed input interrupt and cancel the run.
+        sampler (str): How the Monte Carlo draws are generated, a key of `sim_engine.SAMPLERS`. Variance-reduced samplers run on a single process.
 
     Returns:
-        LayerChart: An altair object which is basically a bar graph showing the frequency rate of outputs totalling the number of specified iterations.
+        Tuple[LayerChart, SimulationResult]: An altair object which is basically a bar graph showing the frequency rate of outputs totalling the number of specified iterations, and the simulation result it was drawn from.
     '''
 
-    source = simulation(n_iter, banner_type, pity_4, pity_5, num_wishes)
+    with span('simulation'):
+        result = run_in_background(lambda cancel: cached_simulation(n_iter, banner_type, pity_4, pity_5, num_wishes, seed = seed, method = method, workers = workers, cancel = cancel, sampler = sampler), on_wait = on_wait)
+    subtitle = f'Exact distribution, expected counts out of n = {n_iter}' if method == 'exact' else f'Simulation of n = {result.n:.0f}'
+
+    with span('chart'):
+        return freq_chart(result, subtitle, top_k), result
+
+
+def freq_chart(result: SimulationResult, subtitle: str, top_k: Optional[int] = TOP_K):
+    '''
+    Builds the bar graph of the frequency of the `top_k` most frequent 3★/4★/5★ outcomes of a simulation, with one more bar for all other outcomes, so that the data sent to the browser stays bounded. Only numeric columns are sent; the outcome labels are built in the browser.
+    '''
 
-    bars = alt.Chart(source).mark_bar().encode(
-        x = 'Count',
-        y = alt.Y('3★/4★/5★', sort = alt.EncodingSortField('Count', op='sum', order='descending')),
-        tooltip = [alt.Tooltip('Count', format = 'd'), 
-                alt.Tooltip('Prob', format = '.2%')],
-        color = alt.Color('Prob', scale = alt.Scale(scheme = 'blues'), legend = None)
+    source = result.top_frame(top_k if top_k is not None else len(result.counts))
+    num_wishes = int(result.outcomes[0].sum())
+
+    bars = alt.Chart(source).transform_calculate(
+        **{'3★/4★/5★': "datum['3★'] < 0 ? 'Other (' + datum.Outcomes + ' outcomes)' : datum['3★'] + '/' + datum['4★'] + '/' + datum['5★']"}
+    ).mark_bar().encode(
+        x = 'Count:Q',
+        y = alt.Y('3★/4★/5★:N', sort = alt.EncodingSortField('Rank', order = 'ascending')),
+        tooltip = [alt.Tooltip('3★/4★/5★:N'),
+                alt.Tooltip('Count:Q', format = 'd'), 
+                alt.Tooltip('Prob:Q', format = '.2%')],
+        color = alt.condition('datum.Outcomes > 1', alt.value('lightgray'), alt.Color('Prob:Q', scale = alt.Scale(scheme = 'blues'), legend = None))
     ).properties(
-        title = f"Number of 3★/4★/5★ drops with {source.loc[0][['3★', '4★', '5★']].sum()} wishes - (Simulation of n = {source['Count'].sum()})"
+        title = f"Number of 3★/4★/5★ drops with {num_wishes} wishes - ({subtitle})"
     )
 
     text = bars.mark_text(
@@ -167,7 +307,7 @@ def combined_freq_graph(n_iter: int, pity_4: int, pity_5: int, banner_type: str,
         baseline = 'middle',
         dx = 15
     ).encode(
-        text = alt.Text('Count', format = 'd')
+        text = alt.Text('Count:Q', format = 'd')
     )
 
     chart = (bars + text).configure_title(
@@ -180,18 +320,49 @@ def combined_freq_graph(n_iter: int, pity_4: int, pity_5: int, banner_type: str,
         titlePadding = 20
     )
 
-    # Show the chart
-    return chart, source
+    return chart
+
+
+def marginal_chart(result: SimulationResult):
+    '''
+    Builds one histogram per rarity of the number of drops of that rarity in a simulation.
+    '''
+
+    bars = alt.Chart(result.marginal_frame()).mark_bar().encode(
+        x = alt.X('Drops:Q', title = 'Number of drops'),
+        y = alt.Y('Count:Q'),
+        color = alt.Color('Rarity:N', scale = alt.Scale(domain = ['3★', '4★', '5★'], range = ['steelblue', 'mediumpurple', 'goldenrod']), legend = None),
+        tooltip = [alt.Tooltip('Rarity:N'),
+                   alt.Tooltip('Drops:Q'),
+                   alt.Tooltip('Count:Q', format = 'd'),
+                   alt.Tooltip('Prob:Q', format = '.2%')]
+    ).properties(
+        width = 180,
+        height = 180
+    )
+
+    return bars.facet(
+        column = alt.Column('Rarity:N', title = None, sort = ['3★', '4★', '5★'])
+    ).resolve_scale(
+        x = 'independent',
+        y = 'independent'
+    ).properties(
+        title = 'Distribution of the number of drops of each rarity'
+    ).configure_title(
+        fontSize = 15,
+        offset = 15,
+        anchor = 'middle'
+    )
 
 
-def summary_table(data: pd.DataFrame):
+def summary_table(data: 'pd.DataFrame'):
     fig = go.Figure(data = [go.Table(columnwidth = [2, 1.75],
                             header = dict(values = ['Rarity', 'Count', 'Mean', 'Std Dev', 'Min', '25%', 'Median', '75%', 'Max', 'Mode'],
                                             fill_color = ['maroon', 'navy'],
                                             line_color = 'black',
                                             font = dict(color = 'white', size = 14),
                                             height = 27.5),
-                            cells = dict(values = [data.index, data['count'], round(data['mean'], 4), round(data['std'], 4), data['min'], data['25%'], data['50%'], data['75%'], data['max'], data['mode']], 
+                            cells = dict(values = [data.index, round(data['count']), round(data['mean'], 4), round(data['std'], 4), data['min'], data['25%'], data['50%'], data['75%'], data['max'], data['mode']], 
                                         fill_color = ['mistyrose', 'gainsboro'],
                                         line_color = 'black',
                                         align = ['center', 'right'],
@@ -203,4 +374,5 @@ def summary_table(data: pd.DataFrame):
 
 if __name__ == "__main__":
     st.set_page_config(page_title = 'Genshin Impact WishStats', page_icon = '🕹️')
-    main()
+    with page_timings('Drop Rate Simulator'):
+        main()
@@ -0,0 +1,138 @@
+import streamlit as st
+import numpy as np
+
+from pity_probs import BANNERS
+from planner import cached_featured_pulls_pmf, cached_featured_pulls_grid, success_grid, wishes_needed, expected_wishes, wish_percentiles, PRIMOGEMS_PER_WISH
+from lazy_imports import lazy_import
+from assets import load_image
+from timings import page_timings, span
+
+# Only loaded once the charts are drawn
+pd = lazy_import('pandas')
+alt = lazy_import('altair')
+go = lazy_import('plotly.graph_objects')
+
+
+def main():
+    col1, col2 = st.columns([0.045, 0.28])
+
+    with col1:
+        st.image(load_image('simulation_1.png'), output_format = 'png')
+
+    with col2:
+        st.title('Wish Planner')
+
+    st.markdown('### 🎯 &nbsp; How many wishes for the featured 5★?')
+
+    st.markdown("This feature computes the exact distribution of the number of wishes needed to obtain a number of copies of a banner's featured 5★ character or weapon (e.g. C6 or R5), taking into account your current 5★ pity and whether your next 5★ is guaranteed to be the featured item after losing a 50/50. No simulation is involved, so the results are instant and free of sampling noise.")
+
+    st.caption('Every calculation on this page follows the 5★ pity of the game, which advances on every wish, 4★ drops included. The Drop Rate Simulator only advances the 5★ pity on 3★ wishes, so its chances of a 5★ drop within the same number of wishes are lower.')
+
+    st.markdown('---')
+
+    st.markdown('### User inputs:')
+
+    bt = st.selectbox('Choose a banner:', list(BANNERS), format_func = lambda key: BANNERS[key].name)
+    banner = BANNERS[bt]
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        copies = st.number_input(f'Copies of the featured {banner.item} wanted:', value = 1, min_value = 1, max_value = 7)
+    with col2:
+        pity_5 = st.number_input('Enter current 5★ pity you are at:', value = 1, min_value = 1, max_value = banner.spec_5star.hard_pity)
+    with col3:
+        guaranteed = st.checkbox('Next 5★ is guaranteed to be featured')
+
+    with span('planner'):
+        pmf = cached_featured_pulls_pmf(banner, copies, pity_5, guaranteed)
+        mean = expected_wishes(pmf)
+
+    col1, col2 = st.columns(2)
+    col1.metric('Expected number of wishes', f'{mean:,.1f}')
+    col2.metric('Expected cost in Primogems', f'{mean * PRIMOGEMS_PER_WISH:,.0f}')
+
+    st.markdown('### Wishes needed at each level of certainty:')
+    percentiles = wish_percentiles(pmf)
+    st.dataframe(pd.DataFrame({'Chance of success': [f'{q:.0%}' for q in percentiles],
+                               'Wishes needed': list(percentiles.values()),
+                               'Primogems needed': [n * PRIMOGEMS_PER_WISH for n in percentiles.values()]}),
+                 hide_index = True, use_container_width = True)
+
+    st.markdown('### Chance of success within a number of wishes:')
+    with span('chart'):
+        chart = cdf_chart(pmf, copies, banner.item)
+    st.altair_chart(chart, use_container_width = True)
+
+    st.markdown('---')
+
+    st.markdown('### Chance of success from every starting pity:')
+    st.markdown('The heatmap shows your chance of success for every combination of current 5★ pity and wish budget at once, with the number of wishes needed for a chosen chance of success drawn on top.')
+
+    targets = ['At least one 5★ drop', f'{copies} featured {banner.item} cop{"y" if copies == 1 else "ies"} (as chosen above)']
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        target = st.selectbox('Count as a success:', targets)
+    with col2:
+        probability = st.number_input('Target chance of success (%):', value = 90.0, min_value = 1.0, max_value = 99.9, step = 1.0) / 100
+
+    with span('planner_grid'):
+        if target == targets[0]:
+            grid = cached_featured_pulls_grid(banner, 1, featured_rate = 1)
+        else:
+            grid = cached_featured_pulls_grid(banner, copies, guaranteed)
+        needed = wishes_needed(grid, probability)
+
+    with col3:
+        budget = st.number_input('Largest wish budget shown:', value = min(grid.shape[1] - 1, 1000), min_value = 10, max_value = 3000, step = 10)
+
+    st.metric(f'Wishes needed for a {probability:.0%} chance from pity {pity_5}', f'{needed[pity_5 - 1]:,}', help = f'{needed[pity_5 - 1] * PRIMOGEMS_PER_WISH:,} Primogems')
+
+    with span('chart'):
+        heatmap = success_heatmap(success_grid(grid, budget), needed, probability)
+    st.plotly_chart(heatmap, use_container_width = True)
+
+    st.markdown('---')
+
+
+def cdf_chart(pmf: np.ndarray, copies: int, item: str):
+    '''
+    Builds a line chart of the probability of having obtained all featured copies within each number of wishes.
+    '''
+    cdf = np.cumsum(pmf)
+    # Stop the chart once success is practically certain
+    last = min(len(cdf), int(np.searchsorted(cdf, 1 - 1e-6)) + 1)
+    source = pd.DataFrame({'Wishes': np.arange(last), 'Probability': cdf[:last]})
+
+    return alt.Chart(source).mark_line().encode(
+        x = 'Wishes',
+        y = alt.Y('Probability', axis = alt.Axis(format = '%')),
+        tooltip = ['Wishes', alt.Tooltip('Probability', format = '.2%')]
+    ).properties(
+        title = f'Probability of obtaining {copies} featured {item} cop{"y" if copies == 1 else "ies"} within a number of wishes'
+    )
+
+
+def success_heatmap(cdf: np.ndarray, needed: np.ndarray, probability: float):
+    '''
+    Builds a heatmap of the chance of success for each starting pity (rows) and wish budget (columns), with the wishes needed to reach `probability` from each pity drawn as a line.
+    '''
+    pities = np.arange(1, cdf.shape[0] + 1)
+    budgets = np.arange(cdf.shape[1])
+
+    fig = go.Figure(data = [go.Heatmap(z = cdf * 100, x = budgets, y = pities,
+                                       colorscale = 'Blues', zmin = 0, zmax = 100,
+                                       colorbar = dict(title = 'Chance (%)'),
+                                       hovertemplate = 'Pity %{y}, %{x} wishes: %{z:.2f}%<extra></extra>'),
+                            go.Scatter(x = np.minimum(needed, budgets[-1]), y = pities, mode = 'lines',
+                                       line = dict(color = 'maroon', width = 2),
+                                       name = f'{probability:.0%} chance',
+                                       hovertemplate = f'Pity %{{y}}: %{{x}} wishes for a {probability:.0%} chance<extra></extra>')])
+    fig.update_layout(xaxis_title = 'Wish budget', yaxis_title = 'Current 5★ pity', height = 500,
+                      legend = dict(orientation = 'h', y = 1.08), margin = dict(l = 5, r = 5, t = 40, b = 5))
+    return fig
+
+
+if __name__ == "__main__":
+    st.set_page_config(page_title = 'Genshin Impact WishStats', page_icon = '🎯')
+    with page_timings('Wish Planner'):
+        main()
@@ -1,39 +1,160 @@
-def char_event_5star(x: int):
-    if x < 74:
-        return 0.006
-    elif x >= 74 and x < 90:
-        return round((x - 73) * 0.06 + 0.006, 3)
-    else:
-        return 1
-
-char_roll_5star = {num: char_event_5star(num) for num in range(1, 91)}
-
-def char_event_4star(x: int):
-    if x < 9:
-        return 0.051
-    elif x == 9:
-        return 0.561
-    else:
-        return 1
-
-char_roll_4star = {num: char_event_4star(num) for num in range(1, 11)}
-
-def weap_event_5star(x: int):
-    if x < 63:
-        return 0.007
-    elif x >= 63 and x < 77:
-        return round((x - 62) * 0.07 + 0.007, 3)
-    else:
-        return 1
-
-weap_roll_5star = {num: weap_event_5star(num) for num in range(1, 78)}
-
-def weap_event_4star(x: int):
-    if x < 8:
-        return 0.06
-    elif x == 8:
-        return 0.66
-    else:
-        return 1
-
-weap_roll_4star = {num: weap_event_4star(num) for num in range(1, 10)}
\ No newline at end of file
+import numpy as np
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, NamedTuple
+
+
+def roll_array(roll_dict: dict):
+    '''
+    Converts a pity probability dictionary into a NumPy lookup array indexed directly by pity, so that `arr[pity]` gives the same value as `roll_dict[pity]`. Index 0 is unused and set to 0.
+    '''
+    arr = np.zeros(max(roll_dict) + 1)
+    for num, prob in roll_dict.items():
+        arr[num] = prob
+    return arr
+
+
+class PityTable(NamedTuple):
+    '''
+    Precomputed, read-only probability arrays for one pity system, all indexed by pull number after the last drop (index 0 is the state before any pull).
+
+    Attributes:
+        hazard (np.ndarray): Base rate of a drop on pull n, given no drop on pulls 1 to n - 1.
+        pmf (np.ndarray): Probability that the next drop happens exactly on pull n.
+        cdf (np.ndarray): Probability that the next drop happens on or before pull n.
+        survival (np.ndarray): Probability that no drop has happened after n pulls.
+        cond_pmf (np.ndarray): cond_pmf[m, n] is the probability that the next drop happens exactly on pull n, given m pulls without a drop.
+        cond_cdf (np.ndarray): cond_cdf[m, n] is the probability that the next drop happens on or before pull n, given m pulls without a drop.
+    '''
+    hazard: np.ndarray
+    pmf: np.ndarray
+    cdf: np.ndarray
+    survival: np.ndarray
+    cond_pmf: np.ndarray
+    cond_cdf: np.ndarray
+
+    @property
+    def max_pity(self) -> int:
+        return len(self.hazard) - 1
+
+    @property
+    def pulls(self) -> np.ndarray:
+        return np.arange(1, len(self.hazard))
+
+
+def pity_table(roll_dict: dict) -> PityTable:
+    '''
+    Builds the PMF, CDF, survival and conditional distributions of a pity probability dictionary with a single cumulative product over its per-pull rates.
+    '''
+    hazard = roll_array(roll_dict)
+    survival = np.cumprod(1 - hazard)
+    cdf = 1 - survival
+    pmf = np.concatenate([[0], survival[:-1] * hazard[1:]])
+
+    # Condition on m failed pulls: rescale by the survival probability and zero out pulls already made
+    # (the last row stays empty as the hard pity pull can never be failed)
+    pulls = np.arange(len(hazard))
+    reached = pulls[None, :] > pulls[:-1, None]
+    cond_pmf = np.zeros((len(hazard), len(hazard)))
+    cond_pmf[:-1] = np.where(reached, pmf[None, :] / survival[:-1, None], 0)
+    cond_cdf = np.cumsum(cond_pmf, axis = 1)
+
+    arrays = [hazard, pmf, cdf, survival, cond_pmf, cond_cdf]
+    for arr in arrays:
+        arr.setflags(write = False)
+
+    return PityTable(*arrays)
+
+@dataclass(frozen = True)
+class BannerSpec:
+    '''
+    The pity system of one rarity on a banner.
+
+    Attributes:
+        base_rate (float): Per-pull drop rate before soft pity.
+        soft_pity_start (int): First pull at which the rate starts to increase.
+        ramp (float): Increase of the rate for each pull from the start of soft pity.
+        hard_pity (int): Pull at which a drop is guaranteed.
+    '''
+    base_rate: float
+    soft_pity_start: int
+    ramp: float
+    hard_pity: int
+
+    def rate(self, x: int) -> float:
+        if x < self.soft_pity_start:
+            return self.base_rate
+        elif x < self.hard_pity:
+            return round((x - self.soft_pity_start + 1) * self.ramp + self.base_rate, 3)
+        else:
+            return 1
+
+    def roll_dict(self) -> Dict[int, float]:
+        return {num: self.rate(num) for num in range(1, self.hard_pity + 1)}
+
+    def compile(self) -> PityTable:
+        '''
+        Returns the precomputed probability tables of this pity system, built once and cached.
+        '''
+        return _compile_spec(self)
+
+@lru_cache(maxsize = None)
+def _compile_spec(spec: BannerSpec) -> PityTable:
+    return pity_table(spec.roll_dict())
+
+@dataclass(frozen = True)
+class Banner:
+    '''
+    A banner type and the pity systems of its 4★ and 5★ drops.
+
+    Attributes:
+        key (str): Short identifier, e.g. 'character'.
+        name (str): Display name of the banner.
+        item (str): What the banner's 5★ drops are, e.g. 'Character'.
+        spec_4star (BannerSpec): Pity system of 4★ drops.
+        spec_5star (BannerSpec): Pity system of 5★ drops.
+        featured_rate (float): Chance that a 5★ drop is the featured item when it is not guaranteed. Losing makes the next 5★ a guaranteed featured item.
+    '''
+    key: str
+    name: str
+    item: str
+    spec_4star: BannerSpec
+    spec_5star: BannerSpec
+    featured_rate: float
+
+    @property
+    def table_4star(self) -> PityTable:
+        return self.spec_4star.compile()
+
+    @property
+    def table_5star(self) -> PityTable:
+        return self.spec_5star.compile()
+
+CHARACTER_5STAR = BannerSpec(base_rate = 0.006, soft_pity_start = 74, ramp = 0.06, hard_pity = 90)
+CHARACTER_4STAR = BannerSpec(base_rate = 0.051, soft_pity_start = 9, ramp = 0.51, hard_pity = 10)
+WEAPON_5STAR = BannerSpec(base_rate = 0.007, soft_pity_start = 63, ramp = 0.07, hard_pity = 77)
+WEAPON_4STAR = BannerSpec(base_rate = 0.06, soft_pity_start = 8, ramp = 0.6, hard_pity = 9)
+
+BANNERS = {banner.key: banner for banner in [
+    Banner('character', 'Character Event/Standard Banner', 'Character', CHARACTER_4STAR, CHARACTER_5STAR, featured_rate = 0.5),
+    # 75% for one of the two featured weapons, half of which is the one charted with Epitomized Path
+    Banner('weapon', 'Weapon Event Banner', 'Weapon', WEAPON_4STAR, WEAPON_5STAR, featured_rate = 0.375),
+    # Chronicled Wish uses the same drop rates as the character event banners
+    Banner('chronicled', 'Chronicled Wish', 'Character/Weapon', CHARACTER_4STAR, CHARACTER_5STAR, featured_rate = 0.5),
+]}
+
+def get_banner(banner_type: str) -> Banner:
+    if banner_type not in BANNERS:
+        raise ValueError(f"Unknown banner type: {banner_type!r}")
+    return BANNERS[banner_type]
+
+char_roll_5star = CHARACTER_5STAR.roll_dict()
+char_roll_4star = CHARACTER_4STAR.roll_dict()
+weap_roll_5star = WEAPON_5STAR.roll_dict()
+weap_roll_4star = WEAPON_4STAR.roll_dict()
+
+char_table_5star = CHARACTER_5STAR.compile()
+char_table_4star = CHARACTER_4STAR.compile()
+weap_table_5star = WEAPON_5STAR.compile()
+weap_table_4star = WEAPON_4STAR.compile()
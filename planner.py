@@ -0,0 +1,166 @@
+import numpy as np
+
+from functools import lru_cache
+from pity_probs import Banner, PityTable
+from typing import Dict, Optional, Sequence
+
+
+# Primogems per wish
+PRIMOGEMS_PER_WISH = 160
+
+
+def pulls_to_5star(table: PityTable, pity_5: int = 1) -> np.ndarray:
+    '''
+    Returns the PMF of the number of pulls until the next 5★ drop from the current pity, indexed by number of pulls (index 0 is always 0).
+
+    Args:
+        table (PityTable): The 5★ pity table of the banner.
+        pity_5 (int): The user's current number of pulls since the last 5★ drop, as in the simulator (1 right after a drop).
+    '''
+    failed = pity_5 - 1
+    return np.concatenate([[0], table.cond_pmf[failed, failed + 1:]])
+
+
+def fft_convolve_power(first: np.ndarray, repeated: np.ndarray, times: int) -> np.ndarray:
+    '''
+    Convolves `first` with `times` copies of `repeated` in a single pass in the frequency domain.
+    '''
+    length = len(first) + times * (len(repeated) - 1)
+    size = 1 << (length - 1).bit_length()
+
+    spectrum = np.fft.rfft(first, size) * np.fft.rfft(repeated, size) ** times
+    pmf = np.fft.irfft(spectrum, size)[:length]
+
+    # Remove floating-point noise around zero
+    pmf[pmf < 1e-15] = 0
+    return pmf / pmf.sum()
+
+
+def featured_pulls_pmf(banner: Banner, copies: int, pity_5: int = 1, guaranteed: bool = False) -> np.ndarray:
+    '''
+    Computes the exact distribution of the number of wishes needed for a number of copies of the banner's featured 5★ item, accounting for the current pity and the 50/50 guarantee.
+
+    Each featured copy needs one 5★ drop if the 50/50 is won (or guaranteed), or two if it is lost, after which the state resets. The copies are therefore independent after the first one, whose distribution depends on the current pity and guarantee, so the total is the convolution of the first copy with `copies - 1` copies of a fresh one, computed with the FFT.
+
+    Args:
+        banner (Banner): The banner to wish on.
+        copies (int): Number of featured copies wanted, e.g. 7 for C6 or 5 for R5.
+        pity_5 (int): The user's current number of pulls since the last 5★ drop.
+        guaranteed (bool): Whether the next 5★ drop is guaranteed to be the featured item.
+
+    Returns:
+        np.ndarray: The PMF of the total number of wishes, indexed by number of wishes.
+    '''
+    table = banner.table_5star
+    p = banner.featured_rate
+
+    fresh_5star = pulls_to_5star(table)
+    next_5star = pulls_to_5star(table, pity_5)
+
+    # Pulls for one featured copy from a reset pity without guarantee
+    fresh_copy = p * np.pad(fresh_5star, (0, len(fresh_5star) - 1)) + (1 - p) * np.convolve(fresh_5star, fresh_5star)
+
+    if guaranteed:
+        first_copy = next_5star
+    else:
+        first_copy = p * np.pad(next_5star, (0, len(fresh_5star) - 1)) + (1 - p) * np.convolve(next_5star, fresh_5star)
+
+    return fft_convolve_power(first_copy, fresh_copy, copies - 1)
+
+
+def pulls_to_5star_grid(table: PityTable) -> np.ndarray:
+    '''
+    `pulls_to_5star` for every starting pity at once: row `pity_5 - 1` is the PMF of the number of pulls until the next 5★ drop from pity `pity_5`.
+    '''
+    failed = np.arange(table.max_pity)[:, None]
+    pulls = failed + np.arange(table.max_pity + 1)[None, :]
+
+    # Shift each row of the conditional PMF so that it is indexed by pulls from the current pity
+    return np.where((pulls > failed) & (pulls <= table.max_pity), table.cond_pmf[failed, np.minimum(pulls, table.max_pity)], 0)
+
+
+def featured_pulls_grid(banner: Banner, copies: int, guaranteed: bool = False, featured_rate: Optional[float] = None) -> np.ndarray:
+    '''
+    `featured_pulls_pmf` for every starting pity in a single vectorized pass: the first-copy distributions of all pities are transformed together with one FFT along the rows, so the cost does not grow with the number of pities beyond the transform itself.
+
+    Args:
+        banner (Banner): The banner to wish on.
+        copies (int): Number of featured copies wanted.
+        guaranteed (bool): Whether the next 5★ drop is guaranteed to be the featured item.
+        featured_rate (float): Chance of a 5★ drop being the featured item, the banner's own rate if None. Use 1 to count any 5★ drop as a success.
+
+    Returns:
+        np.ndarray: Row `pity_5 - 1` is the PMF of the total number of wishes from pity `pity_5`, indexed by number of wishes.
+    '''
+    table = banner.table_5star
+    p = banner.featured_rate if featured_rate is None else featured_rate
+
+    # Every copy takes at most two 5★ drops of at most `max_pity` pulls each
+    length = 2 * copies * table.max_pity + 1
+    size = 1 << (length - 1).bit_length()
+
+    next_5star = np.fft.rfft(pulls_to_5star_grid(table), size, axis = 1)
+    fresh_5star = np.fft.rfft(pulls_to_5star(table), size)
+
+    # A copy takes one 5★ drop if the 50/50 is won (or guaranteed), or two if it is lost
+    fresh_copy = p * fresh_5star + (1 - p) * fresh_5star ** 2
+    first_copy = next_5star if guaranteed else p * next_5star + (1 - p) * next_5star * fresh_5star
+
+    pmf = np.fft.irfft(first_copy * fresh_copy ** (copies - 1), size, axis = 1)[:, :length]
+
+    # Remove floating-point noise around zero
+    pmf[pmf < 1e-15] = 0
+    return pmf / pmf.sum(axis = 1, keepdims = True)
+
+
+def success_grid(pmf_grid: np.ndarray, budget: int) -> np.ndarray:
+    '''
+    Returns the probability of success within 0 to `budget` wishes from every starting pity, with one row per pity, from a grid of `featured_pulls_grid`.
+    '''
+    cdf = np.minimum(np.cumsum(pmf_grid, axis = 1), 1)
+    if budget + 1 > cdf.shape[1]:
+        # Success is certain beyond the longest possible run of wishes
+        cdf = np.pad(cdf, ((0, 0), (0, budget + 1 - cdf.shape[1])), mode = 'edge')
+
+    return cdf[:, :budget + 1]
+
+
+def wishes_needed(pmf_grid: np.ndarray, probability: float) -> np.ndarray:
+    '''
+    Returns the smallest number of wishes reaching a probability of success from every starting pity, e.g. the wishes needed for a 90% chance.
+    '''
+    cdf = np.cumsum(pmf_grid, axis = 1)
+    return np.argmax(cdf >= probability - 1e-12, axis = 1)
+
+
+def expected_wishes(pmf: np.ndarray) -> float:
+    return float(np.dot(np.arange(len(pmf)), pmf))
+
+
+def wish_percentiles(pmf: np.ndarray, quantiles: Sequence[float] = (0.25, 0.5, 0.75, 0.9, 0.99)) -> Dict[float, int]:
+    '''
+    Returns the smallest number of wishes reaching each cumulative probability of the PMF.
+    '''
+    cdf = np.cumsum(pmf)
+    return {q: int(np.searchsorted(cdf, q - 1e-12)) for q in quantiles}
+
+
+# Shared by every session of the app: the planner's inputs are few, so each distribution is computed once per process
+@lru_cache(maxsize = 1024)
+def cached_featured_pulls_pmf(banner: Banner, copies: int, pity_5: int = 1, guaranteed: bool = False) -> np.ndarray:
+    '''
+    `featured_pulls_pmf` computed once per process and shared by every session, as a read-only array.
+    '''
+    pmf = featured_pulls_pmf(banner, copies, pity_5, guaranteed)
+    pmf.setflags(write = False)
+    return pmf
+
+
+@lru_cache(maxsize = 64)
+def cached_featured_pulls_grid(banner: Banner, copies: int, guaranteed: bool = False, featured_rate: Optional[float] = None) -> np.ndarray:
+    '''
+    `featured_pulls_grid` computed once per process and shared by every session, as a read-only array.
+    '''
+    grid = featured_pulls_grid(banner, copies, guaranteed, featured_rate)
+    grid.setflags(write = False)
+    return grid
@@ -0,0 +1,95 @@
+import io
+import threading
+
+from collections import OrderedDict
+from timings import span
+from typing import TYPE_CHECKING, Callable, Hashable, List
+
+if TYPE_CHECKING:
+    from matplotlib.artist import Artist
+    from matplotlib.figure import Figure
+
+
+# Same rendering options as `st.pyplot`
+SAVEFIG_OPTIONS = {'bbox_inches': 'tight', 'dpi': 200, 'format': 'png'}
+
+
+class PlotCache:
+    '''
+    A bounded, process-wide cache of rendered matplotlib plots.
+
+    The static part of each plot (curve, axes and titles) is built once per key and kept as a base figure. For each slider value only the dynamic artists (marker, vertical line and annotations) are drawn on top, rendered to PNG and removed again. Rendered images are kept in an LRU cache as well, and base figures evicted from their LRU cache are cleared explicitly so their memory is released.
+
+    Args:
+        max_figures (int): Maximum number of base figures to keep.
+        max_images (int): Maximum number of rendered images to keep.
+    '''
+
+    def __init__(self, max_figures: int = 9, max_images: int = 512):
+        self.max_figures = max_figures
+        self.max_images = max_images
+        self._figures = OrderedDict()
+        self._images = OrderedDict()
+        # Matplotlib figures are not thread-safe and Streamlit serves each session from its own thread
+        self._lock = threading.Lock()
+
+    def render(self, key: Hashable, build_base: Callable[[], 'Figure'], draw_dynamic: Callable[['Figure', int], List['Artist']], x: int) -> bytes:
+        '''
+        Returns the PNG bytes of the plot `key` at slider value `x`.
+
+        Args:
+            key (Hashable): Identifies the static base figure, e.g. ('character', 'cdf').
+            build_base (Callable[[], Figure]): Builds the static base figure. Only called when `key` is not cached.
+            draw_dynamic (Callable[[Figure, int], List[Artist]]): Draws the slider-dependent artists on the base figure and returns them so they can be removed after rendering.
+            x (int): The slider value.
+
+        Returns:
+            bytes: The rendered PNG image.
+        '''
+        with self._lock:
+            if (key, x) in self._images:
+                self._images.move_to_end((key, x))
+                return self._images[(key, x)]
+
+            fig = self._base_figure(key, build_base)
+            with span('plot_render'):
+                artists = draw_dynamic(fig, x)
+                try:
+                    image = io.BytesIO()
+                    fig.savefig(image, **SAVEFIG_OPTIONS)
+                finally:
+                    for artist in artists:
+                        artist.remove()
+
+            self._images[(key, x)] = image.getvalue()
+            while len(self._images) > self.max_images:
+                self._images.popitem(last = False)
+
+            return self._images[(key, x)]
+
+    def _base_figure(self, key: Hashable, build_base: Callable[[], 'Figure']) -> 'Figure':
+        if key in self._figures:
+            self._figures.move_to_end(key)
+            return self._figures[key]
+
+        with span('plot_base'):
+            self._figures[key] = build_base()
+        while len(self._figures) > self.max_figures:
+            _, evicted = self._figures.popitem(last = False)
+            evicted.clear()
+
+        return self._figures[key]
+
+    def clear(self):
+        '''
+        Releases every cached figure and image.
+        '''
+        with self._lock:
+            for fig in self._figures.values():
+                fig.clear()
+            self._figures.clear()
+            self._images.clear()
+
+
+# Shared by every session of the app
+plot_cache = PlotCache()
@@ -0,0 +1,209 @@
+import numpy as np
+
+from dataclasses import dataclass, field
+from pity_probs import get_banner
+from planner import PRIMOGEMS_PER_WISH
+from sim_engine import banner_tables
+from timings import span
+from typing import Dict, Iterator, Optional, Sequence, Union
+
+
+# Number of players advanced together, bounding the memory of the per-wish temporaries for large populations
+POPULATION_CHUNK = 2 ** 18
+
+# Banners sharing a pity counter and a 50/50 guarantee in game, keyed by `pity_probs.BANNERS` key
+PITY_POOLS = {'character': 'character', 'weapon': 'weapon', 'chronicled': 'chronicled'}
+
+
+@dataclass
+class ScheduledBanner:
+    '''
+    One banner of a season schedule.
+
+    Attributes:
+        banner_type (str): The banner type, a key of `pity_probs.BANNERS`. Banners of the same type carry their pity and guarantee over to each other.
+        income (int): Primogems credited to every player before the banner opens, e.g. a patch's income on the first banner of the patch.
+        copies (int): Number of featured copies each participating player wishes for, stopping once they have them or run out of primogems.
+        participation (float): Share of players wishing on the banner, drawn independently for each player.
+    '''
+    banner_type: str
+    income: int = 0
+    copies: int = 1
+    participation: float = 1.0
+
+
+@dataclass
+class PoolState:
+    '''
+    The pity state of every player on one pity pool, in compact arrays (pity never exceeds 90, so it fits in a byte).
+    '''
+    pity_4: np.ndarray
+    pity_5: np.ndarray
+    guaranteed: np.ndarray
+
+    @classmethod
+    def new(cls, size: int) -> 'PoolState':
+        return cls(np.ones(size, dtype = np.uint8), np.ones(size, dtype = np.uint8), np.zeros(size, dtype = bool))
+
+
+@dataclass
+class Population:
+    '''
+    The state of a player population: the primogems of each player and their pity state on each pity pool.
+
+    Attributes:
+        primogems (np.ndarray): The primogems of each player.
+        pools (Dict[str, PoolState]): The pity state of each pool of `PITY_POOLS`, created on first use with a pity of 1 and no guarantee.
+    '''
+    primogems: np.ndarray
+    pools: Dict[str, PoolState] = field(default_factory = dict)
+
+    @classmethod
+    def new(cls, size: int, primogems: Union[int, np.ndarray] = 0) -> 'Population':
+        '''
+        A population of `size` fresh players, with the same or each their own number of starting primogems.
+        '''
+        return cls(np.broadcast_to(np.asarray(primogems, dtype = np.int64), (size,)).copy())
+
+    @property
+    def size(self) -> int:
+        return len(self.primogems)
+
+    def pool(self, banner_type: str) -> PoolState:
+        key = PITY_POOLS[banner_type]
+        if key not in self.pools:
+            self.pools[key] = PoolState.new(self.size)
+        return self.pools[key]
+
+
+@dataclass
+class BannerStats:
+    '''
+    Aggregate outcome of one banner of a season over the whole population.
+
+    Attributes:
+        index (int): Position of the banner in the schedule.
+        banner_type (str): The banner type, a key of `pity_probs.BANNERS`.
+        players (int): Number of players wishing on the banner.
+        wishes (int): Total number of wishes made.
+        drops_4star (int): Total number of 4★ drops.
+        drops_5star (int): Total number of 5★ drops.
+        featured (int): Total number of featured 5★ drops.
+        completed (int): Number of participating players who got all the copies they wished for.
+        wish_counts (np.ndarray): Number of participating players by the number of wishes they made on the banner.
+        mean_primogems (float): Mean primogems per player once the banner closes.
+    '''
+    index: int
+    banner_type: str
+    players: int = 0
+    wishes: int = 0
+    drops_4star: int = 0
+    drops_5star: int = 0
+    featured: int = 0
+    completed: int = 0
+    wish_counts: np.ndarray = field(default_factory = lambda: np.zeros(1, dtype = np.int64))
+    mean_primogems: float = 0.0
+
+    @property
+    def completion_rate(self) -> float:
+        return self.completed / self.players if self.players else float('nan')
+
+    def add_wish_counts(self, wishes: np.ndarray):
+        counts = np.bincount(wishes)
+        if len(counts) > len(self.wish_counts):
+            counts[:len(self.wish_counts)] += self.wish_counts
+            self.wish_counts = counts
+        else:
+            self.wish_counts[:len(counts)] += counts
+
+
+def simulate_season(population: Population, schedule: Sequence[ScheduledBanner], seed: Optional[int] = None, chunk_size: int = POPULATION_CHUNK) -> Iterator[BannerStats]:
+    '''
+    Advances a population through a schedule of banners, yielding the aggregate outcome of each banner as soon as it closes. Only the current state of each player is kept, never their history, so memory stays proportional to the population size.
+
+    Every participating player wishes one wish at a time, all players of a chunk together, until they have the copies they wish for or run out of primogems. Each wish follows `sim_engine.simulate_rolls`, with one uniform draw against the 5★ and 4★ pity tables; a 5★ drop is featured if the player is guaranteed or wins the banner's featured rate, and a lost one guarantees the next, as in `planner.featured_pulls_pmf`.
+
+    Args:
+        population (Population): The players, updated in place.
+        schedule (Sequence[ScheduledBanner]): The banners, in order.
+        seed (int): Seed of the simulation. A random seed is used if not provided.
+        chunk_size (int): Number of players advanced together.
+
+    Yields:
+        BannerStats: The aggregate outcome of each banner.
+
+    Example:
+        population = Population.new(1_000_000, primogems = 16000)
+        schedule = [ScheduledBanner('character', income = 9000), ScheduledBanner('weapon'), ScheduledBanner('character', income = 9000, copies = 2)]
+        for stats in simulate_season(population, schedule, seed = 0):
+            print(stats.banner_type, stats.completion_rate)
+    '''
+    seed_seqs = np.random.SeedSequence(seed).spawn(len(schedule))
+
+    for index, (banner, seed_seq) in enumerate(zip(schedule, seed_seqs)):
+        rng = np.random.default_rng(seed_seq)
+        stats = BannerStats(index, banner.banner_type)
+        population.primogems += banner.income
+        pool = population.pool(banner.banner_type)
+
+        with span('population_banner'):
+            for start in range(0, population.size, chunk_size):
+                _run_banner(banner, population.primogems[start:start + chunk_size], pool, slice(start, start + chunk_size), rng, stats)
+
+        stats.mean_primogems = float(population.primogems.mean()) if population.size else 0.0
+        yield stats
+
+
+def _run_banner(banner: ScheduledBanner, primogems: np.ndarray, pool: PoolState, players: slice, rng: np.random.Generator, stats: BannerStats):
+    # Advances one chunk of players through a banner, updating `primogems` (a view) and the pool state in place
+    table_4, table_5 = banner_tables(banner.banner_type)
+    featured_rate = get_banner(banner.banner_type).featured_rate
+
+    idx = np.flatnonzero(rng.random(len(primogems)) < banner.participation)
+    stats.players += len(idx)
+
+    pity4 = pool.pity_4[players][idx]
+    pity5 = pool.pity_5[players][idx]
+    guaranteed = pool.guaranteed[players][idx]
+    budget = primogems[idx] // PRIMOGEMS_PER_WISH
+    copies = np.zeros(len(idx), dtype = np.int64)
+    wishes = np.zeros(len(idx), dtype = np.int64)
+
+    # Only the players still wishing are kept in the working arrays; the others are written back as they stop
+    active = np.arange(len(idx))
+    while True:
+        wishing = (budget[active] > 0) & (copies[active] < banner.copies)
+        active = active[wishing]
+        if not len(active):
+            break
+
+        p4, p5, g = pity4[active], pity5[active], guaranteed[active]
+        draw, featured_draw = rng.random(len(active)), rng.random(len(active))
+
+        # A 5★ takes priority over a 4★, even if the 4★ pity is guaranteed
+        is5 = draw < table_5.hazard[p5]
+        is4 = ~is5 & (draw < table_4.hazard[p4])
+        is3 = ~(is5 | is4)
+        featured = is5 & (g | (featured_draw < featured_rate))
+
+        stats.drops_4star += int(is4.sum())
+        stats.drops_5star += int(is5.sum())
+        stats.featured += int(featured.sum())
+
+        pity4[active] = np.where(is4, 1, p4 + is3)
+        pity5[active] = np.where(is5, 1, p5 + is3)
+        # A lost 50/50 guarantees the next 5★, a featured drop uses the guarantee up
+        guaranteed[active] = np.where(is5, ~featured, g)
+        copies[active] += featured
+        budget[active] -= 1
+        wishes[active] += 1
+
+    stats.wishes += int(wishes.sum())
+    stats.completed += int((copies >= banner.copies).sum())
+    stats.add_wish_counts(wishes)
+
+    # Write the state of the participating players back
+    pool.pity_4[players][idx] = pity4
+    pool.pity_5[players][idx] = pity5
+    pool.guaranteed[players][idx] = guaranteed
+    primogems[idx] -= wishes * PRIMOGEMS_PER_WISH
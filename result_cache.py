@@ -0,0 +1,207 @@
+import hashlib
+import os
+import threading
+
+from collections import OrderedDict
+from outcome_table import table_simulation
+from pathlib import Path
+from sim_engine import banner_fingerprint, simulation
+from sim_result import SimulationResult
+from timings import span
+from typing import Callable, Hashable, Optional, Tuple, Union
+
+
+# Directory to persist cached results to across restarts, disabled if not set
+CACHE_DIR_ENV = 'WISHSTATS_CACHE_DIR'
+
+# Part of every key: bump it whenever a change of the simulation engines changes their results, so that results persisted by an older version are never served
+CACHE_VERSION = 1
+
+
+def simulation_key(method: str, banner_type: str, pity_4: int, pity_5: int, wishes: int, iterations: int, seed: Optional[int] = None, target_rel_width: Optional[float] = None, sampler: str = 'independent') -> Tuple:
+    '''
+    The cache key of a simulation result. The number of workers is not part of it, as a seeded result does not depend on it. It includes `CACHE_VERSION` and the `sim_engine.banner_fingerprint` of the banner, so that persisted results go stale with the engines or the drop rates they were computed with.
+
+    Args:
+        method (str): The method of `simulation()`, e.g. 'monte_carlo', 'event_skipping' or 'exact'.
+        banner_type (str): The banner type, a key of `pity_probs.BANNERS`.
+        pity_4 (int): The starting 4★ pity.
+        pity_5 (int): The starting 5★ pity.
+        wishes (int): The number of wishes per iteration.
+        iterations (int): The (maximum) number of iterations.
+        seed (int): Seed of the simulation. Unseeded results are cached under None, and served to every later unseeded request as a random sample of their own.
+        target_rel_width (float): Relative confidence interval width at which a streamed simulation stops, or None for a simulation of every iteration.
+        sampler (str): The Monte Carlo sampler, a key of `sim_engine.SAMPLERS`.
+    '''
+    if method == 'exact':
+        # Deterministic, so the seed and the sampler are irrelevant
+        seed, sampler = None, 'independent'
+    elif method == 'event_skipping':
+        # Draws once per drop rather than per wish, so there is no sampler to choose
+        sampler = 'independent'
+
+    return (CACHE_VERSION, banner_fingerprint(banner_type), method, banner_type, int(pity_4), int(pity_5), int(wishes), int(iterations), None if seed is None else int(seed), target_rel_width, sampler)
+
+
+class ResultCache:
+    '''
+    A bounded, process-wide LRU cache of simulation results, optionally persisted to a directory so that it stays warm across restarts.
+
+    Results are bounded both in number and in the total size of their arrays, and are made read-only as they are shared by every session. Persisted results are stored as one JSON file per key, whose modification time is updated whenever it is read; the least recently used files are removed once there are more than `max_disk_entries`. The directory is scanned once, when the cache is created, and then tracked in memory, so a process sharing the directory with others only evicts the files it knows of.
+
+    Args:
+        max_entries (int): Maximum number of results to keep in memory.
+        max_bytes (int): Maximum total size in bytes of the arrays of the results kept in memory.
+        cache_dir (str or Path): Directory to persist results to, or None to keep them in memory only.
+        max_disk_entries (int): Maximum number of results to keep on disk.
+    '''
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 2 ** 20, cache_dir: Optional[Union[str, Path]] = None, max_disk_entries: int = 4096):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_disk_entries = max_disk_entries
+        self._results = OrderedDict()
+        self._bytes = 0
+        # Names of the persisted files, least recently used first
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents = True, exist_ok = True)
+            for path in sorted(self.cache_dir.glob('*.json'), key = _mtime):
+                self._files[path.name] = None
+
+    def get(self, key: Hashable) -> Optional[SimulationResult]:
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+
+        result = self._load(key)
+        if result is not None:
+            self._insert(key, result)
+
+        return result
+
+    def put(self, key: Hashable, result: SimulationResult) -> SimulationResult:
+        '''
+        Caches a result and returns the read-only copy that is shared from now on.
+        '''
+        result = SimulationResult(result.outcomes.copy(), result.counts.copy(), None if result.std_error is None else result.std_error.copy())
+        self._insert(key, result)
+        self._store(key, result)
+
+        return result
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], SimulationResult]) -> SimulationResult:
+        '''
+        Returns the cached result of `key`, computing and caching it first if needed. The lock is not held while computing, so other sessions are never blocked by a slow simulation.
+        '''
+        result = self.get(key)
+        return result if result is not None else self.put(key, compute())
+
+    def clear(self):
+        '''
+        Releases every result held in memory and removes the persisted ones, so that the next request of any key is computed afresh.
+        '''
+        with self._lock:
+            self._results.clear()
+            self._bytes = 0
+            self._files.clear()
+
+        if self.cache_dir is not None:
+            for path in self.cache_dir.glob('*.json'):
+                path.unlink(missing_ok = True)
+
+    def _insert(self, key: Hashable, result: SimulationResult):
+        result.outcomes.setflags(write = False)
+        result.counts.setflags(write = False)
+        if result.std_error is not None:
+            result.std_error.setflags(write = False)
+
+        with self._lock:
+            if key in self._results:
+                self._bytes -= _nbytes(self._results.pop(key))
+            self._results[key] = result
+            self._bytes += _nbytes(result)
+
+            while len(self._results) > 1 and (len(self._results) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._results.popitem(last = False)
+                self._bytes -= _nbytes(evicted)
+
+    def _path(self, key: Hashable) -> Path:
+        return self.cache_dir / (hashlib.sha256(repr(key).encode()).hexdigest()[:32] + '.json')
+
+    def _load(self, key: Hashable) -> Optional[SimulationResult]:
+        if self.cache_dir is None:
+            return None
+
+        path = self._path(key)
+        try:
+            with span('result_cache_load'):
+                result = SimulationResult.from_json(path.read_text())
+            # Marks the file as recently used for the eviction of every process sharing the directory
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        with self._lock:
+            self._files[path.name] = None
+            self._files.move_to_end(path.name)
+
+        return result
+
+    def _store(self, key: Hashable, result: SimulationResult):
+        if self.cache_dir is None:
+            return
+
+        path = self._path(key)
+        # Written to a temporary file and renamed, so that concurrent readers never see a partial file
+        temp_path = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            temp_path.write_text(result.to_json())
+            os.replace(temp_path, path)
+        except OSError:
+            # Persistence is best effort, the result is still cached in memory
+            temp_path.unlink(missing_ok = True)
+            return
+
+        with self._lock:
+            self._files[path.name] = None
+            self._files.move_to_end(path.name)
+            evicted = [self._files.popitem(last = False)[0] for _ in range(len(self._files) - self.max_disk_entries)]
+
+        for name in evicted:
+            (self.cache_dir / name).unlink(missing_ok = True)
+
+
+def _nbytes(result: SimulationResult) -> int:
+    return result.outcomes.nbytes + result.counts.nbytes
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        # Removed by another process since the scan, sorted first so that it is evicted first
+        return 0.0
+
+
+# Shared by every session of the app
+result_cache = ResultCache(cache_dir = os.environ.get(CACHE_DIR_ENV))
+
+
+def cached_simulation(num_iter: int, banner_type: str, start_pity_4: int, start_pity_5: int, wish_count: int, seed: Optional[int] = None, method: str = 'monte_carlo', workers: int = 1, cancel: Optional[threading.Event] = None, sampler: str = 'independent') -> SimulationResult:
+    '''
+    `sim_engine.simulation()` served from `result_cache` when the same parameters were simulated before, by any session. Cancelled simulations are not cached.
+
+    Exact distributions covered by the precomputed `outcome_table` are read from it instead, without going through the cache.
+    '''
+    if method == 'exact':
+        result = table_simulation(num_iter, banner_type, start_pity_4, start_pity_5, wish_count)
+        if result is not None:
+            return result
+
+    key = simulation_key(method, banner_type, start_pity_4, start_pity_5, wish_count, num_iter, seed, sampler = sampler)
+    return result_cache.get_or_compute(key, lambda: simulation(num_iter, banner_type, start_pity_4, start_pity_5, wish_count, seed = seed, method = method, workers = workers, cancel = cancel, sampler = sampler))
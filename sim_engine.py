@@ -0,0 +1,718 @@
+import numpy as np
+
+import hashlib
+import math
+import random
+import threading
+import warnings
+
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+from functools import lru_cache
+from pity_probs import PityTable, get_banner
+from sim_result import SimulationResult
+from timings import span
+from lazy_imports import lazy_import
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Only needed for quasi-Monte Carlo sampling
+qmc = lazy_import('scipy.stats.qmc')
+
+
+# Number of uniform draws generated per block in the batch engine (bounds peak memory)
+BLOCK_DRAWS = 2 ** 20
+
+# Number of iterations per independently seeded block; fixing the blocks (rather than the workers) makes seeded runs reproducible for any worker count
+SEED_BLOCK_ITERS = 8192
+
+# Size of the first chunk of a streamed simulation; later chunks double in size up to SEED_BLOCK_ITERS
+STREAM_FIRST_CHUNK = 1000
+
+# A streamed simulation never stops early before this many iterations, however precise it looks
+STREAM_MIN_ITERATIONS = 5000
+
+# The early stop of a streamed simulation checks the probabilities of the most frequent outcomes and drop counts, as many as the simulator charts separately
+STREAM_TOP_K = 25
+
+# Probabilities smaller than this share of the largest one in their chart are not checked by the early stop
+STREAM_MIN_SHARE = 0.1
+
+# Largest number of wishes for which the exact Markov-chain engine is offered in the app
+EXACT_MAX_WISHES = 500
+
+# Monte Carlo simulation methods: one draw per wish, or one draw per 4★/5★ drop skipping over the 3★ wishes in between
+MONTE_CARLO_METHODS = ('monte_carlo', 'event_skipping')
+
+# Ways of drawing the uniform numbers driving a Monte Carlo simulation, and their display names
+SAMPLERS = {'independent': 'Independent draws', 'antithetic': 'Antithetic pairs', 'sobol': 'Scrambled Sobol sequence'}
+
+# Number of independently scrambled Sobol sequences, whose spread gives the standard error of a quasi-Monte Carlo estimate
+SOBOL_REPLICATES = 16
+
+# Wishes drawn from the Sobol sequence, later wishes are drawn independently: scrambling costs time in proportion to the dimensions, and these cover a whole 5★ pity cycle
+SOBOL_DIMENSIONS = 128
+
+
+class SimulationCancelled(Exception):
+    '''
+    Raised by a simulation whose `cancel` event was set, e.g. because the inputs it was started for are stale.
+    '''
+
+
+def _check_cancelled(cancel: Optional[threading.Event]):
+    if cancel is not None and cancel.is_set():
+        raise SimulationCancelled()
+
+
+def banner_rolls(banner_type: str) -> Tuple[Dict[int, float], Dict[int, float]]:
+    '''
+    Returns the 4★ and 5★ pity probability dictionaries for a banner type (a key of `pity_probs.BANNERS`).
+    '''
+    banner = get_banner(banner_type)
+    return banner.spec_4star.roll_dict(), banner.spec_5star.roll_dict()
+
+
+def banner_tables(banner_type: str) -> Tuple[PityTable, PityTable]:
+    '''
+    Returns the precomputed 4★ and 5★ pity tables for a banner type (a key of `pity_probs.BANNERS`).
+    '''
+    banner = get_banner(banner_type)
+    return banner.table_4star, banner.table_5star
+
+
+@lru_cache(maxsize = None)
+def banner_fingerprint(banner_type: str) -> str:
+    '''
+    A digest of the pity tables of a banner, so that results computed before a change of the drop rates (cached or precomputed) are never served.
+    '''
+    table_4, table_5 = banner_tables(banner_type)
+    return hashlib.sha256(table_4.hazard.tobytes() + table_5.hazard.tobytes()).hexdigest()[:32]
+
+
+def simulate_rolls(prob_4: Dict[int, float], prob_5: Dict[int, float], pity_4: int, pity_5: int, num_rolls: int) -> Tuple[int, int, int]:
+    '''
+
+    A function that simulates the number of 3★, 4★ and 5★ drops obtained from a specified number of gacha rolls.
+
+    Args:
+        prob_4 (Dict[int, float]): A dictionary of probabilities of 4★ items with the key being the nth pull after the previous 4★ drop and value being the probability of a 4★ drop at the nth pull.
+        prob_5 (Dict[int, float]): A dictionary of probabilities of 5★ items with the key being the nth pull after the previous 5★ drop and value being the probability of a 5★ drop at the nth pull.
+        pity_4 (int): The user's current number of pulls since the last 4★ drop.
+        pity_5 (int): The user's current number of pulls since the last 5★ drop.
+        num_rolls: The specified number of gacha rolls as provided by the user.
+
+    Returns:
+        Tuple[int, int, int]: A tuple consisting of the number of 3★, 4★ and 5★ drops obtained from the simulation, respectively in order.
+    '''
+
+    item3_count, item4_count, item5_count = 0, 0, 0
+
+    for i in range(num_rolls):
+
+        randomVal = random.random()
+
+        if randomVal < prob_5[pity_5]:
+            item5_count += 1
+            pity_5 = 1
+
+        elif randomVal < prob_4[pity_4]:
+            item4_count += 1
+            pity_4 = 1
+
+        else:
+            pity_4 += 1
+            pity_5 += 1
+            item3_count += 1
+
+    return item3_count, item4_count, item5_count
+
+
+def simulate_rolls_batch(prob_4: np.ndarray, prob_5: np.ndarray, pity_4: int, pity_5: int, num_rolls: int, num_iter: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    '''
+    A vectorised version of `simulate_rolls` which advances every iteration of the simulation together, drawing one uniform number per iteration at each wish.
+
+    Args:
+        prob_4 (np.ndarray): Lookup array of 4★ probabilities indexed by 4★ pity (see `pity_probs.PityTable.hazard`).
+        prob_5 (np.ndarray): Lookup array of 5★ probabilities indexed by 5★ pity (see `pity_probs.PityTable.hazard`).
+        pity_4 (int): The user's current number of pulls since the last 4★ drop.
+        pity_5 (int): The user's current number of pulls since the last 5★ drop.
+        num_rolls (int): The specified number of gacha rolls as provided by the user.
+        num_iter (int): The number of independent iterations to simulate.
+        rng (np.random.Generator): Random number generator to draw from. A freshly seeded generator is used if not provided.
+
+    Returns:
+        np.ndarray: An integer array of shape (num_iter, 3) with the number of 3★, 4★ and 5★ drops of each iteration, respectively in order.
+    '''
+
+    rng = np.random.default_rng() if rng is None else rng
+
+    pity4 = np.full(num_iter, pity_4, dtype = np.intp)
+    pity5 = np.full(num_iter, pity_5, dtype = np.intp)
+    item4_count = np.zeros(num_iter, dtype = np.int64)
+    item5_count = np.zeros(num_iter, dtype = np.int64)
+
+    block = max(1, min(num_rolls, BLOCK_DRAWS // max(num_iter, 1)))
+
+    for start in range(0, num_rolls, block):
+        draws = rng.random((min(block, num_rolls - start), num_iter))
+        _advance(prob_4, prob_5, pity4, pity5, item4_count, item5_count, draws)
+
+    item3_count = num_rolls - item4_count - item5_count
+
+    return np.column_stack([item3_count, item4_count, item5_count])
+
+
+def simulate_draws(prob_4: np.ndarray, prob_5: np.ndarray, pity_4: int, pity_5: int, draws: np.ndarray) -> np.ndarray:
+    '''
+    `simulate_rolls_batch` driven by a given array of uniform draws of shape (num_rolls, num_iter), one column per iteration, e.g. antithetic or quasi-random draws.
+    '''
+    state = _start_state(pity_4, pity_5, draws.shape[1])
+    _advance(prob_4, prob_5, *state, draws)
+    return _state_outcomes(len(draws), state)
+
+
+def _start_state(pity_4: int, pity_5: int, num_iter: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # The 4★ pity, 5★ pity, 4★ count and 5★ count of every iteration, as advanced by `_advance`
+    return (np.full(num_iter, pity_4, dtype = np.intp), np.full(num_iter, pity_5, dtype = np.intp),
+            np.zeros(num_iter, dtype = np.int64), np.zeros(num_iter, dtype = np.int64))
+
+
+def _state_outcomes(num_rolls: int, state: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]) -> np.ndarray:
+    _, _, item4_count, item5_count = state
+    return np.column_stack([num_rolls - item4_count - item5_count, item4_count, item5_count])
+
+
+def _advance(prob_4: np.ndarray, prob_5: np.ndarray, pity4: np.ndarray, pity5: np.ndarray, item4_count: np.ndarray, item5_count: np.ndarray, draws: np.ndarray):
+    # Updates the pity and drop count arrays in place, one row of draws per wish
+    for randomVal in draws:
+        # A 5★ takes priority over a 4★, even if the 4★ pity is guaranteed
+        is5 = randomVal < prob_5[pity5]
+        is4 = ~is5 & (randomVal < prob_4[pity4])
+        is3 = ~(is5 | is4)
+
+        item5_count += is5
+        item4_count += is4
+
+        pity5 += is3
+        pity5[is5] = 1
+        pity4 += is3
+        pity4[is4] = 1
+
+
+def event_table(prob_4: np.ndarray, prob_5: np.ndarray) -> np.ndarray:
+    '''
+    Precomputes the distribution of the next 4★ or 5★ drop from every (4★ pity, 5★ pity) state of the chain followed by `simulate_rolls`, so that a simulation can jump from one drop to the next with a single draw.
+
+    From a state (a, b), k 3★ wishes in a row advance both pities to (a + k, b + k), and the next wish is then a 5★ drop with probability `prob_5[b + k]` or a 4★ drop with probability `max(prob_4[a + k] - prob_5[b + k], 0)`. The run of 3★ wishes cannot outlast the 4★ hard pity, so there are few possible (k, rarity) events.
+
+    Args:
+        prob_4 (np.ndarray): Lookup array of 4★ probabilities indexed by 4★ pity (see `pity_probs.PityTable.hazard`).
+        prob_5 (np.ndarray): Lookup array of 5★ probabilities indexed by 5★ pity (see `pity_probs.PityTable.hazard`).
+
+    Returns:
+        np.ndarray: An array of shape (len(prob_4), len(prob_5), 2 * K) of the probabilities of the events of each state: event 2k is a 4★ drop and event 2k + 1 a 5★ drop after k 3★ wishes.
+    '''
+    max_run = min(len(prob_4), len(prob_5)) - 1
+    # Pities beyond the tables are never reached, padding them with certain drops keeps the products finite
+    hazard_4 = np.concatenate([prob_4, np.ones(max_run)])
+    hazard_5 = np.concatenate([prob_5, np.ones(max_run)])
+
+    run = np.arange(max_run)
+    pity4 = np.arange(len(prob_4))[:, None, None] + run
+    pity5 = np.arange(len(prob_5))[None, :, None] + run
+    drop5 = hazard_5[pity5]
+    drop4 = np.clip(hazard_4[pity4] - drop5, 0, None)
+
+    # Probability of reaching the k-th wish of the run with only 3★ drops before it
+    no_drop = 1 - np.maximum(hazard_4[pity4], drop5)
+    reached = np.concatenate([np.ones(no_drop.shape[:2] + (1,)), np.cumprod(no_drop, axis = 2)[:, :, :-1]], axis = 2)
+
+    return np.stack([reached * drop4, reached * drop5], axis = 3).reshape(len(prob_4), len(prob_5), 2 * max_run)
+
+
+def alias_table(probs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Builds Walker alias tables for many discrete distributions at once, one per row of `probs`, with Vose's pairing of the smallest and the largest remaining entries run on every row together.
+
+    A value is then sampled from row r with a single uniform draw u: with x = u * m, column c = floor(x) is kept if x - c < accept[r, c], and replaced by alias[r, c] otherwise.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The acceptance probabilities and the aliases, both of the shape of `probs`.
+    '''
+    rows, m = probs.shape
+    scaled = probs / probs.sum(axis = 1, keepdims = True) * m
+    accept = np.ones((rows, m))
+    alias = np.tile(np.arange(m), (rows, 1))
+    done = np.zeros((rows, m), dtype = bool)
+    row = np.arange(rows)
+
+    for _ in range(m - 1):
+        small = np.argmin(np.where(done, np.inf, scaled), axis = 1)
+        large = np.argmax(np.where(done, -np.inf, scaled), axis = 1)
+        # Rows whose remaining entries are all 1 (up to rounding) are finished
+        pair = (scaled[row, small] < 1) & (small != large)
+
+        r, s, l = row[pair], small[pair], large[pair]
+        accept[r, s] = scaled[r, s]
+        alias[r, s] = l
+        scaled[r, l] -= 1 - scaled[r, s]
+        done[r, s] = True
+
+    return accept, alias
+
+
+def simulate_events_batch(prob_4: np.ndarray, prob_5: np.ndarray, pity_4: int, pity_5: int, num_rolls: int, num_iter: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    '''
+    An event-skipping version of `simulate_rolls_batch` with the same distribution of outcomes, whose cost grows with the number of 4★ and 5★ drops rather than the number of wishes.
+
+    Instead of one draw per wish, each iteration jumps straight to its next 4★ or 5★ drop with one draw from the alias table of `event_table`, which gives both the number of 3★ wishes before the drop and its rarity. A drop which would come after the last wish means the remaining wishes are all 3★.
+
+    Args:
+        prob_4 (np.ndarray): Lookup array of 4★ probabilities indexed by 4★ pity (see `pity_probs.PityTable.hazard`).
+        prob_5 (np.ndarray): Lookup array of 5★ probabilities indexed by 5★ pity (see `pity_probs.PityTable.hazard`).
+        pity_4 (int): The user's current number of pulls since the last 4★ drop.
+        pity_5 (int): The user's current number of pulls since the last 5★ drop.
+        num_rolls (int): The specified number of gacha rolls as provided by the user.
+        num_iter (int): The number of independent iterations to simulate.
+        rng (np.random.Generator): Random number generator to draw from. A freshly seeded generator is used if not provided.
+
+    Returns:
+        np.ndarray: An integer array of shape (num_iter, 3) with the number of 3★, 4★ and 5★ drops of each iteration, respectively in order.
+    '''
+
+    rng = np.random.default_rng() if rng is None else rng
+    accept, alias = _event_sampler(prob_4, prob_5)
+    num_pity5, num_events = len(prob_5), accept.shape[1]
+    accept, alias = accept.ravel(), alias.ravel()
+
+    item4_count = np.zeros(num_iter, dtype = np.int64)
+    item5_count = np.zeros(num_iter, dtype = np.int64)
+
+    # Working arrays of the iterations with wishes left; finished iterations are written out and dropped
+    index = np.arange(num_iter) if num_rolls > 0 else np.arange(0)
+    pity4 = np.full(len(index), pity_4, dtype = np.intp)
+    pity5 = np.full(len(index), pity_5, dtype = np.intp)
+    remaining = np.full(len(index), num_rolls, dtype = np.int64)
+    count4 = np.zeros(len(index), dtype = np.int64)
+    count5 = np.zeros(len(index), dtype = np.int64)
+
+    while len(index):
+        x = rng.random(len(index)) * num_events
+        column = x.astype(np.intp)
+        cell = (pity4 * num_pity5 + pity5) * num_events + column
+        event = np.where(x - column < accept[cell], column, alias[cell])
+        run, is5 = event >> 1, (event & 1).astype(bool)
+
+        # A drop beyond the last wish is not made, the remaining wishes are all 3★
+        remaining -= run + 1
+        dropped = remaining >= 0
+        count5 += is5 & dropped
+        count4 += ~is5 & dropped
+        pity4 = np.where(is5, pity4 + run, 1)
+        pity5 = np.where(is5, 1, pity5 + run)
+
+        finished = remaining <= 0
+        if finished.any():
+            item4_count[index[finished]] = count4[finished]
+            item5_count[index[finished]] = count5[finished]
+
+            left = ~finished
+            index, pity4, pity5, remaining, count4, count5 = index[left], pity4[left], pity5[left], remaining[left], count4[left], count5[left]
+
+    item3_count = num_rolls - item4_count - item5_count
+
+    return np.column_stack([item3_count, item4_count, item5_count])
+
+
+@lru_cache(maxsize = 8)
+def _event_sampler_cached(prob_4: bytes, prob_5: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    probs = event_table(np.frombuffer(prob_4), np.frombuffer(prob_5))
+    return alias_table(probs.reshape(-1, probs.shape[2]))
+
+
+def _event_sampler(prob_4: np.ndarray, prob_5: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Cached by the contents of the pity tables, as every block of a simulation uses the same ones
+    return _event_sampler_cached(np.asarray(prob_4, dtype = float).tobytes(), np.asarray(prob_5, dtype = float).tobytes())
+
+
+def _simulate_block(args: Tuple[str, int, int, int, int, np.random.SeedSequence, str]) -> Counter:
+    banner_type, pity_4, pity_5, wish_count, num_iter, seed_seq, method = args
+    table_4, table_5 = banner_tables(banner_type)
+    engine = simulate_events_batch if method == 'event_skipping' else simulate_rolls_batch
+
+    with span('sampling'):
+        block_sim = engine(table_4.hazard, table_5.hazard, pity_4, pity_5, wish_count, num_iter, np.random.default_rng(seed_seq))
+
+    with span('aggregation'):
+        outcomes, counts = np.unique(block_sim, axis = 0, return_counts = True)
+        return Counter(dict(zip(map(tuple, outcomes.tolist()), counts.tolist())))
+
+
+def simulate_counts(num_iter: int, banner_type: str, start_pity_4: int, start_pity_5: int, wish_count: int, seed: Optional[int] = None, workers: int = 1, cancel: Optional[threading.Event] = None, method: str = 'monte_carlo') -> Counter:
+    '''
+    Runs a Monte Carlo simulation and returns a histogram of the (3★, 4★, 5★) drop counts of every iteration.
+
+    The iterations are split into blocks of `SEED_BLOCK_ITERS`, each with its own random stream spawned from `seed`. Blocks are spread across a process pool when `workers` is more than 1, and the partial histograms are merged at the end, so the result for a given seed does not depend on the number of workers.
+
+    Args:
+        num_iter (int): The specified number of iterations for the simulation to run.
+        banner_type (str): The banner type, a key of `pity_probs.BANNERS`.
+        start_pity_4 (int): The user's current number of pulls since the last 4★ drop.
+        start_pity_5 (int): The user's current number of pulls since the last 5★ drop.
+        wish_count (int): The number of wishes to simulate per iteration.
+        seed (int): Seed of the simulation. A random seed is used if not provided.
+        workers (int): Number of worker processes to run the blocks on.
+        cancel (threading.Event): Checked between blocks; `SimulationCancelled` is raised once it is set.
+        method (str): One of `MONTE_CARLO_METHODS`: 'monte_carlo' to draw once per wish (`simulate_rolls_batch`), or 'event_skipping' to draw once per drop (`simulate_events_batch`).
+
+    Returns:
+        Counter: The number of iterations ending with each (3★, 4★, 5★) outcome.
+    '''
+
+    block_sizes = [min(SEED_BLOCK_ITERS, num_iter - start) for start in range(0, num_iter, SEED_BLOCK_ITERS)]
+    seed_seqs = np.random.SeedSequence(seed).spawn(len(block_sizes))
+    tasks = [(banner_type, start_pity_4, start_pity_5, wish_count, size, seed_seq, method) for size, seed_seq in zip(block_sizes, seed_seqs)]
+
+    if workers > 1 and len(tasks) > 1:
+        # Stages run in the worker processes are not timed individually
+        with span('worker_pool'), ProcessPoolExecutor(max_workers = min(workers, len(tasks))) as pool:
+            partials = []
+            for partial in pool.map(_simulate_block, tasks):
+                if cancel is not None and cancel.is_set():
+                    # Drop the blocks which have not started yet instead of waiting for them
+                    pool.shutdown(wait = False, cancel_futures = True)
+                    raise SimulationCancelled()
+                partials.append(partial)
+    else:
+        partials = []
+        for task in tasks:
+            _check_cancelled(cancel)
+            partials.append(_simulate_block(task))
+
+    with span('aggregation'):
+        return sum(partials, Counter())
+
+
+def _draw_units(sampler: str, num_rolls: int, num_iter: int, rng: np.random.Generator) -> Iterator[Tuple[Iterator[np.ndarray], np.ndarray]]:
+    '''
+    Yields chunks of at most `SEED_BLOCK_ITERS` iterations, `num_iter` in total: an iterator over the uniform draws of the chunk, as blocks of shape (wishes, m) with one column per iteration and `num_rolls` rows in all, and the estimation unit of each column. Units are the independent replicates a standard error is computed from: single iterations for independent draws, antithetic (u, 1 - u) pairs, or whole scrambled Sobol sequences.
+
+    As in `simulate_rolls_batch`, the draws are generated a block of wishes at a time, so the number of iterations vectorised over does not shrink as the number of wishes grows. The blocks of a chunk must be consumed before the next chunk is requested.
+    '''
+    if sampler == 'independent':
+        for start in range(0, num_iter, SEED_BLOCK_ITERS):
+            size = min(SEED_BLOCK_ITERS, num_iter - start)
+            yield (rng.random((rows, size)) for rows in _wish_blocks(num_rolls, size)), np.arange(start, start + size)
+
+    elif sampler == 'antithetic':
+        # An odd number of iterations leaves the last pair without its antithetic half
+        num_pairs, num_mirrored = math.ceil(num_iter / 2), num_iter // 2
+        for start in range(0, num_pairs, SEED_BLOCK_ITERS // 2):
+            size = min(SEED_BLOCK_ITERS // 2, num_pairs - start)
+            mirrored = min(size, num_mirrored - start)
+            yield _antithetic_blocks(rng, num_rolls, size, mirrored), np.concatenate([np.arange(start, start + size), np.arange(start, start + mirrored)])
+
+    elif sampler == 'sobol':
+        # Iterations are spread as evenly as possible over the replicates, and every chunk takes its share of each
+        sizes = [num_iter // SOBOL_REPLICATES + (replicate < num_iter % SOBOL_REPLICATES) for replicate in range(SOBOL_REPLICATES)]
+        engines = [qmc.Sobol(d = min(num_rolls, SOBOL_DIMENSIONS), scramble = True, seed = rng) for _ in sizes]
+        step = max(1, SEED_BLOCK_ITERS // SOBOL_REPLICATES)
+        for start in range(0, sizes[0], step):
+            takes = [min(step, size - start) for size in sizes]
+            with warnings.catch_warnings():
+                # Balance is only guaranteed for powers of 2, but any number of points is still a valid sample
+                warnings.simplefilter('ignore', UserWarning)
+                points = np.concatenate([engine.random(take).T for engine, take in zip(engines, takes) if take > 0], axis = 1)
+            yield _padded_blocks(rng, points, num_rolls), np.repeat(np.arange(SOBOL_REPLICATES), np.maximum(takes, 0))
+
+    else:
+        raise ValueError(f"Unknown sampler: {sampler!r}")
+
+
+def _wish_blocks(num_rolls: int, num_iter: int) -> List[int]:
+    # Numbers of wishes per block of draws, keeping each block under `BLOCK_DRAWS` draws as in `simulate_rolls_batch`
+    block = max(1, min(num_rolls, BLOCK_DRAWS // max(num_iter, 1)))
+    return [min(block, num_rolls - start) for start in range(0, num_rolls, block)]
+
+
+def _antithetic_blocks(rng: np.random.Generator, num_rolls: int, size: int, mirrored: int) -> Iterator[np.ndarray]:
+    for rows in _wish_blocks(num_rolls, size + mirrored):
+        draws = rng.random((rows, size))
+        yield np.concatenate([draws, 1 - draws[:, :mirrored]], axis = 1)
+
+
+def _padded_blocks(rng: np.random.Generator, points: np.ndarray, num_rolls: int) -> Iterator[np.ndarray]:
+    # The quasi-random draws of the first wishes, then independent draws for the wishes past `SOBOL_DIMENSIONS`
+    start = 0
+    for rows in _wish_blocks(num_rolls, points.shape[1]):
+        block = points[start:start + rows]
+        if len(block) < rows:
+            block = np.concatenate([block, rng.random((rows - len(block), points.shape[1]))])
+        yield block
+        start += rows
+
+
+def _unit_std_error(units: np.ndarray, values: np.ndarray) -> np.ndarray:
+    '''
+    Standard errors of the means of the columns of `values`, estimated from the spread of the means of each estimation unit.
+    '''
+    _, inverse = np.unique(units, return_inverse = True)
+    sizes = np.bincount(inverse)
+    if len(sizes) < 2:
+        return np.full(values.shape[1], np.nan)
+
+    unit_means = np.stack([np.bincount(inverse, weights = values[:, i]) for i in range(values.shape[1])], axis = 1) / sizes[:, None]
+    # Weighted by unit size, so that a shorter last Sobol replicate or antithetic pair counts for less
+    weights = sizes / sizes.sum()
+    mean = weights @ unit_means
+    variance = weights @ (unit_means - mean) ** 2 * len(sizes) / (len(sizes) - 1)
+
+    return np.sqrt(variance / len(sizes))
+
+
+def sample_outcomes(prob_4: np.ndarray, prob_5: np.ndarray, pity_4: int, pity_5: int, num_rolls: int, num_iter: int, sampler: str = 'independent', rng: Optional[np.random.Generator] = None, cancel: Optional[threading.Event] = None) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Simulates iterations with variance-reduced draws, and estimates the standard error of the mean 3★, 4★ and 5★ drop counts from the spread between independent estimation units.
+
+    Args:
+        prob_4 (np.ndarray): Lookup array of 4★ probabilities indexed by 4★ pity (see `pity_probs.PityTable.hazard`).
+        prob_5 (np.ndarray): Lookup array of 5★ probabilities indexed by 5★ pity (see `pity_probs.PityTable.hazard`).
+        pity_4 (int): The user's current number of pulls since the last 4★ drop.
+        pity_5 (int): The user's current number of pulls since the last 5★ drop.
+        num_rolls (int): The number of wishes per iteration.
+        num_iter (int): The number of iterations. With an odd number, the last antithetic pair only has its first half; Sobol replicates differ in size by at most one iteration.
+        sampler (str): A key of `SAMPLERS`. 'antithetic' pairs every draw u with 1 - u, 'sobol' uses `SOBOL_REPLICATES` independently scrambled Sobol sequences with one dimension per wish, up to `SOBOL_DIMENSIONS` wishes.
+        rng (np.random.Generator): Random number generator to draw from (and to scramble with). A freshly seeded generator is used if not provided.
+        cancel (threading.Event): Checked between chunks; `SimulationCancelled` is raised once it is set.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: An integer array of shape (n, 3) of the 3★, 4★ and 5★ drops of each iteration, and the standard errors of their means.
+    '''
+    rng = np.random.default_rng() if rng is None else rng
+
+    outcomes, units = [], []
+    for blocks, chunk_units in _draw_units(sampler, num_rolls, num_iter, rng):
+        _check_cancelled(cancel)
+        state = _start_state(pity_4, pity_5, len(chunk_units))
+        for draws in blocks:
+            _advance(prob_4, prob_5, *state, draws)
+        outcomes.append(_state_outcomes(num_rolls, state))
+        units.append(chunk_units)
+
+    outcomes = np.concatenate(outcomes)
+    return outcomes, _unit_std_error(np.concatenate(units), outcomes)
+
+
+def compare_scenarios(banner_type: str, scenarios: Sequence[Tuple[int, int, int]], num_iter: int, sampler: str = 'independent', seed: Optional[int] = None, cancel: Optional[threading.Event] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Simulates several scenarios with common random numbers: every scenario is driven by the same draws, so the differences between them are estimated with far less noise than from independent simulations.
+
+    Args:
+        banner_type (str): The banner type, a key of `pity_probs.BANNERS`.
+        scenarios (Sequence[Tuple[int, int, int]]): The (4★ pity, 5★ pity, number of wishes) of each scenario. Scenarios with fewer wishes use the first draws of each iteration.
+        num_iter (int): The number of iterations per scenario.
+        sampler (str): A key of `SAMPLERS`, see `sample_outcomes`.
+        seed (int): Seed of the simulation. A random seed is used if not provided.
+        cancel (threading.Event): Checked between chunks; `SimulationCancelled` is raised once it is set.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Arrays of shape (len(scenarios), 3) of the mean 3★, 4★ and 5★ drops of each scenario, the standard errors of these means, and the standard errors of their differences from the first scenario.
+    '''
+    table_4, table_5 = banner_tables(banner_type)
+    max_rolls = max(wishes for _, _, wishes in scenarios)
+    rng = np.random.default_rng(seed)
+
+    outcomes, units = [], []
+    for blocks, chunk_units in _draw_units(sampler, max_rolls, num_iter, rng):
+        _check_cancelled(cancel)
+        states = [_start_state(pity_4, pity_5, len(chunk_units)) for pity_4, pity_5, _ in scenarios]
+        start = 0
+        for draws in blocks:
+            for (_, _, wishes), state in zip(scenarios, states):
+                _advance(table_4.hazard, table_5.hazard, *state, draws[:max(wishes - start, 0)])
+            start += len(draws)
+
+        # Columns of 3★, 4★ and 5★ drops of every scenario side by side
+        outcomes.append(np.concatenate([_state_outcomes(wishes, state) for (_, _, wishes), state in zip(scenarios, states)], axis = 1))
+        units.append(chunk_units)
+
+    outcomes, units = np.concatenate(outcomes), np.concatenate(units)
+    differences = outcomes - np.tile(outcomes[:, :3], len(scenarios))
+
+    means = outcomes.mean(axis = 0).reshape(-1, 3)
+    std_errors = _unit_std_error(units, outcomes).reshape(-1, 3)
+    diff_std_errors = _unit_std_error(units, differences).reshape(-1, 3)
+
+    return means, std_errors, diff_std_errors
+
+
+def stream_simulation(num_iter: int, banner_type: str, start_pity_4: int, start_pity_5: int, wish_count: int, seed: Optional[int] = None, target_rel_width: Optional[float] = None, z: float = 1.96, method: str = 'monte_carlo') -> Iterator[Counter]:
+    '''
+    Runs a Monte Carlo simulation in chunks, yielding the cumulative histogram of (3★, 4★, 5★) drop counts after each chunk.
+
+    Chunks start at `STREAM_FIRST_CHUNK` iterations and double in size up to `SEED_BLOCK_ITERS`, each with its own random stream spawned from `seed`. `num_iter` is a cap: if `target_rel_width` is given, the simulation stops as soon as the widest confidence interval of the charted probabilities, relative to each probability (see `relative_ci_width`), is no wider than it, but never before `STREAM_MIN_ITERATIONS` iterations.
+
+    Args:
+        num_iter (int): The maximum number of iterations for the simulation to run.
+        banner_type (str): The banner type, a key of `pity_probs.BANNERS`.
+        start_pity_4 (int): The user's current number of pulls since the last 4★ drop.
+        start_pity_5 (int): The user's current number of pulls since the last 5★ drop.
+        wish_count (int): The number of wishes to simulate per iteration.
+        seed (int): Seed of the simulation. A random seed is used if not provided.
+        target_rel_width (float): Relative confidence interval width at which to stop early, e.g. 0.2 for intervals of ±10% of each probability. The simulation runs all `num_iter` iterations if not provided.
+        z (float): Standard score of the confidence level (1.96 for 95%).
+        method (str): One of `MONTE_CARLO_METHODS`, see `simulate_counts`.
+
+    Yields:
+        Counter: The number of iterations ending with each (3★, 4★, 5★) outcome so far.
+    '''
+
+    chunk_sizes = []
+    while sum(chunk_sizes) < num_iter:
+        chunk = min(STREAM_FIRST_CHUNK * 2 ** len(chunk_sizes), SEED_BLOCK_ITERS)
+        chunk_sizes.append(min(chunk, num_iter - sum(chunk_sizes)))
+
+    histogram = Counter()
+    done = 0
+    for size, seed_seq in zip(chunk_sizes, np.random.SeedSequence(seed).spawn(len(chunk_sizes))):
+        block = _simulate_block((banner_type, start_pity_4, start_pity_5, wish_count, size, seed_seq, method))
+        with span('aggregation'):
+            histogram += block
+        done += size
+        yield histogram
+
+        if target_rel_width is not None and done >= STREAM_MIN_ITERATIONS and relative_ci_width(histogram, z) <= target_rel_width:
+            return
+
+
+def relative_ci_width(histogram: Counter, z: float = 1.96, top_k: int = STREAM_TOP_K) -> float:
+    '''
+    Returns the width of the widest normal-approximation confidence interval among the probabilities the simulator charts, relative to each probability: those of the `top_k` most frequent outcomes, and of the `top_k` most frequent drop counts of each rarity.
+
+    Probabilities below `STREAM_MIN_SHARE` of the largest one in their chart are left out, as their bars are too short to read and their relative intervals would keep every simulation running to its cap. When outcomes are spread thin, every probability is small, and so is the largest: they all stay in and the interval stays wide until enough iterations have hit each of them.
+    '''
+    outcomes = np.array(list(histogram), dtype = np.int64).reshape(-1, 3)
+    counts = np.array(list(histogram.values()), dtype = float)
+    n = counts.sum()
+
+    widest = 0.0
+    for chart in [counts] + [np.bincount(outcomes[:, i], weights = counts) for i in range(3)]:
+        cells = np.sort(chart[chart > 0])[::-1][:top_k]
+        probs = cells[cells >= STREAM_MIN_SHARE * cells[0]] / n
+        widest = max(widest, float(np.max(2 * z * np.sqrt((1 - probs) / (n * probs)))))
+
+    return widest
+
+
+def simulation(num_iter: int, banner_type: str, start_pity_4: int, start_pity_5: int, wish_count: int, seed: Optional[int] = None, method: str = 'monte_carlo', workers: int = 1, cancel: Optional[threading.Event] = None, sampler: str = 'independent') -> SimulationResult:
+    table_4, table_5 = banner_tables(banner_type)
+
+    if method == 'exact':
+        with span('exact_distribution'):
+            outcomes, probs = exact_distribution(table_4.hazard, table_5.hazard, start_pity_4, start_pity_5, wish_count, cancel = cancel)
+        # Expected frequency of each outcome out of `num_iter` wishing sessions
+        return SimulationResult(outcomes, probs * num_iter, np.zeros(3))
+
+    elif method == 'event_skipping' or (method == 'monte_carlo' and sampler == 'independent'):
+        return SimulationResult.from_histogram(simulate_counts(num_iter, banner_type, start_pity_4, start_pity_5, wish_count, seed, workers, cancel, method))
+
+    elif method == 'monte_carlo':
+        with span('sampling'):
+            outcomes, std_error = sample_outcomes(table_4.hazard, table_5.hazard, start_pity_4, start_pity_5, wish_count, num_iter, sampler, np.random.default_rng(seed), cancel)
+        with span('aggregation'):
+            outcomes, counts = np.unique(outcomes, axis = 0, return_counts = True)
+        return SimulationResult(outcomes, counts, std_error)
+
+    raise ValueError(f"Unknown simulation method: {method!r}")
+
+
+def transition_probs(prob_4: np.ndarray, prob_5: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    The probabilities of a 3★, 4★ and 5★ drop on the next wish from every (4★ pity, 5★ pity) state, using a single uniform draw as in `simulate_rolls`: arrays of shape (len(prob_4), len(prob_5)) indexed by the two pities.
+    '''
+    p4 = prob_4[:, None]
+    p5 = prob_5[None, :]
+    move5 = np.broadcast_to(p5, (len(prob_4), len(prob_5)))
+    move4 = np.clip(p4 - p5, 0, None)
+    move3 = np.clip(1 - np.maximum(p4, p5), 0, None)
+    return move3, move4, move5
+
+
+def exact_distribution(prob_4: np.ndarray, prob_5: np.ndarray, pity_4: int, pity_5: int, num_rolls: int, tol: float = 1e-12, cancel: Optional[threading.Event] = None) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Computes the exact joint distribution of 3★, 4★ and 5★ drop counts after a specified number of gacha rolls by dynamic programming over the (4★ pity, 5★ pity) Markov chain, following the same rules as `simulate_rolls`.
+
+    Drop counts whose total probability falls below `tol` at any wish are pruned from the state tensor, so the running time scales with the number of wishes times the number of reachable states.
+
+    Args:
+        prob_4 (np.ndarray): Lookup array of 4★ probabilities indexed by 4★ pity (see `pity_probs.PityTable.hazard`).
+        prob_5 (np.ndarray): Lookup array of 5★ probabilities indexed by 5★ pity (see `pity_probs.PityTable.hazard`).
+        pity_4 (int): The user's current number of pulls since the last 4★ drop.
+        pity_5 (int): The user's current number of pulls since the last 5★ drop.
+        num_rolls (int): The specified number of gacha rolls as provided by the user.
+        tol (float): Probability mass below which the extreme drop counts are discarded.
+        cancel (threading.Event): Checked after every wish; `SimulationCancelled` is raised once it is set.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: An integer array of shape (k, 3) of the possible 3★, 4★ and 5★ drop counts, and an array of their k probabilities.
+    '''
+    return exact_distributions(prob_4, prob_5, pity_4, pity_5, [num_rolls], tol, cancel)[num_rolls]
+
+
+def exact_distributions(prob_4: np.ndarray, prob_5: np.ndarray, pity_4: int, pity_5: int, checkpoints: Sequence[int], tol: float = 1e-12, cancel: Optional[threading.Event] = None) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    '''
+    `exact_distribution` after each of several numbers of wishes, read off a single pass up to the largest one.
+
+    Args:
+        prob_4 (np.ndarray): Lookup array of 4★ probabilities indexed by 4★ pity (see `pity_probs.PityTable.hazard`).
+        prob_5 (np.ndarray): Lookup array of 5★ probabilities indexed by 5★ pity (see `pity_probs.PityTable.hazard`).
+        pity_4 (int): The user's current number of pulls since the last 4★ drop.
+        pity_5 (int): The user's current number of pulls since the last 5★ drop.
+        checkpoints (Sequence[int]): The numbers of wishes to return the distributions after.
+        tol (float): Probability mass below which the extreme drop counts are discarded.
+        cancel (threading.Event): Checked after every wish; `SimulationCancelled` is raised once it is set.
+
+    Returns:
+        Dict[int, Tuple[np.ndarray, np.ndarray]]: The outcomes and probabilities (as returned by `exact_distribution`) after each number of wishes.
+    '''
+    checkpoints = set(int(wishes) for wishes in checkpoints)
+
+    move3, move4, move5 = transition_probs(prob_4, prob_5)
+
+    # dist[i, j, a, b]: probability of (lo4 + i) 4★ drops, (lo5 + j) 5★ drops and pities (a, b)
+    dist = np.zeros((1, 1, len(prob_4), len(prob_5)))
+    dist[0, 0, pity_4, pity_5] = 1
+    lo4, lo5 = 0, 0
+
+    results = {}
+    for wishes in range(max(checkpoints) + 1):
+        if wishes > 0:
+            _check_cancelled(cancel)
+            n4, n5 = dist.shape[:2]
+            new = np.zeros((n4 + 1, n5 + 1, len(prob_4), len(prob_5)))
+
+            # 3★: both pities advance (the last pity of each table always drops, so nothing overflows)
+            new[:n4, :n5, 1:, 1:] += (dist * move3)[:, :, :-1, :-1]
+            # 4★: 4★ pity resets, 5★ pity is unchanged
+            new[1:, :n5, 1, :] += (dist * move4).sum(axis = 2)
+            # 5★: 5★ pity resets, 4★ pity is unchanged
+            new[:n4, 1:, :, 1] += (dist * move5).sum(axis = 3)
+
+            # Prune negligible drop counts from both ends of each count axis
+            mass4 = new.sum(axis = (1, 2, 3))
+            mass5 = new.sum(axis = (0, 2, 3))
+            keep4 = np.flatnonzero(mass4 > tol)
+            keep5 = np.flatnonzero(mass5 > tol)
+            dist = new[keep4[0]:keep4[-1] + 1, keep5[0]:keep5[-1] + 1]
+            lo4 += keep4[0]
+            lo5 += keep5[0]
+
+        if wishes in checkpoints:
+            probs = dist.sum(axis = (2, 3))
+            idx4, idx5 = np.nonzero(probs > tol)
+            item4_count = idx4 + lo4
+            item5_count = idx5 + lo5
+            item3_count = wishes - item4_count - item5_count
+            results[wishes] = (np.column_stack([item3_count, item4_count, item5_count]), probs[idx4, idx5])
+
+    return results
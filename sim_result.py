@@ -0,0 +1,181 @@
+import numpy as np
+
+import json
+
+from collections import Counter
+from dataclasses import dataclass
+from lazy_imports import lazy_import
+from typing import Dict, Optional
+
+# Only needed to build DataFrames for display
+pd = lazy_import('pandas')
+
+
+RARITIES = ['3★', '4★', '5★']
+
+
+@dataclass
+class SimulationResult:
+    '''
+    A compact histogram of simulation outcomes, storing each distinct (3★, 4★, 5★) outcome once with its weight instead of one row per iteration.
+
+    Attributes:
+        outcomes (np.ndarray): An integer array of shape (k, 3) of the distinct 3★, 4★ and 5★ drop counts. Integer arrays are kept as they are, so that a view into a mapped file (see `outcome_table.OutcomeTable.result`) is not copied; anything else is converted to int64.
+        counts (np.ndarray): The weight of each outcome, i.e. the number of iterations ending with it. Weights may be fractional for exact distributions, where they are expected frequencies.
+        std_error (np.ndarray): Standard errors of the mean 3★, 4★ and 5★ drop counts when estimated by a variance-reduced sampler (zero for exact distributions), or None for independent iterations.
+    '''
+    outcomes: np.ndarray
+    counts: np.ndarray
+    std_error: Optional[np.ndarray] = None
+
+    def __post_init__(self):
+        outcomes = np.asarray(self.outcomes)
+        self.outcomes = (outcomes if np.issubdtype(outcomes.dtype, np.integer) else outcomes.astype(np.int64)).reshape(-1, 3)
+        self.counts = np.asarray(self.counts, dtype = float)
+        if self.std_error is not None:
+            self.std_error = np.asarray(self.std_error, dtype = float)
+
+    @classmethod
+    def from_histogram(cls, histogram: Counter) -> 'SimulationResult':
+        keys = sorted(histogram)
+        return cls(np.array(keys, dtype = np.int64), np.array([histogram[k] for k in keys]))
+
+    @property
+    def n(self) -> float:
+        return float(self.counts.sum())
+
+    @property
+    def probs(self) -> np.ndarray:
+        return self.counts / self.counts.sum()
+
+    def merge(self, other: 'SimulationResult') -> 'SimulationResult':
+        '''
+        Returns the combined histogram of two results, e.g. from separate batches of the same simulation.
+        '''
+        outcomes, inverse = np.unique(np.concatenate([self.outcomes, other.outcomes]), axis = 0, return_inverse = True)
+        counts = np.bincount(inverse.ravel(), weights = np.concatenate([self.counts, other.counts]))
+        return SimulationResult(outcomes, counts)
+
+    def means(self) -> np.ndarray:
+        '''
+        The weighted mean 3★, 4★ and 5★ drop counts.
+        '''
+        return self.probs @ self.outcomes
+
+    def mean_std_error(self) -> np.ndarray:
+        '''
+        Standard errors of the mean 3★, 4★ and 5★ drop counts: the sampler's own estimate if there is one, otherwise std / sqrt(n) as for independent iterations.
+        '''
+        if self.std_error is not None:
+            return self.std_error
+
+        variance = self.probs @ (self.outcomes - self.means()) ** 2 * self.n / (self.n - 1) if self.n > 1 else np.full(3, np.nan)
+        return np.sqrt(variance / self.n)
+
+    def marginal(self, star: str):
+        '''
+        Returns the sorted distinct drop counts of one rarity and their total weights.
+        '''
+        values, inverse = np.unique(self.outcomes[:, RARITIES.index(star)], return_inverse = True)
+        return values, np.bincount(inverse, weights = self.counts)
+
+    def quantile(self, star: str, q: float) -> float:
+        '''
+        Weighted quantile of the drop counts of one rarity, matching the linear interpolation of `pd.Series.quantile` on the expanded data for whole-number weights.
+        '''
+        values, weights = self.marginal(star)
+        cum_weights = np.cumsum(weights)
+
+        position = (self.n - 1) * q
+        lower = np.floor(position)
+        lower_value = values[min(np.searchsorted(cum_weights, lower, side = 'right'), len(values) - 1)]
+        upper_value = values[min(np.searchsorted(cum_weights, lower + 1, side = 'right'), len(values) - 1)]
+
+        return float(lower_value + (position - lower) * (upper_value - lower_value))
+
+    def describe(self, star: str) -> Dict[str, float]:
+        '''
+        Weighted summary statistics of the drop counts of one rarity, with the same keys as `pd.Series.describe()` plus the mode.
+        '''
+        values, weights = self.marginal(star)
+        mean = np.average(values, weights = weights)
+        variance = np.sum(weights * (values - mean) ** 2) / (self.n - 1) if self.n > 1 else np.nan
+
+        return {'count': self.n,
+                'mean': float(mean),
+                'std': float(np.sqrt(variance)),
+                'min': float(values.min()),
+                '25%': self.quantile(star, 0.25),
+                '50%': self.quantile(star, 0.5),
+                '75%': self.quantile(star, 0.75),
+                'max': float(values.max()),
+                'mode': float(values[np.argmax(weights)])}
+
+    def summary(self) -> 'pd.DataFrame':
+        '''
+        Summary statistics of every rarity, one row per rarity.
+        '''
+        return pd.DataFrame({star: self.describe(star) for star in RARITIES}).T
+
+    def to_frame(self) -> 'pd.DataFrame':
+        '''
+        The DataFrame of outcomes, counts and probabilities shown by the simulator. Fractional weights are rounded to whole counts.
+        '''
+        data_list = [(f'{k[0]}/{k[1]}/{k[2]}', k[0], k[1], k[2], v) for k, v in zip(self.outcomes.tolist(), np.rint(self.counts).astype(int).tolist())]
+
+        df = pd.DataFrame(data_list, columns = ['3★/4★/5★', *RARITIES, 'Count'])
+        df['Prob'] = self.probs
+
+        return df
+
+    def top_frame(self, k: int) -> 'pd.DataFrame':
+        '''
+        A bounded DataFrame of the `k` most frequent outcomes plus one row aggregating every other outcome, for charts whose size must not grow with the number of distinct outcomes. All columns are numeric: the aggregated row has -1 drop counts, and 'Outcomes' is the number of outcomes each row stands for.
+        '''
+        order = np.argsort(-self.counts, kind = 'stable')
+        top, rest = order[:k], order[k:]
+
+        outcomes = self.outcomes[top]
+        merged = np.ones(len(top), dtype = np.int64)
+        counts = self.counts[top]
+
+        if len(rest):
+            outcomes = np.vstack([outcomes, [[-1, -1, -1]]])
+            merged = np.append(merged, len(rest))
+            counts = np.append(counts, self.counts[rest].sum())
+
+        df = pd.DataFrame(outcomes, columns = RARITIES)
+        df['Outcomes'] = merged
+        df['Count'] = np.rint(counts).astype(int)
+        df['Prob'] = counts / self.n
+        df['Rank'] = np.arange(1, len(df) + 1)
+
+        return df
+
+    def marginal_frame(self) -> 'pd.DataFrame':
+        '''
+        A long-format DataFrame of the distribution of drop counts of each rarity, with one row per rarity and distinct drop count.
+        '''
+        frames = []
+        for star in RARITIES:
+            values, weights = self.marginal(star)
+            frames.append(pd.DataFrame({'Rarity': star, 'Drops': values, 'Count': np.rint(weights).astype(int), 'Prob': weights / self.n}))
+
+        return pd.concat(frames, ignore_index = True)
+
+    def to_dict(self) -> dict:
+        data = {'outcomes': self.outcomes.tolist(), 'counts': self.counts.tolist()}
+        if self.std_error is not None:
+            data['std_error'] = self.std_error.tolist()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SimulationResult':
+        return cls(np.array(data['outcomes'], dtype = np.int64), np.array(data['counts']), data.get('std_error'))
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, text: str) -> 'SimulationResult':
+        return cls.from_dict(json.loads(text))
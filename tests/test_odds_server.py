@@ -0,0 +1,28 @@
+import http.client
+import threading
+
+from odds_server import OddsQuery, QueryCoalescer, serve
+
+
+def test_cancelled_query_does_not_stop_the_coalescer():
+    coalescer = QueryCoalescer(window = 0.2)
+
+    cancelled = coalescer.submit(OddsQuery('character', 1, 1, 7, method = 'exact'))
+    assert cancelled.cancel()
+
+    later = coalescer.submit(OddsQuery('character', 1, 1, 8, method = 'exact'))
+    assert later.result(timeout = 60).n > 0
+
+
+def test_invalid_content_length_is_a_bad_request():
+    server = serve(port = 0)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    try:
+        connection = http.client.HTTPConnection(*server.server_address, timeout = 10)
+        connection.putrequest('POST', '/odds')
+        connection.putheader('Content-Length', 'abc')
+        connection.endheaders()
+        assert connection.getresponse().status == 400
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,24 @@
+import numpy as np
+
+from outcome_table import OUTCOME_TABLE_ENV, build, outcome_table, table_simulation
+from sim_engine import simulation
+
+
+def test_table_built_after_start_is_served_as_read_only_views(tmp_path, monkeypatch):
+    path = tmp_path / 'outcome_table.bin'
+    monkeypatch.setenv(OUTCOME_TABLE_ENV, str(path))
+    assert outcome_table() is None
+
+    build(path, ['character'], [1, 3], [1, 50], [10, 40])
+    table = outcome_table()
+    assert table is not None
+
+    result = table_simulation(10000, 'character', 3, 50, 40)
+    expected = simulation(10000, 'character', 3, 50, 40, method = 'exact')
+    assert np.array_equal(result.outcomes, expected.outcomes)
+    assert np.allclose(result.counts, expected.counts)
+
+    assert np.shares_memory(result.outcomes, table.records)
+    assert not result.outcomes.flags.writeable and not result.counts.flags.writeable
+    assert table_simulation(10000, 'character', 3, 50, 40).counts is result.counts
+    assert table_simulation(10000, 'character', 2, 50, 40) is None
@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+from pity_probs import BANNERS
+from planner import featured_pulls_grid, success_grid
+
+
+BUDGET = 1500
+
+
+@pytest.mark.parametrize('banner_type', list(BANNERS))
+@pytest.mark.parametrize('guaranteed', [False, True])
+def test_any_5star_is_at_least_as_likely_as_featured_copies(banner_type, guaranteed):
+    banner = BANNERS[banner_type]
+    any_5star = success_grid(featured_pulls_grid(banner, 1, featured_rate = 1), BUDGET)
+
+    for copies in range(1, 8):
+        featured = success_grid(featured_pulls_grid(banner, copies, guaranteed), BUDGET)
+        assert np.all(any_5star >= featured - 1e-9), f'{copies} copies'
@@ -0,0 +1,22 @@
+import pytest
+
+from wish_history import parse_history_bytes
+
+
+def test_parses_valid_export():
+    histories = parse_history_bytes(b'gacha_type,rank_type\n301,3\n301,4\n301,5\n301,3\n', 'history.csv')
+    assert [(h.pulls, h.count_4star, h.count_5star) for h in histories] == [(4, 1, 1)]
+
+
+@pytest.mark.parametrize('data, name, message', [
+    (b'gacha_type,rank_type\n301\n', 'history.csv', 'Line 2'),
+    (b'gacha_type,rank_type\n301,3\n301\n', 'history.csv', 'Line 3'),
+    (b'[{"gacha_type": 301, "rank_type": 3}, 5]', 'history.json', 'Record 2'),
+    (b'["301"]', 'history.json', 'Record 1'),
+    (b'{"gacha_type": 301, "rank_type": 3}\n[1, 2]\n', 'history.jsonl', 'Line 2'),
+    (b'[{"gacha_type": 301, "rank_type": 3}, {"gacha_type": 301}]', 'history.json', 'Record 2'),
+    (b'{"list": 5}', 'history.json', 'list of records'),
+])
+def test_malformed_export_is_a_value_error(data, name, message):
+    with pytest.raises(ValueError, match = message):
+        parse_history_bytes(data, name)
@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from lazy_imports import lazy_import
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Only needed to check the query parameters and draw the debug panel
+st = lazy_import('streamlit')
+
+
+# Environment variables enabling the timings for every session, and writing the aggregated timings to a Prometheus textfile after each rerun
+ENABLE_ENV = 'WISHSTATS_TIMINGS'
+METRICS_FILE_ENV = 'WISHSTATS_METRICS_FILE'
+
+# Query parameter enabling the timings and the debug panel for one session, e.g. ?timings=1
+QUERY_PARAM = 'timings'
+
+
+class _NoSpan:
+    '''
+    The span returned while no rerun is being timed. Entering and leaving it does nothing.
+    '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Rerun:
+    '''
+    The spans recorded during one rerun of a page, in the order they finished.
+    '''
+
+    def __init__(self, page: str):
+        self.page = page
+        self.spans: List[Tuple[str, float]] = []
+        self.start = time.perf_counter()
+        self.elapsed = None
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, time.perf_counter() - start))
+
+    def breakdown(self) -> Dict[str, Tuple[int, float]]:
+        '''
+        Returns the number of calls and the total seconds of each span name.
+        '''
+        totals = {}
+        for name, seconds in self.spans:
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, total + seconds)
+        return totals
+
+
+class TimingStats:
+    '''
+    Timings aggregated over every timed rerun of every session in the process: the number of calls, the total and the maximum seconds of each (page, span) pair. A span named 'rerun' covers each whole rerun.
+    '''
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, rerun: Rerun):
+        with self._lock:
+            for name, seconds in [*rerun.spans, ('rerun', rerun.elapsed)]:
+                stats = self._stats.setdefault((rerun.page, name), [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+
+    def snapshot(self) -> Dict[Tuple[str, str], Tuple[int, float, float]]:
+        with self._lock:
+            return {key: tuple(stats) for key, stats in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+    def to_json(self) -> str:
+        return json.dumps([{'page': page, 'span': name, 'count': count, 'total_seconds': total, 'max_seconds': peak}
+                           for (page, name), (count, total, peak) in sorted(self.snapshot().items())], indent = 2)
+
+    def to_prometheus(self) -> str:
+        '''
+        The aggregated timings in the Prometheus text exposition format, as a summary (count and sum) plus a gauge of the maximum of each span.
+        '''
+        lines = ['# HELP wishstats_span_seconds Time spent in each stage of a page rerun.',
+                 '# TYPE wishstats_span_seconds summary']
+        maxima = ['# HELP wishstats_span_max_seconds Longest time spent in each stage of a page rerun.',
+                  '# TYPE wishstats_span_max_seconds gauge']
+
+        for (page, name), (count, total, peak) in sorted(self.snapshot().items()):
+            labels = '{page="%s",span="%s"}' % (_escape_label(page), _escape_label(name))
+            lines += [f'wishstats_span_seconds_count{labels} {count}', f'wishstats_span_seconds_sum{labels} {total:.6f}']
+            maxima.append(f'wishstats_span_max_seconds{labels} {peak:.6f}')
+
+        return '\n'.join(lines + maxima) + '\n'
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Shared by every session of the app
+timing_stats = TimingStats()
+
+# The rerun being timed on the current thread (Streamlit runs each session's reruns on its own thread)
+_local = threading.local()
+
+
+def span(name: str):
+    '''
+    Times the enclosed block as a stage of the current rerun. Does nothing unless the rerun is being timed, so it can be left in hot code paths.
+
+    Example:
+        with span('chart'):
+            chart = freq_chart(source, subtitle)
+    '''
+    rerun = current_rerun()
+    return NO_SPAN if rerun is None else rerun.span(name)
+
+
+def current_rerun() -> Optional[Rerun]:
+    '''
+    The rerun being timed on the current thread, if any, e.g. to time work handed to another thread with `timed_rerun`.
+    '''
+    return getattr(_local, 'rerun', None)
+
+
+@contextmanager
+def timed_rerun(rerun: Optional[Rerun]) -> Iterator[Optional[Rerun]]:
+    '''
+    Records the spans of the enclosed block on another thread in `rerun` (from `current_rerun()` on the thread handing the work over), so that work moved off the script thread still shows up in the breakdown of its rerun.
+
+    Example:
+        rerun = current_rerun()
+
+        def work():
+            with timed_rerun(rerun):
+                return simulation(...)
+
+        executor.submit(work)
+    '''
+    previous = getattr(_local, 'rerun', None)
+    _local.rerun = rerun
+    try:
+        yield rerun
+    finally:
+        _local.rerun = previous
+
+
+def timings_enabled() -> bool:
+    '''
+    Whether reruns are timed, either for every session through the `WISHSTATS_TIMINGS` environment variable or for the current session through the `?timings=1` query parameter.
+    '''
+    return os.environ.get(ENABLE_ENV, '') not in ('', '0') or st.query_params.get(QUERY_PARAM, '') not in ('', '0')
+
+
+@contextmanager
+def page_timings(page: str) -> Iterator[Optional[Rerun]]:
+    '''
+    Times a rerun of a page if timings are enabled, records it in `timing_stats` and shows the breakdown in the sidebar.
+
+    Example:
+        with page_timings('Drop Rate Simulator'):
+            main()
+    '''
+    if not timings_enabled():
+        yield None
+        return
+
+    rerun = _local.rerun = Rerun(page)
+    try:
+        yield rerun
+    finally:
+        _local.rerun = None
+        rerun.elapsed = time.perf_counter() - rerun.start
+        timing_stats.record(rerun)
+
+        if os.environ.get(METRICS_FILE_ENV):
+            _write_metrics_file(os.environ[METRICS_FILE_ENV])
+
+    timings_panel(rerun)
+
+
+def _write_metrics_file(path: str):
+    # Written to a temporary file and renamed, so that a scraper never reads a partial file
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(timing_stats.to_prometheus())
+    os.replace(temp_path, path)
+
+
+def timings_panel(rerun: Rerun):
+    '''
+    Shows the breakdown of a timed rerun and downloads of the aggregated timings in the sidebar.
+    '''
+    with st.sidebar:
+        st.markdown('### ⏱️ Rerun timings')
+        st.caption(f'{rerun.page}: {rerun.elapsed * 1000:.0f} ms in total')
+
+        rows = [(name, count, total * 1000, total / rerun.elapsed) for name, (count, total) in rerun.breakdown().items()]
+        st.dataframe({'Stage': [r[0] for r in rows], 'Calls': [r[1] for r in rows], 'ms': [round(r[2], 1) for r in rows], 'Share': [f'{r[3]:.0%}' for r in rows]},
+                     hide_index = True, use_container_width = True)
+
+        st.download_button('Download aggregated timings (JSON)', timing_stats.to_json(), file_name = 'wishstats_timings.json', mime = 'application/json')
+        st.download_button('Download aggregated timings (Prometheus)', timing_stats.to_prometheus(), file_name = 'wishstats_timings.prom', mime = 'text/plain')
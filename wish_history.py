@@ -0,0 +1,275 @@
+import csv
+import io
+import json
+import re
+
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pity_probs import get_banner
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Size of the text chunks read when streaming a JSON array
+CHUNK_SIZE = 1 << 16
+
+# Whitespace and commas between the objects of a JSON array
+SEPARATORS = re.compile(r'[\s,]*')
+
+# Accepted column names for each field of a wish record (compared in lower case)
+BANNER_COLUMNS = ['gacha_type', 'banner', 'banner_type', 'wish_type', 'pool']
+RARITY_COLUMNS = ['rank_type', 'rarity', 'stars', 'star', 'rank']
+TIME_COLUMNS = ['time', 'date', 'timestamp']
+
+# Pools sharing a pity counter in game, keyed by the banner codes and names used by common exports, with the matching key of `pity_probs.BANNERS`
+POOLS = {
+    '301': ('Character Event', 'character'),
+    '400': ('Character Event', 'character'),
+    '302': ('Weapon Event', 'weapon'),
+    '200': ('Standard', 'character'),
+    '500': ('Chronicled Wish', 'chronicled'),
+    '100': ("Beginners' Wish", None),
+}
+POOL_KEYWORDS = [
+    ('weapon', ('Weapon Event', 'weapon')),
+    ('chronicled', ('Chronicled Wish', 'chronicled')),
+    ('beginner', ("Beginners' Wish", None)),
+    ('standard', ('Standard', 'character')),
+    ('permanent', ('Standard', 'character')),
+    ('wanderlust', ('Standard', 'character')),
+    ('character', ('Character Event', 'character')),
+]
+
+
+@dataclass
+class BannerHistory:
+    '''
+    Pity and drop statistics of one wish pool, derived from a wish history export.
+
+    Attributes:
+        pool (str): Name of the pool, e.g. 'Character Event'.
+        banner_type (str): The matching key of `pity_probs.BANNERS`, or None if the simulator does not model the pool.
+        pulls (int): Number of wishes made on the pool.
+        count_4star (int): Number of 4★ drops.
+        count_5star (int): Number of 5★ drops.
+        pity_4 (int): Current 4★ pity as entered in the simulator (wishes since the last 4★ drop plus 1).
+        pity_5 (int): Current 5★ pity as entered in the simulator (wishes since the last 5★ drop plus 1).
+        intervals_5star (Counter): Observed number of wishes between consecutive 5★ drops (counting the drop itself).
+        intervals_4star (Counter): Observed number of wishes between consecutive 4★ drops (counting the drop itself).
+    '''
+    pool: str
+    banner_type: Optional[str]
+    pulls: int = 0
+    count_4star: int = 0
+    count_5star: int = 0
+    pity_4: int = 1
+    pity_5: int = 1
+    intervals_5star: Counter = field(default_factory = Counter)
+    intervals_4star: Counter = field(default_factory = Counter)
+
+
+class _PoolTracker:
+    '''
+    Streaming state of one pool. Only the positions of 4★ and 5★ drops are kept, so memory grows with the number of drops rather than the number of wishes, and the export may be sorted either way.
+    '''
+
+    def __init__(self, pool: str, banner_type: Optional[str]):
+        self.pool = pool
+        self.banner_type = banner_type
+        self.pulls = 0
+        self.positions = {4: [], 5: []}
+        self.first_time = None
+        self.last_time = None
+
+    def add(self, rarity: int, time: Optional[str]):
+        if rarity in self.positions:
+            self.positions[rarity].append(self.pulls)
+        if time:
+            self.first_time = self.first_time or time
+            self.last_time = time
+        self.pulls += 1
+
+    def finish(self, newest_first: Optional[bool]) -> BannerHistory:
+        if newest_first is None:
+            # Timestamps in exports are ISO-like, so they compare correctly as strings
+            newest_first = bool(self.first_time and self.last_time and self.first_time > self.last_time)
+
+        history = BannerHistory(self.pool, self.banner_type, self.pulls, len(self.positions[4]), len(self.positions[5]))
+
+        for rarity in (4, 5):
+            positions = self.positions[rarity]
+            if newest_first:
+                positions = [self.pulls - 1 - pos for pos in reversed(positions)]
+
+            intervals = Counter(b - a for a, b in zip(positions, positions[1:]))
+            since_last = self.pulls - 1 - positions[-1] if positions else self.pulls
+            pity = since_last + 1
+
+            if self.banner_type is not None:
+                banner = get_banner(self.banner_type)
+                pity = min(pity, (banner.spec_4star if rarity == 4 else banner.spec_5star).hard_pity)
+
+            if rarity == 4:
+                history.pity_4, history.intervals_4star = pity, intervals
+            else:
+                history.pity_5, history.intervals_5star = pity, intervals
+
+        return history
+
+
+@lru_cache(maxsize = None)
+def resolve_pool(value: str) -> Tuple[str, Optional[str]]:
+    '''
+    Maps a banner code or name from an export to its pool name and `pity_probs.BANNERS` key.
+    '''
+    text = value.strip().lower()
+    if text in POOLS:
+        return POOLS[text]
+
+    for keyword, pool in POOL_KEYWORDS:
+        if keyword in text:
+            return pool
+
+    return value.strip(), None
+
+
+def _find_column(keys: Iterable[str], candidates: List[str]) -> Optional[str]:
+    lookup = {key.strip().lower(): key for key in keys}
+    return next((lookup[name] for name in candidates if name in lookup), None)
+
+
+def _iter_json_array(stream: IO[str]) -> Iterator[dict]:
+    '''
+    Yields the objects of a top-level JSON array one at a time, decoding the text in chunks of `CHUNK_SIZE`.
+    '''
+    decoder = json.JSONDecoder()
+    buffer = stream.read(CHUNK_SIZE)
+    pos = buffer.index('[') + 1
+    exhausted = False
+
+    while True:
+        # Skip whitespace and the separators between objects
+        pos = SEPARATORS.match(buffer, pos).end()
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # The object continues in the next chunk, or the array is malformed
+            if exhausted:
+                raise
+            chunk = stream.read(CHUNK_SIZE)
+            exhausted = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        yield record
+        pos = end
+
+
+def _iter_json_records(stream: IO[str], name: str, head: str) -> Iterator[dict]:
+    if head == '[':
+        yield from _iter_json_array(stream)
+
+    elif name.lower().endswith('.jsonl'):
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError(f'Line {number} of the wish history is not a JSON object')
+                yield record
+
+    else:
+        # Wrapped formats are nested inside an object and cannot be streamed with the standard library
+        data = json.load(stream)
+        while isinstance(data, dict):
+            data = next((data[key] for key in ('list', 'pulls', 'data') if key in data), [])
+        if not isinstance(data, list):
+            raise ValueError('The wish history does not contain a list of records')
+        yield from data
+
+
+def _columns(keys: Iterable[str]) -> Tuple[str, str, Optional[str]]:
+    keys = list(keys)
+    banner, rarity, time = (_find_column(keys, candidates) for candidates in (BANNER_COLUMNS, RARITY_COLUMNS, TIME_COLUMNS))
+    if banner is None or rarity is None:
+        raise ValueError(f'Wish history records need a banner column (one of {BANNER_COLUMNS}) and a rarity column (one of {RARITY_COLUMNS})')
+
+    return banner, rarity, time
+
+
+def iter_wishes(stream: IO[str], name: str = '') -> Iterator[Tuple[str, str, Optional[str]]]:
+    '''
+    Yields the (banner, rarity, time) fields of each record of a wish history export one at a time.
+
+    Args:
+        stream (IO[str]): A seekable text stream of the export. CSV, JSON Lines, a top-level JSON array, or a JSON object wrapping the records in a 'list', 'pulls' or 'data' field are recognised.
+        name (str): The file name of the export, used to recognise JSON Lines.
+
+    Raises:
+        ValueError: If the export is not valid JSON, lacks the banner or rarity column, or has a record without them (naming its line or record number).
+    '''
+    start = stream.tell()
+    head = stream.read(CHUNK_SIZE).lstrip('\ufeff \t\r\n')[:1]
+    stream.seek(start)
+
+    if head not in ('[', '{'):
+        # Plain rows are much faster to read than `csv.DictReader` dicts
+        reader = csv.reader(stream)
+        header = next(reader, [])
+        banner, rarity, time = (header.index(column) if column is not None else None for column in _columns(header))
+        width = max(index for index in (banner, rarity, time) if index is not None) + 1
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                raise ValueError(f'Line {reader.line_num} of the wish history has {len(row)} fields, expected at least {width}')
+            yield row[banner], row[rarity], row[time] if time is not None else None
+        return
+
+    columns = None
+    for number, record in enumerate(_iter_json_records(stream, name, head), 1):
+        if not isinstance(record, dict):
+            raise ValueError(f'Record {number} of the wish history is not a JSON object')
+        if columns is None:
+            columns = _columns(record)
+        banner, rarity, time = columns
+        if banner not in record or rarity not in record:
+            raise ValueError(f'Record {number} of the wish history has no {banner!r} or {rarity!r} field')
+        yield str(record[banner]), str(record[rarity]), record.get(time) if time is not None else None
+
+
+def parse_history(stream: IO[str], name: str = '', newest_first: Optional[bool] = None) -> List[BannerHistory]:
+    '''
+    Streams a wish history export and derives the current pity and the drop intervals of each pool.
+
+    The records are processed one at a time, so large exports never have to be held in memory. Every record needs a banner (e.g. `gacha_type` 301 or 'Character Event') and a rarity (e.g. `rank_type` 5 or '5★') field; column names are matched against `BANNER_COLUMNS` and `RARITY_COLUMNS` in lower case.
+
+    Args:
+        stream (IO[str]): A seekable text stream of the export, in CSV, JSON or JSON Lines format.
+        name (str): The file name of the export, used to recognise JSON Lines.
+        newest_first (bool): Whether the records are sorted from newest to oldest. Detected from the `TIME_COLUMNS` field of each pool if None, defaulting to oldest first.
+
+    Returns:
+        List[BannerHistory]: The statistics of each pool, in order of first appearance.
+    '''
+    trackers: Dict[Tuple[str, Optional[str]], _PoolTracker] = {}
+
+    for banner, rarity, time in iter_wishes(stream, name):
+        pool = resolve_pool(banner)
+        tracker = trackers.get(pool)
+        if tracker is None:
+            tracker = trackers[pool] = _PoolTracker(*pool)
+
+        rarity = rarity.lstrip()[:1]
+        tracker.add(int(rarity) if rarity.isdigit() else 3, time)
+
+    return [tracker.finish(newest_first) for tracker in trackers.values()]
+
+
+def parse_history_bytes(data: bytes, name: str = '', newest_first: Optional[bool] = None) -> List[BannerHistory]:
+    '''
+    `parse_history` for the raw bytes of an uploaded file.
+    '''
+    return parse_history(io.TextIOWrapper(io.BytesIO(data), encoding = 'utf-8-sig', newline = ''), name, newest_first)